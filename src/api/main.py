@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from datetime import datetime, timedelta, timezone
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import FileResponse
@@ -8,10 +9,13 @@ from dotenv import load_dotenv
 from apscheduler.schedulers.background import BackgroundScheduler
 
 from scripts.init_db import init_db
+from utils.database_operations import warm_near_duplicate_index, warm_source_filter
 from api.routes.photos import router as photos_router
 from api.routes.idols import router as idols_router
-from bot import run_bots
+from api.routes.stats import router as stats_router
+from bot import prepare_posts, run_bots
 from scrapers.kpopping import poll_all_idols
+from scripts.archive_photos import run_archival
 
 load_dotenv()
 
@@ -25,31 +29,50 @@ def _int_env(name, default):
         return int(default)
 
 def build_scheduler():
-    # In-process replacement for the old Railway cron. Two independent gates:
+    # In-process replacement for the old Railway cron. Independent gates:
     #   ENABLE_SCHEDULER -> the bot-post job (posts approved photos). On in prod.
     #   ENABLE_SCRAPER   -> the scraper-poll job. Off by default: server-side scraping is retired in
     #                       favour of the local ingestion script (Railway egress reduction), but
     #                       flipping ENABLE_SCRAPER=true re-enables it with no code change.
-    # Both default off so running the app locally never fires real posts/scrapes by accident.
+    #   ENABLE_ARCHIVE   -> the archival job (scripts/archive_photos.py): old rejected/posted rows
+    #                       move to the archive tables, then ANALYZE + incremental vacuum. Daily.
+    # With the bot-post job on, a bot-prepare job runs PREPARE_LEAD_MINUTES (default 10; 0 turns it
+    # off) before each post: it picks every bot's next post and downloads/normalizes the images
+    # into the local post cache, so the post itself only uploads and tweets (bot.prepare_posts).
+    # All default off so running the app locally never fires real posts/scrapes by accident.
     # A BackgroundScheduler runs jobs in their own thread so the blocking requests/tweepy calls
     # don't stall the FastAPI event loop.
     scheduler = BackgroundScheduler()
 
     if os.getenv("ENABLE_SCHEDULER", "false").lower() in ("1", "true", "yes"):
-        scheduler.add_job(run_bots, "interval", hours=_int_env("POST_INTERVAL_HOURS", 6),
-                          id="bot_post", replace_existing=True)
+        post_interval = timedelta(hours=_int_env("POST_INTERVAL_HOURS", 6))
+        first_post = datetime.now(timezone.utc) + post_interval
+        scheduler.add_job(run_bots, "interval", seconds=post_interval.total_seconds(),
+                          start_date=first_post, id="bot_post", replace_existing=True)
+
+        lead = timedelta(minutes=_int_env("PREPARE_LEAD_MINUTES", 10))
+        if timedelta(0) < lead < post_interval:
+            scheduler.add_job(prepare_posts, "interval", seconds=post_interval.total_seconds(),
+                              start_date=first_post - lead, id="bot_prepare", replace_existing=True)
 
     if os.getenv("ENABLE_SCRAPER", "false").lower() in ("1", "true", "yes"):
         scheduler.add_job(poll_all_idols, "interval", hours=_int_env("SCRAPE_INTERVAL_HOURS", 6),
                           id="scraper_poll", replace_existing=True)
 
+    if os.getenv("ENABLE_ARCHIVE", "false").lower() in ("1", "true", "yes"):
+        scheduler.add_job(run_archival, "interval", hours=_int_env("ARCHIVE_INTERVAL_HOURS", 24),
+                          id="archive", replace_existing=True)
+
     return scheduler
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
-    # Ensure the schema is migrated, then start the in-process scheduler (bot + scraper jobs).
+    # Ensure the schema is migrated, load the dedup indexes (source URLs, perceptual hashes), then
+    # start the in-process scheduler (bot + scraper jobs).
     init_db()
+    warm_source_filter()
+    warm_near_duplicate_index()
     scheduler = build_scheduler()
     scheduler.start()
     for job in scheduler.get_jobs():
@@ -64,13 +87,14 @@ app = FastAPI(title="Kpopics API", lifespan=lifespan)
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
 
 @app.get("/")
-def index():
+async def index():
     # The approval webapp (single self-contained page; it calls the /photos endpoints).
     return FileResponse(STATIC_DIR / "index.html")
 
 app.include_router(photos_router)
 app.include_router(idols_router)
+app.include_router(stats_router)
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from api.security import require_token
-from utils.database_operations import (
+from utils.async_db import (
+    run_blocking,
     get_all_idols, get_all_groups, idol_exists, create_idol, set_idol_kpopping,
     get_idols_for_discovery,
 )
@@ -20,20 +22,20 @@ class IdolIn(BaseModel):
 
 
 @router.get("", dependencies=[Depends(require_token)])
-def list_idols():
+async def list_idols():
     # Feeds both the manual-ingest idol picker and the register-idol form's group dropdown.
-    return {"idols": get_all_idols(), "groups": get_all_groups()}
+    return JSONResponse({"idols": await get_all_idols(), "groups": await get_all_groups()})
 
 
 @router.get("/discovery", dependencies=[Depends(require_token)])
-def list_discovery_idols():
+async def list_discovery_idols():
     # The local ingestion script's only way to learn which idols to poll (the DB lives on Railway).
     # Returns [{key, kpopping_id}, ...] — unlike GET /idols, this exposes the Kpopping UUID.
-    return {"idols": get_idols_for_discovery()}
+    return {"idols": await get_idols_for_discovery()}
 
 
 @router.post("", dependencies=[Depends(require_token)])
-def register_idol(payload: IdolIn):
+async def register_idol(payload: IdolIn):
     key = payload.key.strip().lower()
     group_key = (payload.group_key or "").strip().lower()
     names = [name.strip() for name in payload.idol_names if name.strip()]
@@ -44,10 +46,10 @@ def register_idol(payload: IdolIn):
         raise HTTPException(status_code=400, detail="At least one idol name is required.")
     if not group_key:
         raise HTTPException(status_code=400, detail="Group key is required.")
-    if idol_exists(key):
+    if await idol_exists(key):
         raise HTTPException(status_code=409, detail=f"Idol '{key}' already exists.")
 
-    new_id = create_idol(
+    new_id = await create_idol(
         key=key,
         idol_names=names,
         name_tags=payload.name_tags,
@@ -63,7 +65,7 @@ def register_idol(payload: IdolIn):
     kpopping_id = None
     kpopping_url = (payload.kpopping_url or "").strip()
     if kpopping_url:
-        kpopping_id = resolve_idol_id(kpopping_url)
-        set_idol_kpopping(key, kpopping_url, kpopping_id)
+        kpopping_id = await run_blocking(resolve_idol_id, kpopping_url)
+        await set_idol_kpopping(key, kpopping_url, kpopping_id)
 
     return {"id": new_id, "key": key, "status": "created", "kpopping_linked": kpopping_id is not None}
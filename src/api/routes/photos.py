@@ -1,13 +1,13 @@
 import requests
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from api.security import require_token
-from utils.ingest import ingest_photo, register_photo
-from utils.database_operations import (
+from utils.ingest import PHASH_AUTO_REJECT, ingest_photo, register_photo, register_many, release_object, promote_photo
+from utils.async_db import (
+    run_blocking,
     get_pending_photos,
     get_photo,
-    set_photo_approved,
     set_photo_rejected,
     set_photo_urgent,
     create_combo,
@@ -15,12 +15,24 @@ from utils.database_operations import (
     get_photos_pending_score,
     set_photo_score,
     photo_exists_by_source_url,
+    get_existing_source_urls,
+    find_near_duplicate,
+    get_objects_by_content_hash,
     get_idol_keys_by_names,
 )
-from utils.storage import copy_object, delete_object, get_object_bytes, presign_get_url
+from utils.storage import get_object_bytes, presign_get_url
 
 router = APIRouter(prefix="/photos", tags=["photos"])
 
+# Handlers are async: DB calls are awaited through utils.async_db (reader pool / single writer) and
+# the blocking R2 / HTTP / ingest calls go to its I/O pool (run_blocking), so a burst of requests
+# queues on those pools instead of on the server's shared threadpool. The list routes return a
+# JSONResponse directly: the helpers already produce plain JSON types, and FastAPI's
+# jsonable_encoder walk over a whole page would otherwise run on the event loop.
+
+# Upper bound on URLs per /exists/batch request (an album is a few dozen).
+MAX_EXISTS_BATCH = 1000
+
 IMAGE_MEDIA_TYPES = {
     "jpg": "image/jpeg",
     "jpeg": "image/jpeg",
@@ -51,6 +63,15 @@ class PhotoRegisterIn(BaseModel):
     copies: int = 0
     combo: str | None = None
     album_id: str | None = None
+    phash: int | None = None      # utils.image.perceptual_hash of the uploaded bytes
+    content_hash: str | None = None   # utils.hashing.content_hash (SHA-256 hex) of the same bytes
+
+class PhotoRegisterBatchIn(BaseModel):
+    photos: list[PhotoRegisterIn]
+
+class ExistsBatchIn(BaseModel):
+    source_urls: list[str]
+    content_hashes: list[str] = []
 
 class UrgentIn(BaseModel):
     urgent: bool
@@ -77,14 +98,15 @@ def _ext_from_url(url, default="jpg"):
 
 
 @router.post("", dependencies=[Depends(require_token)])
-def create_photo(payload: PhotoIn):
+async def create_photo(payload: PhotoIn):
     try:
-        image_bytes = _download(payload.image_url)
+        image_bytes = await run_blocking(_download, payload.image_url)
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Could not download image: {e}")
 
-    photo_id = ingest_photo(
+    photo_id = await run_blocking(
+        ingest_photo,
         image_bytes=image_bytes,
         ext=_ext_from_url(payload.image_url),
         idol_keys=[key.lower() for key in payload.idols],
@@ -97,7 +119,7 @@ def create_photo(payload: PhotoIn):
         album_id=payload.album_id,
     )
     if photo_id is None:
-        raise HTTPException(status_code=422, detail="Rejected: no known idols matched.")
+        raise HTTPException(status_code=422, detail="Rejected: no known idols matched, or a near-duplicate.")
 
     return {"id": photo_id, "status": "pending"}
 
@@ -105,29 +127,51 @@ def create_photo(payload: PhotoIn):
 # Local ingestion (bytes uploaded PC -> R2 directly; only metadata reaches Railway)
 
 @router.get("/exists", dependencies=[Depends(require_token)])
-def photo_exists(source_url: str):
+async def photo_exists(source_url: str):
     # Cheap pre-check the local script hits before downloading/uploading, so duplicates are never
     # re-fetched. Mirrors the scraper's photo_exists_by_source_url dedup guard.
-    return {"exists": photo_exists_by_source_url(source_url)}
+    return {"exists": await photo_exists_by_source_url(source_url)}
+
+@router.post("/exists/batch", dependencies=[Depends(require_token)])
+async def photos_exist(payload: ExistsBatchIn):
+    # Batch twin of photo_exists (a whole album per request): the URLs already ingested, live or
+    # archived, in input order. Most of a fresh album never reaches SQLite — see the source-URL
+    # prefilter in database_operations.
+    # content_hashes: bytes already stored in R2 (content-addressed mode) — the uploader skips
+    # uploading those and registers them with their content_hash, in `existing_content`.
+    if max(len(payload.source_urls), len(payload.content_hashes)) > MAX_EXISTS_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_EXISTS_BATCH} URLs/hashes per request.")
+
+    existing = await get_existing_source_urls(payload.source_urls)
+    stored = await get_objects_by_content_hash(payload.content_hashes) if payload.content_hashes else {}
+    return {
+        "existing": [url for url in dict.fromkeys(payload.source_urls) if url in existing],
+        "existing_content": [digest for digest in dict.fromkeys(payload.content_hashes) if digest in stored],
+    }
 
 @router.post("/register", dependencies=[Depends(require_token)])
-def register_uploaded_photo(payload: PhotoRegisterIn):
+async def register_uploaded_photo(payload: PhotoRegisterIn):
     # Metadata-only twin of create_photo: the bytes are already in R2 at payload.r2_key (uploaded by
     # the local script). Logic mirrors scrape_album. Because upload precedes registration, every
     # reject path deletes the orphaned object so R2 never accumulates orphans.
     if not payload.r2_key.startswith("analysis/"):
         raise HTTPException(status_code=400, detail="r2_key must be under analysis/.")
 
-    if payload.source_url and photo_exists_by_source_url(payload.source_url):
-        delete_object(payload.r2_key)
+    if payload.source_url and await photo_exists_by_source_url(payload.source_url):
+        await run_blocking(release_object, payload.r2_key)
         return {"status": "skipped", "reason": "duplicate"}
 
-    idol_keys = get_idol_keys_by_names(payload.idols)
+    if PHASH_AUTO_REJECT and payload.phash is not None and await find_near_duplicate(payload.phash):
+        await run_blocking(release_object, payload.r2_key)
+        return {"status": "skipped", "reason": "near-duplicate"}
+
+    idol_keys = await get_idol_keys_by_names(payload.idols)
     if not idol_keys:
-        delete_object(payload.r2_key)
+        await run_blocking(release_object, payload.r2_key)
         raise HTTPException(status_code=422, detail="Rejected: no known idols matched.")
 
-    photo_id = register_photo(
+    photo_id = await run_blocking(
+        register_photo,
         r2_key=payload.r2_key,
         idol_keys=idol_keys,
         source=payload.source,
@@ -137,6 +181,8 @@ def register_uploaded_photo(payload: PhotoRegisterIn):
         copies=payload.copies,
         combo=payload.combo,
         album_id=payload.album_id,
+        phash=payload.phash,
+        content_hash=payload.content_hash,
     )
     if photo_id is None:
         raise HTTPException(status_code=500, detail="Could not register photo.")
@@ -144,115 +190,199 @@ def register_uploaded_photo(payload: PhotoRegisterIn):
     return {"id": photo_id, "status": "pending"}
 
 
+@router.post("/register/batch", dependencies=[Depends(require_token)])
+async def register_uploaded_photos(payload: PhotoRegisterBatchIn):
+    # Batch twin of register_uploaded_photo (a whole album per request): one dedup query, idol
+    # names resolved once per distinct name list, and every accepted row + idol link written in a
+    # single transaction. Reports one outcome per item, in order. As in the single route, every
+    # item that isn't registered has its (already uploaded) object deleted — except a key outside
+    # analysis/, which is refused untouched.
+    results = [None] * len(payload.photos)
+    existing = await get_existing_source_urls([photo.source_url for photo in payload.photos])
+    seen_urls = set()
+    resolved_names = {}
+    items, positions = [], []
+
+    for index, photo in enumerate(payload.photos):
+        outcome = {"r2_key": photo.r2_key}
+        results[index] = outcome
+
+        if not photo.r2_key.startswith("analysis/"):
+            outcome.update(status="invalid", reason="r2_key must be under analysis/.")
+            continue
+
+        if photo.source_url and (photo.source_url in existing or photo.source_url in seen_urls):
+            await run_blocking(release_object, photo.r2_key)
+            outcome.update(status="skipped", reason="duplicate")
+            continue
+
+        names = tuple(photo.idols)
+        if names not in resolved_names:
+            resolved_names[names] = await get_idol_keys_by_names(photo.idols)
+        if not resolved_names[names]:
+            await run_blocking(release_object, photo.r2_key)
+            outcome.update(status="rejected", reason="no known idols matched")
+            continue
+
+        if photo.source_url:
+            seen_urls.add(photo.source_url)
+        items.append({
+            "r2_key": photo.r2_key,
+            "idol_keys": resolved_names[names],
+            "source": photo.source,
+            "source_url": photo.source_url,
+            "date": photo.date,
+            "urgent": photo.urgent,
+            "copies": photo.copies,
+            "combo": photo.combo,
+            "album_id": photo.album_id,
+            "phash": photo.phash,
+            "content_hash": photo.content_hash,
+        })
+        positions.append(index)
+
+    for index, outcome in zip(positions, await run_blocking(register_many, items)):
+        results[index].update(outcome)
+
+    return {"results": results}
+
+
 # Approval loop (webapp)
 
+PENDING_PAGE_DEFAULT = 60
+PENDING_PAGE_MAX = 500
+
+def _parse_cursor(cursor):
+    # Cursors are "<created_at>|<id>" of the last row served (see list_pending); opaque to clients.
+    try:
+        created_at, photo_id = cursor.rsplit("|", 1)
+        return created_at, int(photo_id)
+
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
 @router.get("/pending", dependencies=[Depends(require_token)])
-def list_pending():
-    # The approval queue the webapp renders.
-    return {"photos": get_pending_photos()}
+async def list_pending(limit: int = PENDING_PAGE_DEFAULT, after: str | None = None,
+                 idol: str | None = None, album: str | None = None, source: str | None = None):
+    # The approval queue the webapp renders, one page at a time (newest first). Pass the returned
+    # next_cursor back as `after` for the following page; it is null on the last page.
+    limit = max(1, min(limit, PENDING_PAGE_MAX))
+    photos = await get_pending_photos(
+        limit=limit,
+        after=_parse_cursor(after) if after else None,
+        idol_key=idol.strip().lower() if idol else None,
+        album_id=album,
+        source=source,
+    )
+
+    next_cursor = None
+    if len(photos) == limit:
+        last = photos[-1]
+        next_cursor = f"{last['created_at']}|{last['id']}"
+
+    return JSONResponse({"photos": photos, "next_cursor": next_cursor})
 
 @router.get("/{photo_id}/image", dependencies=[Depends(require_token)])
-def get_photo_image(photo_id: int):
+async def get_photo_image(photo_id: int):
     # Returns a short-lived presigned R2 GET URL so the webapp loads the bytes straight from R2
     # (no re-streaming through Railway -> no egress). The metadata call still carries the Bearer
     # token; the R2 fetch is anonymous but authorized by the signature. The URL is set as a CSS
     # background-image (no-cors), so no bucket CORS is needed.
-    photo = get_photo(photo_id)
+    photo = await get_photo(photo_id)
     if not photo or not photo["r2_key"]:
         raise HTTPException(status_code=404, detail="Photo or image not found.")
 
-    url = presign_get_url(photo["r2_key"])
+    url = await run_blocking(presign_get_url, photo["r2_key"])
     if url is None:
         raise HTTPException(status_code=502, detail="Could not presign image URL.")
 
     return {"url": url}
 
 @router.patch("/{photo_id}/approve", dependencies=[Depends(require_token)])
-def approve_photo(photo_id: int):
-    # Promote analysis -> approved: copy the object, repoint the row, then drop the old copy.
-    photo = get_photo(photo_id)
+async def approve_photo(photo_id: int):
+    # Promote analysis -> approved: copy the object, repoint the row, then drop the old copy. With
+    # content-addressed storage the bytes may already be promoted (the photo points at an approved
+    # object, or another approved photo stores the same key): then there is nothing to copy, and
+    # the old copy is only dropped once no other live photo uses it.
+    photo = await get_photo(photo_id)
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found.")
     if photo["status"] != "pending":
         raise HTTPException(status_code=409, detail=f"Photo is not pending (status={photo['status']}).")
 
-    src_key = photo["r2_key"]
-    if not src_key:
+    if not photo["r2_key"]:
         raise HTTPException(status_code=409, detail="Photo has no image to approve.")
 
-    dst_key = "approved/" + src_key.split("/", 1)[-1]
-
-    if not copy_object(src_key, dst_key):
-        raise HTTPException(status_code=502, detail="Could not promote image in storage.")
+    # Reference count, copy, DB write and delete in one I/O-pool hop: under load every await is a
+    # wait in the event loop's queue, and approval used to make five of them.
+    error = await run_blocking(promote_photo, photo_id, photo["r2_key"])
+    if error:
+        raise HTTPException(status_code=error[0], detail=error[1])
 
-    if not set_photo_approved(photo_id, dst_key):
-        delete_object(dst_key)  # roll back the copy so storage matches the DB
-        raise HTTPException(status_code=500, detail="Could not update photo record.")
-
-    delete_object(src_key)  # orphan-safe: the DB already points at dst_key
     return {"id": photo_id, "status": "approved"}
 
 @router.patch("/{photo_id}/reject", dependencies=[Depends(require_token)])
-def reject_photo(photo_id: int):
-    # Reject: delete the bytes immediately, keep the row as 'rejected' for dedup.
-    photo = get_photo(photo_id)
+async def reject_photo(photo_id: int):
+    # Reject: delete the bytes immediately (unless another live photo shares them), keep the row as
+    # 'rejected' for dedup.
+    photo = await get_photo(photo_id)
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found.")
     if photo["status"] != "pending":
         raise HTTPException(status_code=409, detail=f"Photo is not pending (status={photo['status']}).")
 
     if photo["r2_key"]:
-        delete_object(photo["r2_key"])
+        await run_blocking(release_object, photo["r2_key"], [photo_id])
 
-    set_photo_rejected(photo_id)
+    await set_photo_rejected(photo_id)
     return {"id": photo_id, "status": "rejected"}
 
 
 # Approval metadata (webapp): urgent + auto-combo
 
 @router.patch("/{photo_id}/urgent", dependencies=[Depends(require_token)])
-def set_urgent(photo_id: int, payload: UrgentIn):
-    photo = get_photo(photo_id)
+async def set_urgent(photo_id: int, payload: UrgentIn):
+    photo = await get_photo(photo_id)
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found.")
     if photo["status"] != "pending":
         raise HTTPException(status_code=409, detail=f"Photo is not pending (status={photo['status']}).")
 
-    set_photo_urgent(photo_id, payload.urgent)
+    await set_photo_urgent(photo_id, payload.urgent)
     return {"id": photo_id, "urgent": bool(payload.urgent)}
 
 @router.post("/combo", dependencies=[Depends(require_token)])
-def make_combo(payload: ComboIn):
-    result = create_combo(payload.photo_ids)
+async def make_combo(payload: ComboIn):
+    result = await create_combo(payload.photo_ids)
     if result is None:
         raise HTTPException(status_code=400, detail="Pick 2-4 pending photos of the same idol to make a combo.")
 
     return result
 
 @router.delete("/combo/{combo}", dependencies=[Depends(require_token)])
-def remove_combo(combo: str):
-    clear_combo(combo)
+async def remove_combo(combo: str):
+    await clear_combo(combo)
     return {"combo": combo, "status": "cleared"}
 
 
 # AI aesthetic score (local worker)
 
 @router.get("/pending-score", dependencies=[Depends(require_token)])
-def list_pending_score():
+async def list_pending_score():
     # The local AI worker's queue: pending photos without an aesthetic score yet.
-    return {"photos": get_photos_pending_score()}
+    return JSONResponse({"photos": await get_photos_pending_score()})
 
 @router.patch("/{photo_id}/score", dependencies=[Depends(require_token)])
-def score_photo(photo_id: int, payload: ScoreIn):
+async def score_photo(photo_id: int, payload: ScoreIn):
     # The worker posts back the computed aesthetic score (advisory; nothing auto-filters on it).
-    if not set_photo_score(photo_id, payload.ai_score, payload.ai_reasoning):
+    if not await set_photo_score(photo_id, payload.ai_score, payload.ai_reasoning):
         raise HTTPException(status_code=404, detail="Photo not found.")
 
     return {"id": photo_id, "ai_score": payload.ai_score}
 
 
 @router.post("/manual", dependencies=[Depends(require_token)])
-def create_photo_manual(
+async def create_photo_manual(
     idols: list[str] = Form(...),
     image_url: str | None = Form(None),
     file: UploadFile | None = File(None),
@@ -264,12 +394,12 @@ def create_photo_manual(
 ):
     
     if file is not None:
-        image_bytes = file.file.read()
+        image_bytes = await file.read()
         ext = _ext_from_url(file.filename or "", default="jpg")
 
     elif image_url:
         try:
-            image_bytes = _download(image_url)
+            image_bytes = await run_blocking(_download, image_url)
 
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Could not download image: {e}")
@@ -278,7 +408,8 @@ def create_photo_manual(
     else:
         raise HTTPException(status_code=400, detail="Provide either a file or image_url.")
 
-    photo_id = ingest_photo(
+    photo_id = await run_blocking(
+        ingest_photo,
         image_bytes=image_bytes,
         ext=ext,
         idol_keys=[key.lower() for key in idols],
@@ -291,6 +422,6 @@ def create_photo_manual(
         album_id=album_id,
     )
     if photo_id is None:
-        raise HTTPException(status_code=422, detail="Rejected: no known idols matched.")
+        raise HTTPException(status_code=422, detail="Rejected: no known idols matched, or a near-duplicate.")
 
     return {"id": photo_id, "status": "pending"}
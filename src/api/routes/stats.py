@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from api.security import require_token
+from utils.query_stats import get_query_stats, reset_query_stats
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+@router.get("/db", dependencies=[Depends(require_token)])
+async def db_stats(reset: bool = False):
+    # Per-helper DB counters and recent slow queries of this API process (DB_PROFILE=1 to collect;
+    # otherwise `enabled` is false and the lists stay empty). `reset=true` zeroes them after the read,
+    # to measure one webapp session at a time. In-memory only: no DB access.
+    stats = get_query_stats()
+    if reset:
+        reset_query_stats()
+
+    return JSONResponse(stats)
@@ -7,7 +7,8 @@ load_dotenv()
 API_TOKEN = os.getenv("API_TOKEN")
 
 # Single-user personal project: a fixed Bearer token from the environment, no login/session.
-def require_token(authorization: str = Header(None)):
+# async so FastAPI runs the check on the event loop instead of a threadpool slot per request.
+async def require_token(authorization: str = Header(None)):
     if not API_TOKEN:
         raise HTTPException(status_code=500, detail="API_TOKEN not configured.")
     if authorization != f"Bearer {API_TOKEN}":
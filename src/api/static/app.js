@@ -11,6 +11,9 @@ let selectOrder = [];               // combo selection: photo ids in order
 
 /* ---------------- queue view state ---------------- */
 let queueData = [];                 // raw pending photos from the server (created_at DESC)
+let queueCursor = null;             // next_cursor of the last page loaded (null = queue fully loaded)
+let queueLoading = false;           // a page request is in flight
+const QUEUE_PAGE = 60;              // photos per /photos/pending page
 const cardsById = new Map();        // photo id -> card element (built once so images load once)
 let qMode = "order";                // "order" (pin idols on top) | "filter" (show only matches)
 const orderPins = [];               // idol keys, in click order (Order mode)
@@ -18,6 +21,10 @@ const filterIdols = new Set();      // idol keys to keep (Filter mode)
 let filterGroup = "";               // group key, or "" for all
 let filterAlbum = "";               // album_id, or "" for all
 let filterUrgent = false;           // Filter mode: urgent-only
+let matchQuery = null;              // Filter mode: the filters the server applies (serverFilter), null = not started
+let matchCursor = null;             // next_cursor of that server-filtered stream
+let matchDone = false;              // that stream is fully loaded
+let filling = false;                // fillMatches is running
 let sortScore = false;              // global: rerank by ai_score, high -> low
 let onQueue = false;                // is the queue tab the active view
 let railHidden = localStorage.getItem("kpics_rail_hidden") === "1";   // user collapsed the rail
@@ -119,6 +126,7 @@ function metaLine(p) {
   if (p.source) bits.push(p.source);
   if (p.date) bits.push(p.date);
   if (p.ai_score != null) bits.push("★" + p.ai_score);
+  if (p.duplicate_of) bits.push("dup of #" + p.duplicate_of);
   let s = bits.join(" · ");
   if (p.source_url) s += ` <a href="${p.source_url}" target="_blank" rel="noreferrer" class="text-select/80 hover:underline">↗</a>`;
   return s;
@@ -217,22 +225,107 @@ async function toggleUrgent(id, btn) {
   } catch (e) { toast(e.message, "err"); }
 }
 
+async function fetchQueuePage(after, filter = "") {
+  const qs = new URLSearchParams(filter);
+  qs.set("limit", QUEUE_PAGE);
+  if (after) qs.set("after", after);
+  return (await api("/photos/pending?" + qs)).json();
+}
+
 async function loadQueue() {
+  // First page only; further pages are appended as the sentinel below the grid scrolls into view.
   try {
     await ensureIdols();               // idol names + group_key for the rail
-    const { photos } = await (await api("/photos/pending")).json();
+    queueLoading = true;
+    const { photos, next_cursor } = await fetchQueuePage(null);
     blobUrls.splice(0).forEach(URL.revokeObjectURL);
     clearSelection();
     cardsById.clear();
-    queueData = photos;
-    const grid = $("grid");
-    grid.innerHTML = "";
+    queueData = [];
+    matchQuery = null;
+    $("grid").innerHTML = "";
     if (imgObserver) imgObserver.disconnect();   // drop the old cards' entries before rebuilding
-    photos.forEach((p) => { const el = card(p); cardsById.set(p.id, el); grid.appendChild(el); });
-    refreshFacets(); renderRailIdols(); updateHint(); applyQueueView();
+    appendQueuePage(photos, next_cursor);
+    updateHint();
   } catch (e) { if (e.message !== "unauthorized") toast("Could not load queue: " + e.message, "err"); }
+  finally { queueLoading = false; }
+}
+
+async function loadMoreQueue() {
+  if (!queueCursor || queueLoading) return false;
+  queueLoading = true;
+  try {
+    const { photos, next_cursor } = await fetchQueuePage(queueCursor);
+    appendQueuePage(photos.filter((p) => !cardsById.has(p.id)), next_cursor);
+    return true;
+  } catch (e) { if (e.message !== "unauthorized") toast("Could not load more: " + e.message, "err"); return false; }
+  finally { queueLoading = false; }
 }
 
+// The Filter-mode filters /photos/pending applies itself (one idol, an album), as query params;
+// "" when none does. Several idols, group and urgent are matched here only.
+function serverFilter() {
+  const qs = new URLSearchParams();
+  if (filterIdols.size === 1) qs.set("idol", [...filterIdols][0]);
+  if (filterAlbum) qs.set("album", filterAlbum);
+  return qs.toString();
+}
+
+function moreMatches() {
+  return matchQuery ? !matchDone : !!queueCursor;
+}
+
+async function loadMatchPage() {
+  // Next page of the server-filtered stream; its photos join the queue like any other page.
+  if (queueLoading) return false;
+  const filter = matchQuery;
+  queueLoading = true;
+  try {
+    const { photos, next_cursor } = await fetchQueuePage(matchCursor, filter);
+    if (filter !== matchQuery) return true;      // the filters changed meanwhile: stream restarted
+    matchCursor = next_cursor; matchDone = !next_cursor;
+    appendQueuePage(photos.filter((p) => !cardsById.has(p.id)), queueCursor);
+    return true;
+  } catch (e) { if (e.message !== "unauthorized") toast("Could not load matches: " + e.message, "err"); return false; }
+  finally { queueLoading = false; }
+}
+
+// Filter mode over a paged queue: matching photos may still sit on pages not loaded yet. Until a
+// page of matches shows (or none is left), load more — from /photos/pending with the filters it can
+// apply (restarted whenever they change), else the next plain queue page.
+async function fillMatches() {
+  if (filling) return;
+  filling = true;
+  try {
+    while (qMode === "filter" && queueData.filter(passesFilters).length < QUEUE_PAGE) {
+      const filter = serverFilter();
+      if (filter !== matchQuery) { matchQuery = filter; matchCursor = null; matchDone = false; }
+      if (!moreMatches()) break;
+      if (!(await (matchQuery ? loadMatchPage() : loadMoreQueue()))) break;
+    }
+  } finally { filling = false; }
+}
+
+function loadMore() {
+  // Infinite scroll / "more" button: in Filter mode the server-filtered stream, if there is one.
+  return qMode === "filter" && matchQuery && matchQuery === serverFilter() ? loadMatchPage() : loadMoreQueue();
+}
+
+function appendQueuePage(photos, nextCursor) {
+  const grid = $("grid");
+  queueData = queueData.concat(photos);
+  queueCursor = nextCursor;
+  photos.forEach((p) => { const el = card(p); cardsById.set(p.id, el); grid.appendChild(el); });
+  refreshFacets(); renderRailIdols(); applyQueueView();
+}
+
+// Infinite scroll: when the sentinel under the grid nears the viewport, fetch the next page.
+const moreObserver = ("IntersectionObserver" in window)
+  ? new IntersectionObserver((entries) => {
+      if (entries.some((entry) => entry.isIntersecting)) loadMore();
+    }, { root: null, rootMargin: "600px 0px" })
+  : null;
+
 /* ---------------- queue: order / filter / sort ---------------- */
 function groupOf(key) { const i = idolsCache.find((x) => x.key === key); return i ? i.group_key : ""; }
 function scoreVal(p) { return p.ai_score == null ? -1 : p.ai_score; }
@@ -275,11 +368,18 @@ function applyQueueView() {
   list.forEach((p) => { const el = cardsById.get(p.id); if (el) grid.appendChild(el); });
 
   const n = list.length;
-  $("count").textContent = n ? `(${n})` : "";
+  const more = qMode === "filter" && matchQuery === serverFilter() ? moreMatches() : !!queueCursor;
+  $("count").textContent = n ? `(${n}${more ? "+" : ""})` : "";
   const empty = $("empty");
-  if (n === 0) { empty.textContent = queueData.length ? "No photos match these filters." : "No photos waiting for approval."; }
+  if (n === 0) {
+    empty.textContent = !queueData.length ? "No photos waiting for approval."
+      : more ? "Looking for matching photos…" : "No photos match these filters.";
+  }
   empty.classList.toggle("hidden", n > 0);
+  $("queue-more").classList.toggle("hidden", !more);
   syncRail();
+  // After the caller's own load (if any) has released queueLoading.
+  if (qMode === "filter" && !filling && n < QUEUE_PAGE) setTimeout(fillMatches, 0);
 }
 
 function syncRail() {
@@ -555,6 +655,8 @@ $("make-combo").onclick = makeCombo;
 $("clear-sel").onclick = clearSelection;
 $("batch-approve").onclick = () => batchAct("approve");
 $("batch-reject").onclick = () => batchAct("reject");
+$("queue-more-btn").onclick = loadMore;
+if (moreObserver) moreObserver.observe($("queue-more"));
 
 /* queue rail */
 $("mode-order").onclick = () => setMode("order");
@@ -0,0 +1,195 @@
+import os
+import time
+import random
+import asyncio
+import sqlite3
+import threading
+
+from common import build_db
+
+# API latency under a burst: the previous sync `def` routes (every request on a threadpool slot,
+# writes racing for SQLite's lock) vs the async routes (reader pool + single writer), on the same
+# mixed webapp/worker workload — pending-queue pages, urgent toggles, AI score writes and approvals
+# (whose two R2 calls are replaced by a fake with R2-like latency, STORAGE_LATENCY) — while a second
+# connection plays the other writer process (local_ingest / the worker) committing small
+# transactions. Reports p50/p99 and non-200 responses for each, overall and per route. On a small
+# host the async routes trade a little tail for throughput: the event loop is saturated, so each
+# await (a hop to a pool and back) waits its turn in the loop's queue — about the p50 of a pending
+# page per hop. That is why approval does its storage and DB steps in one hop (promote_photo).
+#   python src/benchmarks/bench_api_load.py [concurrency] [requests_per_client]
+
+os.environ.setdefault("API_TOKEN", "bench")
+HEADERS = {"Authorization": f"Bearer {os.environ['API_TOKEN']}"}
+STORAGE_LATENCY = 0.08
+
+
+def fake_storage():
+    # copy_object / delete_object stand-ins: block like a round trip to R2, always succeed.
+    import api.routes.photos as photos
+    import utils.ingest as ingest
+
+    def slow_ok(*_args):
+        time.sleep(STORAGE_LATENCY)
+        return True
+
+    photos.copy_object = slow_ok
+    photos.delete_object = slow_ok
+    ingest.copy_object = slow_ok
+    ingest.delete_object = slow_ok
+
+
+def legacy_app():
+    # The pre-async handlers for the benchmarked routes, verbatim in shape: sync `def`, blocking
+    # helpers called in place, writes run on the calling thread (bypassing the single writer).
+    from fastapi import Depends, FastAPI, Header, HTTPException
+    import api.routes.photos as photos
+    from api.routes.photos import ScoreIn, UrgentIn
+    from utils import database_operations as dbo
+
+    def sync_require_token(authorization: str = Header(None)):
+        if authorization != HEADERS["Authorization"]:
+            raise HTTPException(status_code=401, detail="Unauthorized.")
+
+    app = FastAPI()
+
+    @app.get("/photos/pending", dependencies=[Depends(sync_require_token)])
+    def list_pending(limit: int = 60):
+        return {"photos": dbo.get_pending_photos(limit=limit)}
+
+    @app.patch("/photos/{photo_id}/urgent", dependencies=[Depends(sync_require_token)])
+    def set_urgent(photo_id: int, payload: UrgentIn):
+        photo = dbo.get_photo(photo_id)
+        if not photo:
+            raise HTTPException(status_code=404, detail="Photo not found.")
+        dbo.set_photo_urgent.__wrapped__(photo_id, payload.urgent)
+        return {"id": photo_id, "urgent": bool(payload.urgent)}
+
+    @app.patch("/photos/{photo_id}/score", dependencies=[Depends(sync_require_token)])
+    def score_photo(photo_id: int, payload: ScoreIn):
+        if not dbo.set_photo_score.__wrapped__(photo_id, payload.ai_score, payload.ai_reasoning):
+            raise HTTPException(status_code=404, detail="Photo not found.")
+        return {"id": photo_id, "ai_score": payload.ai_score}
+
+    @app.patch("/photos/{photo_id}/approve", dependencies=[Depends(sync_require_token)])
+    def approve_photo(photo_id: int):
+        photo = dbo.get_photo(photo_id)
+        if not photo or photo["status"] != "pending":
+            raise HTTPException(status_code=409, detail="Photo is not pending.")
+        dst_key = "approved/" + photo["r2_key"].split("/", 1)[-1]
+        if not photos.copy_object(photo["r2_key"], dst_key):
+            raise HTTPException(status_code=502, detail="Could not promote image in storage.")
+        if not dbo.set_photo_approved.__wrapped__(photo_id, dst_key):
+            photos.delete_object(dst_key)
+            raise HTTPException(status_code=500, detail="Could not update photo record.")
+        photos.delete_object(photo["r2_key"])
+        return {"id": photo_id, "status": "approved"}
+
+    return app
+
+
+def async_app():
+    from fastapi import FastAPI
+    from api.routes.photos import router
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+def background_writer(stop):
+    # Another process's writer: its own connection, a short write transaction every ~20 ms.
+    from utils.database_operations import DB_FILE
+
+    connect = sqlite3.connect(DB_FILE, timeout=30)
+    rng = random.Random(3)
+    while not stop.is_set():
+        with connect:
+            connect.execute("UPDATE photos SET copies = copies WHERE id = ?", (rng.randint(1, 2000),))
+            time.sleep(0.002)
+        time.sleep(0.02)
+    connect.close()
+
+
+async def run_load(app, photo_ids, to_approve, concurrency, per_client):
+    import httpx
+
+    latencies, failures = [], 0
+    by_route = {"page": [], "write": [], "approve": []}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=HEADERS) as client:
+
+        async def one_client(seed):
+            nonlocal failures
+            rng = random.Random(seed)
+            for _ in range(per_client):
+                roll = rng.random()
+                photo_id = rng.choice(photo_ids)
+                start = time.perf_counter()
+                if roll < 0.65:
+                    route = "page"
+                    response = await client.get("/photos/pending", params={"limit": 60})
+                elif roll < 0.7 and to_approve:
+                    route = "approve"
+                    response = await client.patch(f"/photos/{to_approve.pop()}/approve")
+                elif roll < 0.85:
+                    route = "write"
+                    response = await client.patch(f"/photos/{photo_id}/urgent", json={"urgent": rng.random() < 0.5})
+                else:
+                    route = "write"
+                    response = await client.patch(f"/photos/{photo_id}/score", json={"ai_score": rng.uniform(1, 10)})
+                latencies.append((time.perf_counter() - start) * 1000)
+                by_route[route].append(latencies[-1])
+                if response.status_code != 200:
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_client(seed) for seed in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    def percentile(values, fraction):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+    return {
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "rps": len(latencies) / elapsed,
+        "failures": failures,
+        "routes": {route: (percentile(values, 0.5), percentile(values, 0.99)) for route, values in by_route.items()},
+    }
+
+
+def main(concurrency=100, per_client=20):
+    from utils.database_operations import get_connection
+
+    build_db(2000)
+    fake_storage()
+    pending_ids = [row[0] for row in get_connection().execute("SELECT id FROM photos WHERE status = 'pending'")]
+
+    print(f"{concurrency} clients x {per_client} requests "
+          f"(65% pending page, 5% approve, 15% urgent, 15% score)")
+    print(f"{'routes':>7} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8} {'non-200':>8} | p50/p99 ms: "
+          f"{'page':>9} {'urgent/score':>12} {'approve':>9}")
+    for run, (name, factory) in enumerate((("sync", legacy_app), ("async", async_app))):
+        # Each run approves its own third of the pending photos (an approval is one-way); urgent and
+        # score writes stay on the last third, which is pending in both runs.
+        to_approve = pending_ids[run::3]
+        stop = threading.Event()
+        writer = threading.Thread(target=background_writer, args=(stop,), daemon=True)
+        writer.start()
+        try:
+            result = asyncio.run(run_load(factory(), pending_ids[2::3], to_approve, concurrency, per_client))
+        finally:
+            stop.set()
+            writer.join()
+
+        routes = "".join(f" {f'{p50:.0f}/{p99:.0f}':>{width}}" for (p50, p99), width
+                         in zip(result["routes"].values(), (9, 12, 9)))
+        print(f"{name:>7} {result['p50']:8.1f} {result['p99']:8.1f} {result['rps']:8.0f} {result['failures']:8} | "
+              f"{'':11}{routes}")
+
+if __name__ == "__main__":
+    import sys
+
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args)
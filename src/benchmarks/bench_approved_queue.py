@@ -0,0 +1,81 @@
+import json
+
+from common import StatementCounter, build_db, add_photos, timed
+
+# get_approved_photos: the old per-row shape (one photo_idols query per approved photo, then one
+# idols query per idol to render the text) vs the batched two-query version, as the table grows,
+# plus one idol bot's queue filtered in SQL (idol_key).
+#   python src/benchmarks/bench_approved_queue.py [max_photos]
+
+def legacy_get_approved_photos():
+    # The pre-batching query pattern, replayed on the shared connection (so only the statement
+    # count differs, not connection setup).
+    from utils.database_operations import get_connection
+    from utils.processor import build_tweet_text
+
+    cursor = get_connection().cursor()
+    rows = cursor.execute(
+        "SELECT id, r2_key, date FROM photos WHERE bucket_stage = 'approved'"
+    ).fetchall()
+
+    photos = []
+    for photo_id, r2_key, date in rows:
+        keys = [r[0] for r in cursor.execute(
+            """
+                SELECT i.key FROM photo_idols pi JOIN idols i ON pi.idol_id = i.id
+                WHERE pi.photo_id = ? ORDER BY i.id
+            """, (photo_id,)
+        ).fetchall()]
+
+        idols_data = []
+        for key in keys:
+            row = cursor.execute(
+                """
+                    SELECT i.key, i.idol_names, i.name_tags, g.key, g.group_names, g.group_tags
+                    FROM idols i LEFT JOIN groups g ON i.group_id = g.id WHERE i.key = ?
+                """, (key,)
+            ).fetchone()
+            idols_data.append({
+                "key": row[0], "idol_names": json.loads(row[1] or "[]"), "name_tags": row[2],
+                "group_key": row[3], "group_names": json.loads(row[4] or "[]"), "group_tags": row[5] or "",
+            })
+
+        photos.append({"id": photo_id, "key": r2_key, "text": build_tweet_text(idols_data, date or "")})
+
+    return photos
+
+def main(max_photos=10_000):
+    from utils.database_operations import get_approved_photos
+
+    sizes = [size for size in (1_000, 2_500, 5_000, 10_000, 25_000) if size <= max_photos] or [max_photos]
+
+    print(f"{'photos':>7} {'approved':>9} {'legacy stmts':>13} {'legacy ms':>10} {'stmts':>6} {'ms':>8} "
+          f"{'one idol':>9} {'idol ms':>8}")
+    total = 0
+    for size in sizes:
+        if total == 0:
+            build_db(size)
+        else:
+            add_photos(size - total)
+        total = size
+
+        with StatementCounter() as legacy_count:
+            approved = len(legacy_get_approved_photos())
+        legacy_ms = timed(legacy_get_approved_photos)
+
+        with StatementCounter() as batched_count:
+            assert len(get_approved_photos()) == approved
+        batched_ms = timed(get_approved_photos)
+
+        # One idol bot's queue, filtered in SQL instead of over the whole queue in Python.
+        idol_count = len(get_approved_photos(idol_key="karina"))
+        idol_ms = timed(lambda: get_approved_photos(idol_key="karina"))
+
+        print(f"{size:7} {approved:9} {legacy_count.count:13} {legacy_ms:10.1f} "
+              f"{batched_count.count:6} {batched_ms:8.1f} {idol_count:9} {idol_ms:8.1f}")
+
+if __name__ == "__main__":
+    import sys
+
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,198 @@
+import io
+import os
+import time
+import itertools
+import threading
+import sqlite3
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from common import build_db
+
+# One run_bots cycle with several bots posting the same photos: each bot on its own (its own
+# migration check, R2 client and downloads, like before) and run_bots' shared CycleContext, each
+# one bot after another and with the bots posting in parallel (BOT_WORKERS). The queue leads with
+# Quad combos of group photos tagged with every idol bot, so GENERAL and each idol bot post the same
+# four objects in the same cycle. R2 is a fake with R2-like GET latency (GET_LATENCY) that counts
+# client setups, downloads and deletes; Twitter is a fake with upload/tweet latency that counts
+# uploads and, like Twitter, refuses a tweet attaching media the account doesn't own. Every run is
+# done twice: with the bots' user ids set (…_TWITTER_USER_ID), so media is uploaded once with the
+# others as additional owners, and without them (each account uploads its own copy, downloading
+# the pack again unless the cycle already holds its bytes). Reports wall time, downloads, uploads,
+# clients and deletes; exits 1 if an object is deleted twice or too early, or a tweet was refused.
+#   python src/benchmarks/bench_bot_cycle.py [cycles]
+
+GET_LATENCY = 0.05
+UPLOAD_LATENCY = 0.15
+TWEET_LATENCY = 0.1
+BOTS = ["GENERAL", "KARINA", "WINTER", "NINGNING", "GISELLE"]
+
+
+class FakeTwitter:
+    uploads = 0
+    refused = 0
+    owners = {}
+    _ids = itertools.count(1)
+    _lock = threading.Lock()
+
+
+class FakeS3:
+    clients = 0
+    downloads = 0
+    deleted = []
+    _lock = threading.Lock()
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        FakeS3.clients += 1
+
+    def get_object(self, Bucket, Key):
+        time.sleep(GET_LATENCY)
+        with FakeS3._lock:
+            FakeS3.downloads += 1
+        return {"Body": io.BytesIO(b"\xff" * 200_000)}
+
+    def delete_object(self, Bucket, Key):
+        FakeS3.deleted.append(Key)
+
+
+def fake_twitter(bot):
+    account = bot.idol_prefix
+
+    def media_upload(filename, file, additional_owners=None):
+        time.sleep(UPLOAD_LATENCY)
+        with FakeTwitter._lock:
+            FakeTwitter.uploads += 1
+            media_id = next(FakeTwitter._ids)
+            FakeTwitter.owners[media_id] = {account} | {
+                name for name in BOTS if os.getenv(f"{name}_TWITTER_USER_ID") in (additional_owners or [])}
+        return SimpleNamespace(media_id=media_id, expires_after_secs=86400)
+
+    def create_tweet(text, media_ids):
+        time.sleep(TWEET_LATENCY)
+        if any(account not in FakeTwitter.owners.get(media_id, ()) for media_id in media_ids):
+            FakeTwitter.refused += 1
+            raise RuntimeError("media not owned by this account")
+        return {"id": 1}
+
+    bot.api_v1 = SimpleNamespace(media_upload=media_upload)
+    bot.client_v2 = SimpleNamespace(create_tweet=create_tweet)
+
+
+def early_deletes():
+    # Deleted objects some bot that should post them hasn't (history is the source of truth).
+    from utils.database_operations import get_connection
+
+    early = []
+    for key in set(FakeS3.deleted):
+        posted = {row[0] for row in get_connection().execute(
+            "SELECT bot_name FROM history WHERE file_key = ?", (key,))}
+        idols = {row[0].upper() for row in get_connection().execute(
+            """
+                SELECT i.key FROM photo_idols pi JOIN idols i ON pi.idol_id = i.id
+                JOIN photos p ON p.id = pi.photo_id WHERE p.r2_key = ?
+            """, (key,))}
+        if not ({"GENERAL"} | idols) & set(BOTS) <= posted:
+            early.append(key)
+    return early
+
+
+def seed_group_photos(count=20, pack=4):
+    # `count` approved photos of all four idol bots at once, urgent and top-scored so they lead
+    # every queue, grouped `pack` at a time into combos (Q1, Q2, ... for packs of 4).
+    from utils.database_operations import get_connection, idol_signature
+
+    connect = get_connection()
+    with connect:
+        idol_ids = [row[0] for row in connect.execute(
+            "SELECT id FROM idols WHERE key IN ('karina', 'winter', 'ningning', 'giselle') ORDER BY id")]
+        photo_ids = [row[0] for row in connect.execute(
+            "SELECT id FROM photos WHERE status = 'approved' ORDER BY id LIMIT ?", (count,))]
+        letter = {2: "D", 3: "T", 4: "Q"}[pack]
+        for n, photo_id in enumerate(photo_ids):
+            connect.execute("DELETE FROM photo_idols WHERE photo_id = ?", (photo_id,))
+            connect.executemany(
+                "INSERT INTO photo_idols (photo_id, idol_id, confidence) VALUES (?, ?, 1.0)",
+                [(photo_id, idol_id) for idol_id in idol_ids]
+            )
+            connect.execute(
+                """
+                    UPDATE photos SET urgent = 1, ai_score = 10, combo = ?, copies = ?, idol_signature = ?
+                    WHERE id = ?
+                """, (f"{letter}{n // pack + 1}", n % pack + 1, idol_signature(idol_ids), photo_id)
+            )
+
+
+def main(cycles=3):
+    import kpics_class
+    from bot import BOT_WORKERS, run_bots
+    from utils.database_operations import get_connection
+
+    build_db(2000)
+    seed_group_photos()
+    snapshot = sqlite3.connect(":memory:")
+    get_connection().backup(snapshot)
+
+    kpics_class.CycleContext._setup_s3 = lambda self: setattr(self, "s3", FakeS3())
+    kpics_class.KpopBot._setup_twitter = fake_twitter
+
+    def alone():
+        for idol_prefix in BOTS:
+            kpics_class.KpopBot(idol_prefix, BOTS).run()
+
+    def alone_parallel():
+        with ThreadPoolExecutor(max_workers=BOT_WORKERS) as pool:
+            list(pool.map(lambda idol_prefix: kpics_class.KpopBot(idol_prefix, BOTS).run(), BOTS))
+
+    def shared():
+        run_bots(BOTS, workers=1)
+
+    def parallel():
+        run_bots(BOTS)
+
+    ok = True
+    print(f"{len(BOTS)} bots, {cycles} cycle(s), R2 GET {GET_LATENCY * 1000:.0f} ms, "
+          f"upload {UPLOAD_LATENCY * 1000:.0f} ms, tweet {TWEET_LATENCY * 1000:.0f} ms")
+    runs = (("alone", alone), (f"alone/{BOT_WORKERS}", alone_parallel), ("shared", shared),
+            (f"shared/{BOT_WORKERS}", parallel))
+    for media, user_ids in (("media shared by user id", True), ("own media per account", False)):
+        print(f"\n{media}")
+        print(f"{'bots':<12} {'ms/cycle':>9} {'downloads':>10} {'uploads':>8} {'clients':>8} {'deletes':>8}")
+        for name, cycle in runs:
+            snapshot.backup(get_connection())
+            for n, bot_name in enumerate(BOTS):
+                if user_ids:
+                    os.environ[f"{bot_name}_TWITTER_USER_ID"] = str(1000 + n)
+                else:
+                    os.environ.pop(f"{bot_name}_TWITTER_USER_ID", None)
+            FakeS3.clients = FakeS3.downloads = 0
+            FakeS3.deleted = []
+            FakeTwitter.uploads = FakeTwitter.refused = 0
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(cycles):
+                    cycle()
+            elapsed = (time.perf_counter() - start) * 1000 / cycles
+            print(f"{name:<12} {elapsed:9.1f} {FakeS3.downloads / cycles:10.1f} {FakeTwitter.uploads / cycles:8.1f} "
+                  f"{FakeS3.clients / cycles:8.1f} {len(FakeS3.deleted):8}")
+
+            # Group photos are only deleted once, and only after all five bots have posted them.
+            if len(set(FakeS3.deleted)) != len(FakeS3.deleted) or early_deletes():
+                print(f"{name}: objects deleted twice or too early")
+                ok = False
+            if FakeTwitter.refused:
+                print(f"{name}: {FakeTwitter.refused} tweet(s) refused (media not owned)")
+                ok = False
+
+    if not ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    import sys
+
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args)
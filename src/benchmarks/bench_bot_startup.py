@@ -0,0 +1,78 @@
+import io
+import re
+import sqlite3
+import contextlib
+from pathlib import Path
+
+from common import build_db, timed
+
+# Bot startup cost with many bots, each run on its own (KpopBot.run() without a shared cycle calls
+# init_db(); run_bots now checks once per cycle). Compares the previous migration check
+# (schema_migrations walk + glob + read + a printed line per file, every call) against the
+# fingerprint fast path (files read once per process, then one PK read, then nothing for the rest
+# of the process). R2/Twitter setup is stubbed out so run() stops right after init_db — only the
+# startup path is timed.
+#   python src/benchmarks/bench_bot_startup.py [bots] [cycles]
+
+def legacy_apply_migrations(db_file):
+    # The pre-fingerprint runner's per-call work on an up-to-date DB.
+    from contextlib import closing
+    from migrations.migrations import MIGRATION_DIR
+
+    with closing(sqlite3.connect(db_file)) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                migration_filename TEXT NOT NULL UNIQUE,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+        applied = {row[0] for row in cursor.execute("SELECT migration_filename FROM schema_migrations")}
+        for migration_file in sorted(Path(MIGRATION_DIR).glob("*.sql")):
+            if migration_file.name in applied:
+                print(f"Filename already applied: {migration_file.name}")
+                continue
+            re.split(r'(?m)^-- DOWN\s*$', migration_file.read_text(encoding="utf-8"))
+
+
+def main(bots=50, cycles=20):
+    import kpics_class
+    import migrations.migrations as migrations
+    from scripts.init_db import DB_FILE, init_db
+
+    build_db(100)
+    kpics_class.CycleContext._setup_s3 = lambda self: None
+    kpics_class.KpopBot._setup_twitter = lambda self: None
+    active = ["GENERAL"] + [f"BOT{n}" for n in range(bots - 1)]
+
+    def cycle():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for idol_prefix in active:
+                kpics_class.KpopBot(idol_prefix, active).run()
+
+    kpics_class.init_db = lambda: legacy_apply_migrations(DB_FILE)
+    legacy_ms = timed(cycle, cycles) / cycles
+
+    kpics_class.init_db = init_db
+
+    def cold_cycle():
+        # A fresh process: nothing verified or read yet.
+        migrations._verified.clear()
+        migrations._migration_files = None
+        cycle()
+
+    cold_ms = timed(cold_cycle, cycles) / cycles
+    warm_ms = timed(cycle, cycles) / cycles
+
+    print(f"{bots} bots run on their own, mean of {cycles} cycles")
+    print(f"{'legacy init_db per bot':<34} {legacy_ms:8.2f} ms/cycle")
+    print(f"{'fingerprint, first cycle':<34} {cold_ms:8.2f} ms/cycle")
+    print(f"{'fingerprint, later cycles':<34} {warm_ms:8.2f} ms/cycle")
+
+if __name__ == "__main__":
+    import sys
+
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,177 @@
+import io
+import time
+import sqlite3
+import threading
+import contextlib
+from types import SimpleNamespace
+
+from common import build_db
+
+# Latency of one Quad (4-image combo) post: images one after another (MEDIA_WORKERS=1, the previous
+# behaviour) vs KpopBot's bounded download -> recompress -> upload pipeline. R2 and Twitter are
+# local fakes with network-like latency (GET_LATENCY, UPLOAD_LATENCY); the first copy is the slowest
+# to fetch, so uploads finish out of order — the tweet's media ids must still follow `copies`. A
+# missing object and a failing upload check that a bad image holds back the whole post, and that
+# the retry posts the pack once, without the retired photo. Exits 1 if the media ids are wrong.
+#   python src/benchmarks/bench_combo_post.py [posts]
+
+GET_LATENCY = 0.05
+UPLOAD_LATENCY = 0.15
+IMAGE = b"\xff" * 300_000
+
+
+class FakeS3:
+    missing = set()
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self, copies_by_key):
+        self.copies_by_key = copies_by_key
+
+    def get_object(self, Bucket, Key):
+        if Key in FakeS3.missing:
+            raise FakeS3.exceptions.NoSuchKey(Key)
+        # copies 1 takes longest, copies 4 is quickest.
+        time.sleep(GET_LATENCY * (5 - self.copies_by_key.get(Key, 4)) / 2)
+        return {"Body": io.BytesIO(IMAGE)}
+
+    def delete_object(self, Bucket, Key):
+        pass
+
+
+class FakeTwitter:
+    def __init__(self):
+        self.failing = set()
+        self.tweets = []
+        self.in_flight = self.peak = 0
+        self._lock = threading.Lock()
+
+    def media_upload(self, filename, file, additional_owners=None):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(UPLOAD_LATENCY)
+        with self._lock:
+            self.in_flight -= 1
+        if filename in self.failing:
+            raise RuntimeError("media upload failed")
+        return SimpleNamespace(media_id=f"media:{filename}")
+
+    def create_tweet(self, text, media_ids):
+        self.tweets.append(list(media_ids))
+        return {"id": len(self.tweets)}
+
+
+def seed_quads(posts):
+    # `posts` Quad combos of KARINA-only approved photos, scored above anything else in her queue. `copies` runs against
+    # id order so the pack order is not the insertion order. Returns [[(id, key) in copies order]].
+    from utils.database_operations import get_connection, idol_signature
+
+    connect = get_connection()
+    with connect:
+        karina = connect.execute("SELECT id FROM idols WHERE key = 'karina'").fetchone()[0]
+        photo_ids = [row[0] for row in connect.execute(
+            "SELECT id FROM photos WHERE status = 'approved' ORDER BY id LIMIT ?", (posts * 4,))]
+        packs = []
+        for n in range(posts):
+            quad = photo_ids[n * 4:n * 4 + 4]
+            for copies, photo_id in enumerate(reversed(quad), start=1):
+                connect.execute("DELETE FROM photo_idols WHERE photo_id = ?", (photo_id,))
+                connect.execute(
+                    "INSERT INTO photo_idols (photo_id, idol_id, confidence) VALUES (?, ?, 1.0)",
+                    (photo_id, karina)
+                )
+                connect.execute(
+                    """
+                        UPDATE photos SET urgent = 1, ai_score = 20 - ?, combo = ?, copies = ?,
+                                          idol_signature = ?
+                        WHERE id = ?
+                    """, (n, f"Q{n + 1}", copies, idol_signature([karina]), photo_id)
+                )
+            packs.append(connect.execute(
+                "SELECT id, r2_key FROM photos WHERE combo = ? ORDER BY copies", (f"Q{n + 1}",)).fetchall())
+    return packs
+
+
+def main(posts=3):
+    from collections import OrderedDict
+
+    import kpics_class
+    from utils.database_operations import get_connection
+
+    build_db(500)
+    packs = seed_quads(posts)
+    copies_by_key = {key: copies for pack in packs for copies, (_, key) in enumerate(pack, start=1)}
+    expected = [[f"media:{key}" for _, key in pack] for pack in packs]
+    snapshot = sqlite3.connect(":memory:")
+    get_connection().backup(snapshot)
+
+    def make_context():
+        # A real CycleContext (cache, lock) without init_db and the boto3 client.
+        context = kpics_class.CycleContext.__new__(kpics_class.CycleContext)
+        context.max_cache_bytes = kpics_class.CYCLE_CACHE_BYTES
+        context.s3 = FakeS3(copies_by_key)
+        context.downloads = 0
+        context._objects = OrderedDict()
+        context._cached_bytes = 0
+        context._lock = threading.Lock()
+        context._fetching = {}
+        context._media = {}
+        return context
+
+    def run(workers, twitter, count=posts, restore=True):
+        if restore:
+            snapshot.backup(get_connection())
+        kpics_class.MEDIA_WORKERS = workers
+
+        def fake_twitter(bot):
+            bot.api_v1 = twitter
+            bot.client_v2 = twitter
+
+        kpics_class.KpopBot._setup_twitter = fake_twitter
+        context = make_context()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(count):
+                kpics_class.KpopBot("KARINA", ["KARINA"], cycle=context).run()
+        return (time.perf_counter() - start) * 1000 / count
+
+    ok = True
+    print(f"{posts} Quad post(s), R2 GET up to {GET_LATENCY * 2000:.0f} ms, upload {UPLOAD_LATENCY * 1000:.0f} ms")
+    print(f"{'images':<12} {'ms/post':>8} {'peak uploads':>13} {'media ids':>10}")
+    for name, workers in (("one by one", 1), ("pipeline", kpics_class.MEDIA_WORKERS)):
+        twitter = FakeTwitter()
+        elapsed = run(workers, twitter)
+        # Which Quad goes first is the queue's business; each tweet's media order is checked.
+        in_order = sorted(twitter.tweets) == sorted(expected)
+        ok &= in_order
+        print(f"{name:<12} {elapsed:8.1f} {twitter.peak:13} {'ok' if in_order else 'WRONG':>10}")
+
+    # One missing object and one failing upload in the first Quad (the top of the queue): nothing
+    # of it is tweeted. Once the upload works again it goes out once, with the three photos left
+    # (the missing one retired), still in `copies` order.
+    twitter = FakeTwitter()
+    FakeS3.missing = {packs[0][1][1]}
+    twitter.failing = {packs[0][2][1]}
+    run(kpics_class.MEDIA_WORKERS, twitter, count=1)
+    FakeS3.missing = set()
+    held = not twitter.tweets
+    retired = get_connection().execute(
+        "SELECT status FROM photos WHERE id = ?", (packs[0][1][0],)).fetchone()[0] == "rejected"
+    twitter.failing = set()
+    run(kpics_class.MEDIA_WORKERS, twitter, count=2, restore=False)
+    retried = twitter.tweets[:1] == [[expected[0][0], expected[0][2], expected[0][3]]] and \
+        not any(media_id in tweet for tweet in twitter.tweets[1:] for media_id in expected[0])
+    ok &= held and retired and retried
+    print(f"{'bad images':<12} {'':>8} {'':>13} {'ok' if held and retired and retried else 'WRONG':>10}")
+
+    if not ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    import sys
+
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args)
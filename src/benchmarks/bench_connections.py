@@ -0,0 +1,45 @@
+import sqlite3
+
+from common import build_db, timed
+
+# Per-call connect (the old `closing(sqlite3.connect(DB_FILE))` in every helper) vs the shared
+# per-thread connection, across the hot database_operations helpers.
+#   python src/benchmarks/bench_connections.py [photos] [repeat]
+
+def main(photos=2000, repeat=200):
+    build_db(photos)
+
+    import utils.database_operations as db
+
+    def fresh_connection():
+        # What every helper paid before: a brand-new connection (closed when the helper returns
+        # and drops its last reference).
+        return sqlite3.connect(db.DB_FILE)
+
+    helpers = {
+        "photo_exists_by_source_url": lambda: db.photo_exists_by_source_url("https://cdn.example/kpics/7.jpg"),
+        "get_log_history": lambda: db.get_log_history("approved/00000001.jpg"),
+        "get_last_posted_image": lambda: db.get_last_posted_image("GENERAL"),
+        "get_idol_ids_by_keys": lambda: db.get_idol_ids_by_keys(["karina", "winter"]),
+        "get_photo": lambda: db.get_photo(1),
+        "get_all_idols": db.get_all_idols,
+    }
+
+    pooled_get_connection = db.get_connection
+
+    print(f"{'helper':30} {'per-call ms':>12} {'pooled ms':>10} {'speedup':>8}")
+    for name, call in helpers.items():
+        db.get_connection = fresh_connection
+        per_call = timed(call, repeat)
+
+        db.get_connection = pooled_get_connection
+        call()   # open + warm this thread's connection outside the timing
+        pooled = timed(call, repeat)
+
+        print(f"{name:30} {per_call:12.1f} {pooled:10.1f} {per_call / pooled:7.1f}x")
+
+if __name__ == "__main__":
+    import sys
+
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args)
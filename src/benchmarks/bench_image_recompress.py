@@ -0,0 +1,163 @@
+import io
+import time
+import zlib
+import random
+
+from common import BASE_DIR  # noqa: F401  (puts src/ on the path)
+
+# ensure_uploadable_image on a corpus of oversized fixtures (PNG, JPEG, WebP; photo-like content
+# with different amounts of grain, one JPEG carrying an EXIF rotation): the previous version
+# (full-size encodes at quality 90, 80, 70... then 15% LANCZOS shrinks, each encoded) vs the
+# proxy-estimated quality search with one computed resize. Reports, per image, full-size and
+# proxy encodes, time and output size; exits 1 if an output is over the limit or not upright.
+# Fixtures are generated in memory, nothing is written to disk.
+#   python src/benchmarks/bench_image_recompress.py [megapixels]
+
+FIXTURES = [
+    # (name, format, grain, EXIF orientation, size relative to [megapixels])
+    ("png-grain", "PNG", 40, None, 1),
+    ("png-smooth", "PNG", 8, None, 1),
+    ("jpeg-q100", "JPEG", 40, None, 1),
+    ("jpeg-rotated", "JPEG", 40, 6, 1),
+    ("webp-lossless", "WEBP", 24, None, 1),
+    ("png-heavy", "PNG", 90, None, 1),
+    ("jpeg-heavy", "JPEG", 90, None, 1),
+    ("png-huge", "PNG", 128, None, 2),      # too big even at quality 40: scaled down
+    ("jpeg-huge", "JPEG", 128, 8, 2),
+]
+
+
+def photo_like(size, grain, seed):
+    # Gradients and soft shapes (the smooth part of a photo) plus gaussian grain (sensor noise,
+    # hair, fabric — what keeps big photos big).
+    from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+    rng = random.Random(seed)
+    width, height = size
+    base = Image.merge("RGB", [
+        Image.linear_gradient("L").resize(size).rotate(rng.choice((0, 90, 180)), expand=False).resize(size),
+        Image.radial_gradient("L").resize(size),
+        Image.linear_gradient("L").transpose(Image.Transpose.FLIP_TOP_BOTTOM).resize(size),
+    ])
+    shapes = Image.new("RGB", (width // 8, height // 8))
+    draw = ImageDraw.Draw(shapes)
+    for _ in range(40):
+        x, y = rng.randrange(width // 8), rng.randrange(height // 8)
+        r = rng.randrange(10, max(11, width // 40))
+        draw.ellipse((x - r, y - r, x + r, y + r),
+                     fill=tuple(rng.randrange(256) for _ in range(3)))
+    shapes = shapes.filter(ImageFilter.GaussianBlur(6)).resize(size, Image.BILINEAR)
+    image = Image.blend(base, shapes, 0.6)
+
+    noise = Image.merge("RGB", [Image.effect_noise(size, grain) for _ in range(3)])
+    return ImageChops.add(image, noise, scale=1.0, offset=-128)
+
+
+def fixture(name, fmt, grain, orientation, megapixels):
+    from PIL import Image
+
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    size = (width, width * 3 // 4)
+    image = photo_like(size, grain, seed=zlib.crc32(name.encode()))
+
+    buffer = io.BytesIO()
+    if fmt == "JPEG":
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        image.save(buffer, format="JPEG", quality=100, exif=exif.tobytes())
+    elif fmt == "WEBP":
+        image.save(buffer, format="WEBP", lossless=True, method=0)
+    else:
+        image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue(), size
+
+
+def legacy_ensure_uploadable_image(image_data, max_bytes, count):
+    # The previous implementation, with its encodes counted.
+    from PIL import Image
+
+    def save(img, **kwargs):
+        count["full"] += 1
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", optimize=True, **kwargs)
+        return buffer.getvalue()
+
+    with Image.open(io.BytesIO(image_data)) as img:
+        if img.mode in ("RGBA", "P"):
+            img = img.convert("RGB")
+        img.load()
+
+        quality = 90
+        while quality >= 40:
+            data = save(img, quality=quality)
+            if len(data) <= max_bytes:
+                return data, "jpg"
+            quality -= 10
+
+    while max(img.size) > 1000:
+        img = img.resize((int(img.width * 0.85), int(img.height * 0.85)), Image.LANCZOS)
+        data = save(img, quality=85)
+        if len(data) <= max_bytes:
+            return data, "jpg"
+
+    return data, "jpg"
+
+
+def main(megapixels=24):
+    from PIL import Image
+    import utils.image as image
+
+    count = {"full": 0, "proxy": 0}
+    encode = image._encode
+
+    def counted_encode(img, quality):
+        # Proxies are exactly PROXY_SIDE on their longer side; anything else is a full/shrunk encode.
+        count["proxy" if max(img.size) == image.PROXY_SIDE else "full"] += 1
+        return encode(img, quality)
+
+    image._encode = counted_encode
+
+    ok = True
+    print(f"limit {image.MAX_TWEET_IMAGE_BYTES / 1e6:.0f} MB, {megapixels} MP fixtures (huge: {megapixels * 2} MP)")
+    print(f"{'fixture':<14} {'input MB':>9} | {'old enc':>7} {'old s':>6} {'old MB':>7} | "
+          f"{'full enc':>8} {'proxy enc':>9} {'new s':>6} {'new MB':>7}")
+    totals = {"old": 0.0, "new": 0.0}
+    for name, fmt, grain, orientation, relative in FIXTURES:
+        data, size = fixture(name, fmt, grain, orientation, megapixels * relative)
+        upright = size[::-1] if orientation in (5, 6, 7, 8) else size
+
+        count.update(full=0, proxy=0)
+        start = time.perf_counter()
+        old_data, _ = legacy_ensure_uploadable_image(data, image.MAX_TWEET_IMAGE_BYTES, count)
+        old_s = time.perf_counter() - start
+        old_encodes = count["full"]
+
+        count.update(full=0, proxy=0)
+        start = time.perf_counter()
+        new_data, _ = image.ensure_uploadable_image(data)
+        new_s = time.perf_counter() - start
+        totals["old"] += old_s
+        totals["new"] += new_s
+
+        with Image.open(io.BytesIO(new_data)) as out:
+            out_size = out.size
+        # Upright: the output's aspect follows the displayed orientation, not the stored one.
+        aspect_ok = (out_size[0] >= out_size[1]) == (upright[0] >= upright[1])
+        fits = len(new_data) <= image.MAX_TWEET_IMAGE_BYTES
+        ok &= aspect_ok and fits
+
+        print(f"{name:<14} {len(data) / 1e6:9.1f} | {old_encodes:7} {old_s:6.2f} {len(old_data) / 1e6:7.1f} | "
+              f"{count['full']:8} {count['proxy']:9} {new_s:6.2f} {len(new_data) / 1e6:7.1f}"
+              f"{'' if fits else '  OVER LIMIT'}{'' if aspect_ok else '  NOT UPRIGHT'}")
+
+    print(f"{'total':<14} {'':>9} | {'':>7} {totals['old']:6.2f} {'':>7} | {'':>8} {'':>9} {totals['new']:6.2f}")
+
+    if not ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    import sys
+
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args)
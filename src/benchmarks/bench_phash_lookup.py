@@ -0,0 +1,75 @@
+import time
+import random
+
+import common  # noqa: F401  (puts src/ on the path)
+
+# Near-duplicate lookup cost at ingest: utils.hashing.HammingIndex (multi-index hashing, what
+# find_near_duplicate / the insert helpers use) vs comparing against every stored hash, over N
+# random 64-bit perceptual hashes. Queries are half near-duplicates (a stored hash with up to
+# PHASH_MAX_DISTANCE bits flipped) and half new hashes; both must agree on every answer.
+#   python src/benchmarks/bench_phash_lookup.py [photos] [queries]
+
+def linear_nearest(stored, value, max_distance):
+    from utils.hashing import hamming_distance
+
+    best = None
+    for item_id, other in stored:
+        distance = hamming_distance(value, other)
+        if distance <= max_distance and (best is None or (distance, item_id) < best):
+            best = (distance, item_id)
+    return best
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def main(photos=100_000, queries=2_000):
+    from utils.database_operations import PHASH_MAX_DISTANCE
+    from utils.hashing import HammingIndex
+
+    rng = random.Random(17)
+    stored = [(photo_id, rng.getrandbits(64)) for photo_id in range(1, photos + 1)]
+
+    start = time.perf_counter()
+    index = HammingIndex()
+    for photo_id, value in stored:
+        index.add(photo_id, value)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    probes = []
+    for n in range(queries):
+        if n % 2:
+            probes.append(rng.getrandbits(64))
+        else:
+            value = rng.choice(stored)[1]
+            for bit in rng.sample(range(64), rng.randint(0, PHASH_MAX_DISTANCE)):
+                value ^= 1 << bit
+            probes.append(value)
+
+    timings = {"index": [], "linear": []}
+    mismatches = 0
+    for value in probes:
+        start = time.perf_counter()
+        fast = index.nearest(value, PHASH_MAX_DISTANCE)
+        timings["index"].append((time.perf_counter() - start) * 1000)
+
+        if len(timings["linear"]) < 50:
+            start = time.perf_counter()
+            slow = linear_nearest(stored, value, PHASH_MAX_DISTANCE)
+            timings["linear"].append((time.perf_counter() - start) * 1000)
+            mismatches += fast != slow
+
+    print(f"{photos} stored hashes, max distance {PHASH_MAX_DISTANCE}, index built in {build_ms:.0f} ms")
+    print(f"{'lookup':<8} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, samples in timings.items():
+        print(f"{name:<8} {percentile(samples, 0.5):9.3f} {percentile(samples, 0.99):9.3f}")
+    print(f"answers checked against linear scan: {len(timings['linear'])}, mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    import sys
+
+    args = [int(arg) for arg in sys.argv[1:]]
+    sys.exit(main(*args))
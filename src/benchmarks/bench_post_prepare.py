@@ -0,0 +1,163 @@
+import io
+import os
+import time
+import sqlite3
+import tempfile
+import contextlib
+from types import SimpleNamespace
+
+from common import build_db
+
+# Latency at the posting moment: run_bots doing everything when it fires (R2 download + PIL
+# recompression + upload + tweet) vs after prepare_posts ran ahead (download and recompression
+# already in the local post cache, so the post only uploads and tweets), and with a plan gone
+# stale (the queue changed after preparing: the bot falls back to downloading). The photos are
+# over Twitter's 15 MB limit, so ensure_uploadable_image really recompresses them. R2 and Twitter
+# are local fakes with network-like latency. Exits 1 if any run posts fewer tweets than bots, a
+# post on its plan downloads anything, or a post on a stale plan doesn't.
+#   python src/benchmarks/bench_post_prepare.py [cycles]
+
+GET_LATENCY = 0.3                 # a 15+ MB object
+UPLOAD_LATENCY = 0.15
+TWEET_LATENCY = 0.1
+BOTS = ["GENERAL", "KARINA"]
+
+
+def big_image():
+    # A PNG of noise over MAX_TWEET_IMAGE_BYTES (noise doesn't compress).
+    from PIL import Image
+    from utils.image import MAX_TWEET_IMAGE_BYTES
+
+    side = 2400
+    while True:
+        buffer = io.BytesIO()
+        Image.frombytes("RGB", (side, side), os.urandom(side * side * 3)).save(buffer, format="PNG", compress_level=1)
+        if buffer.tell() > MAX_TWEET_IMAGE_BYTES:
+            return buffer.getvalue()
+        side += 200
+
+
+class FakeS3:
+    downloads = 0
+    image = b""
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def get_object(self, Bucket, Key):
+        time.sleep(GET_LATENCY)
+        FakeS3.downloads += 1
+        return {"Body": io.BytesIO(FakeS3.image)}
+
+    def delete_object(self, Bucket, Key):
+        pass
+
+
+class FakeTwitter:
+    tweets = 0
+
+    def media_upload(self, filename, file, additional_owners=None):
+        time.sleep(UPLOAD_LATENCY)
+        return SimpleNamespace(media_id=1, expires_after_secs=86400)
+
+    def create_tweet(self, text, media_ids):
+        time.sleep(TWEET_LATENCY)
+        FakeTwitter.tweets += 1
+        return {"id": FakeTwitter.tweets}
+
+
+def seed(count=6):
+    # `count` approved single photos of KARINA, PNG keys, leading her queue (and GENERAL's).
+    from utils.database_operations import get_connection, idol_signature
+
+    connect = get_connection()
+    with connect:
+        karina = connect.execute("SELECT id FROM idols WHERE key = 'karina'").fetchone()[0]
+        photo_ids = [row[0] for row in connect.execute(
+            "SELECT id FROM photos WHERE status = 'approved' ORDER BY id LIMIT ?", (count,))]
+        for n, photo_id in enumerate(photo_ids):
+            connect.execute("DELETE FROM photo_idols WHERE photo_id = ?", (photo_id,))
+            connect.execute("INSERT INTO photo_idols (photo_id, idol_id, confidence) VALUES (?, ?, 1.0)",
+                            (photo_id, karina))
+            connect.execute(
+                """
+                    UPDATE photos SET ai_score = ?, combo = NULL, idol_signature = ?,
+                                      r2_key = 'approved/bench-' || id || '.png'
+                    WHERE id = ?
+                """, (20 - n, idol_signature([karina]), photo_id)
+            )
+    return photo_ids
+
+
+def main(cycles=2):
+    import kpics_class
+    import utils.post_cache as post_cache
+    from bot import prepare_posts, run_bots
+    from utils.database_operations import get_connection
+
+    build_db(300)
+    photo_ids = seed()
+    FakeS3.image = big_image()
+    snapshot = sqlite3.connect(":memory:")
+    get_connection().backup(snapshot)
+
+    post_cache.POST_CACHE_DIR = post_cache.pathlib.Path(tempfile.mkdtemp(prefix="kpics-post-cache-"))
+    kpics_class.CycleContext._setup_s3 = lambda self: setattr(self, "s3", FakeS3())
+    kpics_class.KpopBot._setup_twitter = lambda bot: (setattr(bot, "api_v1", FakeTwitter()),
+                                                      setattr(bot, "client_v2", FakeTwitter()))
+
+    def clear_cache():
+        for path in post_cache.POST_CACHE_DIR.iterdir():
+            path.unlink()
+
+    def make_stale():
+        # An urgent photo approved after the plan was made: it jumps every queue.
+        with get_connection() as connect:
+            connect.execute("UPDATE photos SET urgent = 1, ai_score = 30 WHERE id = ?", (photo_ids[-1],))
+
+    ok = True
+    print(f"{len(BOTS)} bots, {len(FakeS3.image) / 1e6:.1f} MB images, R2 GET {GET_LATENCY * 1000:.0f} ms, "
+          f"upload {UPLOAD_LATENCY * 1000:.0f} ms, tweet {TWEET_LATENCY * 1000:.0f} ms, mean of {cycles}")
+    print(f"{'post':<12} {'prepare ms':>11} {'post ms':>9} {'downloads at post':>18}")
+    for name, prepare, after_prepare in (("on demand", False, None), ("prepared", True, None),
+                                         ("stale plan", True, make_stale)):
+        prepare_ms = post_ms = downloads = 0
+        for _ in range(cycles):
+            snapshot.backup(get_connection())
+            clear_cache()
+            FakeTwitter.tweets = 0
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                if prepare:
+                    prepare_posts(BOTS, workers=1)
+                prepare_ms += (time.perf_counter() - start) * 1000
+
+                if after_prepare:
+                    after_prepare()
+
+                FakeS3.downloads = 0
+                start = time.perf_counter()
+                run_bots(BOTS, workers=1)
+                post_ms += (time.perf_counter() - start) * 1000
+                downloads += FakeS3.downloads
+
+            if FakeTwitter.tweets != len(BOTS):
+                print(f"{name}: {FakeTwitter.tweets} tweet(s) for {len(BOTS)} bots")
+                ok = False
+
+        print(f"{name:<12} {prepare_ms / cycles:11.0f} {post_ms / cycles:9.0f} {downloads / cycles:18.1f}")
+
+        if prepare and bool(downloads) != bool(after_prepare):
+            print(f"{name}: {downloads} download(s) at post")
+            ok = False
+
+    if not ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    import sys
+
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,126 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from common import build_db
+
+# Property check for next_post_candidates: on randomized queues (urgent flags, ai_score ties,
+# copies, combos, reviewed_at aware / naive / missing / in the future, per-bot history, a last
+# GENERAL post) the SQL ordering must equal the Python reference — get_approved_photos for the
+# bot's idol (idol_key), sorted with utils.sorter.priority_sort(reverse=True), then filtered by
+# history and by GENERAL's last idol set, exactly like the old KpopBot._get_image. Exits 1 on any mismatch.
+#   python src/benchmarks/check_priority_order.py [rounds]
+
+BOTS = ["GENERAL", "WINTER", "KARINA", "NINGNING", "GISELLE"]
+
+
+def reference_order(bot_name):
+    from utils.database_operations import get_approved_photos, get_last_posted_image, get_log_history
+    from utils.sorter import priority_sort
+
+    queue = get_approved_photos(idol_key=None if bot_name == "GENERAL" else bot_name.lower())
+    queue = sorted(queue, key=lambda photo: photo["id"])
+    queue.sort(key=priority_sort, reverse=True)
+
+    last_post = get_last_posted_image(bot_name)
+    order = []
+    for photo in queue:
+        if bot_name in get_log_history(photo["key"]):
+            continue
+        if bot_name == "GENERAL" and last_post and last_post["last_idol"] == ", ".join(photo["idols"]):
+            continue
+        order.append(photo["id"])
+
+    return order
+
+
+def randomize(rng):
+    # Rewrite the approved rows' priority inputs and the history table with fresh random values.
+    from utils.database_operations import get_connection
+
+    connect = get_connection()
+    now = datetime.now(timezone.utc)
+
+    def reviewed_at():
+        choice = rng.random()
+        if choice < 0.1:
+            return None
+        # Whole-day offsets land exactly on the 7-day boundary; fractional ones cross midnights.
+        moment = now - timedelta(days=rng.choice([rng.randint(-2, 12), rng.uniform(-2, 12)]))
+        if choice < 0.4:
+            return moment.astimezone(timezone(timedelta(hours=-3))).replace(tzinfo=None).isoformat(sep=" ")
+        if choice < 0.7:
+            return moment.isoformat()
+        return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    with connect:
+        ids = [row[0] for row in connect.execute("SELECT id FROM photos WHERE bucket_stage = 'approved'")]
+        for photo_id in ids:
+            connect.execute(
+                "UPDATE photos SET urgent = ?, ai_score = ?, copies = ?, reviewed_at = ?, combo = ? WHERE id = ?",
+                (rng.choice([None, None, None, 0, 1]), rng.choice([None, 5, 7.5, round(rng.uniform(1, 10), 1)]),
+                 rng.choice([None, 0, 1, 2, 3]), reviewed_at(), rng.choice([None] * 6 + ["#1", "#2", "#3"]),
+                 photo_id)
+            )
+
+        connect.execute("DELETE FROM history")
+        rows = connect.execute(
+            """
+                SELECT p.r2_key, group_concat(i.key, ', ')
+                FROM photos p JOIN photo_idols pi ON pi.photo_id = p.id JOIN idols i ON i.id = pi.idol_id
+                WHERE p.bucket_stage = 'approved'
+                GROUP BY p.id ORDER BY p.id
+            """
+        ).fetchall()
+        for n, (r2_key, last_idol) in enumerate(rng.sample(rows, k=len(rows) // 4)):
+            connect.execute(
+                """
+                    INSERT OR IGNORE INTO history (file_key, bot_name, last_idol, posted_at)
+                    VALUES (?, ?, ?, datetime('now', ?))
+                """, (r2_key, rng.choice(BOTS), last_idol, f"-{n} minutes")
+            )
+
+
+def main(rounds=20):
+    from utils.database_operations import get_connection, next_post_candidates
+
+    build_db(400)
+    # Concentrate the queue on a few idols (1-2 each) so the idol bots have real candidates and
+    # GENERAL's last-idol rule has same-set photos to skip.
+    connect = get_connection()
+    rng = random.Random(11)
+    with connect:
+        idol_ids = [row[0] for row in connect.execute(
+            "SELECT id FROM idols WHERE key IN ('winter', 'karina', 'ningning', 'giselle')")]
+        for (photo_id,) in connect.execute("SELECT id FROM photos WHERE bucket_stage = 'approved'").fetchall():
+            linked = sorted(rng.sample(idol_ids, k=rng.choice((1, 1, 2))))
+            connect.execute("DELETE FROM photo_idols WHERE photo_id = ?", (photo_id,))
+            connect.executemany(
+                "INSERT INTO photo_idols (photo_id, idol_id, confidence) VALUES (?, ?, 1.0)",
+                [(photo_id, idol_id) for idol_id in linked]
+            )
+            connect.execute(
+                "UPDATE photos SET idol_signature = ? WHERE id = ?",
+                (",".join(str(idol_id) for idol_id in linked), photo_id)
+            )
+
+    failures = 0
+    for round_number in range(rounds):
+        randomize(rng)
+        for bot_name in BOTS:
+            expected = reference_order(bot_name)
+            actual = [photo["id"] for photo in next_post_candidates(bot_name, limit=None)]
+            if actual != expected:
+                failures += 1
+                print(f"round {round_number} {bot_name}: mismatch "
+                      f"(first diff at {next((n for n, pair in enumerate(zip(actual, expected)) if pair[0] != pair[1]), min(len(actual), len(expected)))}, "
+                      f"{len(actual)} vs {len(expected)} rows)")
+
+    print(f"{rounds} rounds x {len(BOTS)} bots: {'OK' if not failures else f'{failures} mismatch(es)'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = [int(arg) for arg in sys.argv[1:]]
+    sys.exit(main(*args))
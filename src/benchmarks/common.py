@@ -0,0 +1,119 @@
+import os
+import sys
+import json
+import time
+import random
+import pathlib
+import tempfile
+
+# Shared bootstrap for the benchmark scripts: point DB_FILE at a throwaway SQLite file BEFORE any
+# project module is imported (database_operations / init_db read it at import time), put src/ on
+# the path, and seed a synthetic catalogue + photo queue. Never touches the real database.
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent          # src/
+sys.path.insert(0, str(BASE_DIR))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="kpics-bench-")
+os.environ["DB_FILE"] = str(pathlib.Path(_TMP_DIR) / "bench.db")
+
+SEED_DATA = BASE_DIR / "data" / "database.json"
+
+
+def timed(fn, repeat=1):
+    # Wall time of `repeat` calls, in milliseconds.
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000
+
+
+class StatementCounter:
+    # Counts the SQL statements run on this thread's shared connection while active.
+    def __init__(self):
+        self.count = 0
+
+    def _trace(self, _statement):
+        self.count += 1
+
+    def __enter__(self):
+        from utils.database_operations import get_connection
+
+        get_connection().set_trace_callback(self._trace)
+        return self
+
+    def __exit__(self, *exc):
+        from utils.database_operations import get_connection
+
+        get_connection().set_trace_callback(None)
+
+
+def build_db(photos=1000, seed=7):
+    # Fresh schema + the real idol/group seed + `photos` synthetic rows (see add_photos).
+    from scripts.init_db import init_db
+    from utils.database_operations import get_connection, replace_idol_aliases
+
+    init_db()
+
+    with open(SEED_DATA, "r", encoding="utf-8") as file:
+        data = json.load(file)
+
+    connect = get_connection()
+    with connect:
+        for key, info in data.get("groups", {}).items():
+            connect.execute(
+                "INSERT OR IGNORE INTO groups (key, group_names, group_tags) VALUES (?, ?, ?)",
+                (key, json.dumps(info.get("group_names", []), ensure_ascii=False), info.get("group_tags", ""))
+            )
+        for key, info in data.get("idols", {}).items():
+            cursor = connect.execute(
+                """
+                    INSERT OR IGNORE INTO idols (key, idol_names, name_tags, group_id)
+                    VALUES (?, ?, ?, (SELECT id FROM groups WHERE key = ?))
+                """, (key, json.dumps(info.get("idol_names", []), ensure_ascii=False),
+                      info.get("name_tags", f"#{key}"), info.get("group"))
+            )
+            replace_idol_aliases(cursor, cursor.lastrowid, info.get("idol_names", []))
+
+    add_photos(photos, seed=seed)
+    return os.environ["DB_FILE"]
+
+
+def add_photos(photos, seed=7):
+    # Append `photos` synthetic rows spread over every pipeline state (pending/approved/posted/
+    # rejected), each linked to 1-2 idols. Numbering continues after the existing rows.
+    from utils.database_operations import get_connection
+
+    connect = get_connection()
+    with connect:
+        offset = connect.execute("SELECT COALESCE(MAX(id), 0) FROM photos").fetchone()[0]
+        rng = random.Random(seed + offset)
+        idol_ids = [row[0] for row in connect.execute("SELECT id FROM idols")]
+        states = [("pending", "analysis"), ("approved", "approved"),
+                  ("posted", "posted"), ("rejected", "rejected")]
+
+        for n in range(offset, offset + photos):
+            status, stage = rng.choice(states)
+            cursor = connect.execute(
+                """
+                    INSERT INTO photos (r2_key, bucket_stage, source, source_url, status, date,
+                                        ai_score, reviewed_at, copies, album_id)
+                    VALUES (?, ?, 'kpopping', ?, ?, '2025-09-30', ?, ?, 0, ?)
+                """, (f"{stage}/{n:08x}.jpg", stage, f"https://cdn.example/kpics/{n}.jpg", status,
+                      round(rng.uniform(1, 10), 2), "2025-10-01T12:00:00-03:00", f"album-{n // 20}")
+            )
+            for idol_id in rng.sample(idol_ids, k=min(len(idol_ids), rng.choice((1, 1, 1, 2)))):
+                connect.execute(
+                    "INSERT OR IGNORE INTO photo_idols (photo_id, idol_id, confidence) VALUES (?, ?, 1.0)",
+                    (cursor.lastrowid, idol_id)
+                )
+
+        # Same denormalized idol-set signature link_photo_idols maintains.
+        connect.execute(
+            """
+                UPDATE photos SET idol_signature = (
+                    SELECT group_concat(idol_id, ',') FROM (
+                        SELECT idol_id FROM photo_idols WHERE photo_id = photos.id ORDER BY idol_id
+                    )
+                )
+                WHERE id > ?
+            """, (offset,)
+        )
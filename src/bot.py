@@ -1,21 +1,75 @@
-from kpics_class import KpopBot
+import os
+from concurrent.futures import ThreadPoolExecutor
+from kpics_class import CycleContext, KpopBot
 
 # Current bots (idol_prefix) in production.
 ACTIVE_BOTS = ["GENERAL"]
 
+# Bots posting at the same time in one cycle (1 = one after another).
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", 4))
 
-def run_bots(active_bots=None):
+
+def _run_bot(idol_prefix, active_bots, cycle):
+    try:
+        bot = KpopBot(idol_prefix=idol_prefix, active_bots=active_bots, cycle=cycle)
+        bot.run()
+
+    except Exception as e:
+        print(f"Error running bot for {idol_prefix}: {e}.")
+
+
+def _prepare_bot(idol_prefix, active_bots, cycle):
+    try:
+        bot = KpopBot(idol_prefix=idol_prefix, active_bots=active_bots, cycle=cycle)
+        bot.prepare()
+
+    except Exception as e:
+        print(f"Error preparing post for {idol_prefix}: {e}.")
+
+
+def _each_bot(job, active_bots, workers):
+    # Run job(idol_prefix, active_bots, cycle) for every bot over one shared CycleContext, up to
+    # `workers` at a time.
+    workers = max(1, min(workers or BOT_WORKERS, len(active_bots)))
+
+    try:
+        cycle = CycleContext()
+
+    except Exception as e:
+        print(f"Error preparing the posting cycle: {e}.")
+        return
+
+    if workers == 1:
+        for idol_prefix in active_bots:
+            job(idol_prefix, active_bots, cycle)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bot") as pool:
+        for idol_prefix in active_bots:
+            pool.submit(job, idol_prefix, active_bots, cycle)
+
+
+def run_bots(active_bots=None, workers=None):
     # Run one posting cycle for each active bot. Shared by the manual entry (main, below) and the
     # in-process scheduler (api.main's bot-post job), so the posting logic lives in one place.
+    # The bots share one CycleContext: migrations checked once, one R2 client, each object's bytes
+    # downloaded once per cycle however many bots post it. Each bot's cycle is network-bound (R2,
+    # media upload, create_tweet), so up to `workers` (BOT_WORKERS) of them run at once; each
+    # account keeps its own tweet budget (utils.rate_limit), uploads share one process-wide cap
+    # (MAX_CONCURRENT_UPLOADS), and history is logged through log_posted_pack so the "every bot
+    # posted -> delete from R2" decision is made once per file.
     active_bots = active_bots or ACTIVE_BOTS
+    _each_bot(_run_bot, active_bots, workers)
 
-    for idol_prefix in active_bots:
-        try:
-            bot = KpopBot(idol_prefix=idol_prefix, active_bots=active_bots)
-            bot.run()
 
-        except Exception as e:
-            print(f"Error running bot for {idol_prefix}: {e}.")
+def prepare_posts(active_bots=None, workers=None):
+    # The posting cycle's slow part, run some minutes ahead of it (api.main's bot-prepare job):
+    # each bot's next post is picked, its images downloaded from R2 and normalized for Twitter into
+    # the local post cache (utils.post_cache), and the plan recorded (save_post_plan). run_bots then
+    # finds the bytes ready and only uploads and tweets; a plan gone stale (the queue changed in
+    # between) just means the images are fetched at posting time, as before.
+    active_bots = active_bots or ACTIVE_BOTS
+    _each_bot(_prepare_bot, active_bots, workers)
 
 
 def main():
@@ -3,10 +3,18 @@ import tweepy
 from dotenv import load_dotenv
 import io
 import os
-from utils.sorter import priority_sort
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from scripts.init_db import init_db
-from utils.database_operations import log_posted_image, get_log_history, get_last_posted_image, get_approved_photos, set_photo_posted, set_photo_rejected
-from utils.image import ensure_uploadable_image
+from utils.database_operations import (
+    cache_media, forget_media, get_cached_media, get_log_histories, get_post_plan, log_posted_pack,
+    next_post_candidates, save_post_plan, set_object_posted, set_photo_rejected,
+)
+from utils import post_cache
+from utils.image import ensure_uploadable_image_pooled
+from utils.rate_limit import posting_budget
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
@@ -15,14 +23,164 @@ load_dotenv()
 BUCKET_NAME = os.getenv('R2_BUCKET_NAME')
 TIMEZONE_BRT = ZoneInfo("America/Sao_Paulo")
 
+# Upper bound on the R2 object bytes one posting cycle keeps in memory (CycleContext).
+CYCLE_CACHE_BYTES = int(os.getenv("CYCLE_CACHE_MB", 64)) * 1024 * 1024
+
+# Images of one post (a combo has up to 4) downloaded, recompressed and uploaded at the same time.
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", 4))
+
+# Media uploads in flight across every bot of the process (run_bots posts for several at once).
+MAX_CONCURRENT_UPLOADS = int(os.getenv("MAX_CONCURRENT_UPLOADS", 4))
+_upload_slots = threading.BoundedSemaphore(MAX_CONCURRENT_UPLOADS)
+
+# How long Twitter keeps uploaded media attachable when the upload response doesn't say.
+MEDIA_LIFETIME_SECONDS = 24 * 60 * 60
+
+def account_user_id(idol_prefix):
+    # The bot account's numeric Twitter user id, for media/upload's additional_owners: from
+    # {prefix}_TWITTER_USER_ID, else the id an OAuth 1.0a access token starts with ("<id>-...").
+    # None when neither is available (the media is then not shared with that account).
+    user_id = os.getenv(f'{idol_prefix}_TWITTER_USER_ID')
+    if user_id:
+        return user_id
+
+    token = os.getenv(f'{idol_prefix}_TWITTER_ACCESS_TOKEN') or ""
+    prefix = token.split("-", 1)[0]
+    return prefix if "-" in token and prefix.isdigit() else None
+
 def get_current_date():
     now = datetime.now(TIMEZONE_BRT).replace(microsecond=0)
     return now.strftime("%d/%m/%Y %H:%M:%S")
 
+class CycleContext:
+    # What the bots of one run_bots cycle share: the migration check (once), one R2 client, and the
+    # objects downloaded so far. A photo tagged with several idols is posted by GENERAL and each of
+    # those idol bots, usually in the same cycle, so its bytes are fetched from R2 once and served
+    # from memory after that (least recently used first out past max_cache_bytes). Each bot still
+    # asks the DB for its own next post (next_post_candidates: one indexed query, not a queue load).
+    def __init__(self, max_cache_bytes=CYCLE_CACHE_BYTES):
+        self.max_cache_bytes = max_cache_bytes
+        self.s3 = None
+        self.downloads = 0
+        self._objects = OrderedDict()
+        self._cached_bytes = 0
+        # Objects are fetched from several threads at once (a post's images, several bots).
+        self._lock = threading.Lock()
+        self._fetching = {}
+        self._media = {}
+
+        init_db()
+        self._setup_s3()
+
+    # Cloudflare R2 / Boto3 setup
+    def _setup_s3(self):
+        try:
+            self.s3 = boto3.client(
+                service_name='s3',
+                endpoint_url= os.getenv('R2_ENDPOINT_URL'),
+                aws_access_key_id=os.getenv('R2_ACCESS_KEY_ID'),
+                aws_secret_access_key=os.getenv('R2_SECRET_ACCESS_KEY'),
+                region_name="auto",
+            )
+
+            print("Cloudflare R2 set up successfully.")
+
+        except Exception as e:
+            print(f"Error setting up Cloudflare R2: {e}")
+            self.s3 = None
+
+    def get_object(self, key):
+        # The object's bytes, from this cycle's cache or R2 (errors such as NoSuchKey propagate).
+        # The download itself runs outside the lock, so different objects are fetched side by side;
+        # a thread asking for an object another one is already fetching waits for that download.
+        with self._lock:
+            if key in self._objects:
+                self._objects.move_to_end(key)
+                return self._objects[key]
+
+            pending = self._fetching.get(key)
+            if pending is None:
+                pending = self._fetching[key] = Future()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            return pending.result()
+
+        try:
+            data = self.s3.get_object(Bucket=BUCKET_NAME, Key=key)['Body'].read()
+
+        except Exception as e:
+            with self._lock:
+                del self._fetching[key]
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            self.downloads += 1
+            del self._fetching[key]
+
+            if len(data) <= self.max_cache_bytes:
+                self._objects[key] = data
+                self._cached_bytes += len(data)
+                while self._cached_bytes > self.max_cache_bytes:
+                    _, evicted = self._objects.popitem(last=False)
+                    self._cached_bytes -= len(evicted)
+
+        pending.set_result(data)
+        return data
+
+    def forget(self, key):
+        # The object was deleted from R2: drop its bytes too.
+        with self._lock:
+            data = self._objects.pop(key, None)
+            if data is not None:
+                self._cached_bytes -= len(data)
+
+    def shared_media(self, key, upload):
+        # The (media_id, owner bots) uploaded for key this cycle. The first bot to ask runs
+        # upload() (KpopBot._upload_image); bots asking meanwhile wait for it instead of uploading
+        # the same image again. A failed upload (None) isn't kept, so the next bot tries itself.
+        with self._lock:
+            pending = self._media.get(key)
+            if pending is None:
+                pending = self._media[key] = Future()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            return pending.result()
+
+        try:
+            result = upload()
+
+        except Exception as e:
+            print(f"Error uploading media for {key}: {e}")
+            result = None
+
+        if result is None:
+            with self._lock:
+                del self._media[key]
+
+        pending.set_result(result)
+        return result
+
+    def forget_media(self, keys):
+        # Twitter refused media uploaded for these keys: don't hand it out again this cycle.
+        with self._lock:
+            for key in keys:
+                pending = self._media.get(key)
+                if pending is not None and pending.done():
+                    del self._media[key]
+
 class KpopBot:
-    def __init__(self, idol_prefix, active_bots):
+    def __init__(self, idol_prefix, active_bots, cycle=None):
         self.idol_prefix = idol_prefix
         self.active_bots = active_bots
+        # Shared with the cycle's other bots (run_bots); a bot run on its own builds one in run().
+        self.cycle = cycle
 
         # Initialize connections
         self.s3 = None
@@ -33,9 +191,10 @@ class KpopBot:
 
     # Running the bot
     def run(self):
-        init_db()
-        
-        self._setup_s3()
+        if self.cycle is None:
+            self.cycle = CycleContext()
+
+        self.s3 = self.cycle.s3
         self._setup_twitter()
 
         if not self.s3 or not self.api_v1 or not self.client_v2:
@@ -43,25 +202,51 @@ class KpopBot:
             return
         
         self._upload_media()   
-                
-    # PHASE 1 - Initialization - Setup
-    # Cloudflare R2 / Boto3 setup
-    def _setup_s3(self):
+
+    # Ahead of the post (bot.prepare_posts): pick this bot's next post, download and normalize its
+    # images into the local post cache, and record the plan. Needs R2 only, not Twitter.
+    def prepare(self):
+        if self.cycle is None:
+            self.cycle = CycleContext()
+
+        self.s3 = self.cycle.s3
+
+        if not self.s3:
+            print(f"Setup incomplete for {self.idol_prefix}. Nothing prepared.")
+            return
+
+        post_pack = self._get_image()
+
+        if not post_pack:
+            return
+
+        with ThreadPoolExecutor(max_workers=max(1, min(MEDIA_WORKERS, len(post_pack))),
+                                thread_name_prefix=f"prepare-{self.idol_prefix}") as pool:
+            prepared = list(pool.map(self._prepare_file, post_pack))
+
+        keys = [filename['key'] for filename in post_pack]
+        save_post_plan(self.idol_prefix, keys)
+        print(f"Prepared next post for {self.idol_prefix}: {keys} ({sum(prepared)}/{len(keys)} image(s) cached).")
+
+    def _prepare_file(self, filename):
+        # Upload-ready bytes of one image into the post cache (already there: nothing to do).
+        if post_cache.contains(filename['key']):
+            return True
+
+        image_data = self._download_image(filename)
+
+        if image_data is None:
+            return False
+
         try:
-            self.s3 = boto3.client(
-                service_name='s3',
-                endpoint_url= os.getenv('R2_ENDPOINT_URL'),
-                aws_access_key_id=os.getenv('R2_ACCESS_KEY_ID'),
-                aws_secret_access_key=os.getenv('R2_SECRET_ACCESS_KEY'),
-                region_name="auto",
-            )
+            image_data, new_ext = ensure_uploadable_image_pooled(image_data)
+            return post_cache.store(filename['key'], image_data, new_ext or filename['key'].rsplit('.', 1)[-1])
 
-            print("Cloudflare R2 set up successfully.")
-        
         except Exception as e:
-            print(f"Error setting up Cloudflare R2: {e}")
-            self.s3 = None
-        
+            print(f"Error preparing image {filename['key']}: {e}")
+            return False
+
+    # PHASE 1 - Initialization - Setup (R2 comes from the cycle context)
     # Twitter API setup
     def _setup_twitter(self):
         try:
@@ -87,65 +272,24 @@ class KpopBot:
             self.api_v1 = None
             self.client_v2 = None
 
-    # Pull the approved queue from the DB (source of truth), then pick what to post.
-    # The bytes still come from R2 in _download_image; only the metadata source changed (DB rows
-    # instead of parsing the R2 file name).
-    def _get_image(self, target_file=None):
+    # Ask the DB for this bot's next post. Filtering (bot's idol, own history, GENERAL's last idol
+    # set) and priority ordering happen in SQL (next_post_candidates), so the bot no longer loads
+    # and sorts the whole approved queue each run; utils.sorter.priority_sort stays the reference
+    # ordering. The bytes still come from R2 in _download_image.
+    def _get_image(self):
         try:
-            self.idols_list = []
-            for data in get_approved_photos():
-                if target_file and data['key'] != target_file:
-                    continue
-                # The r2_key is now an opaque object key, not the old name-encoded metadata.
-                is_general = self.idol_prefix == "GENERAL"
-                is_match = self.idol_prefix.lower() in [idol.lower() for idol in data['idols']]
-
-                if is_general or is_match:
-                    self.idols_list.append(data)
-
-            if not self.idols_list:
-                print("No approved images found in the pipeline.")
-                return None
-
-            self.idols_list.sort(key=priority_sort, reverse=True)
-
-            last_post = get_last_posted_image(self.idol_prefix)
-            file_name = None
-
-            for file in self.idols_list:
-                history = get_log_history(file['key'])
-                if self.idol_prefix in history:
-                    continue
-
-                if self.idol_prefix == "GENERAL":
-
-                    current_idol = ", ".join(file['idols']) if isinstance(file['idols'], list) else file['idols']
-                    if last_post and last_post['last_idol'] == current_idol:
-                        print(f"Skipping file {file['key']} -> posted this photo recently with GENERAL bot.")
-                        continue
-
-                file_name = file
-                break
-
-            if not file_name:
+            candidates = next_post_candidates(self.idol_prefix, limit=1)
+            if not candidates:
                 print("No new images to post found for this bot.")
                 return None
 
+            file_name = candidates[0]
+
             # A manual combo (built on the approval screen) groups 2-4 photos of the same idol(s)
             # into one multi-image tweet, ordered by `copies`, capped at 4. `album_id` is only
             # provenance now. A photo with no combo posts on its own.
             if file_name['combo']:
-                post_pack = [file for file in self.idols_list
-                             if file.get('combo') == file_name.get('combo')
-                             and file.get('idols') == file_name.get('idols')]
-                seen_ids = set()
-                deduped_post_pack = []
-                for file in post_pack:
-                    if file['id'] not in seen_ids:
-                        seen_ids.add(file['id'])
-                        deduped_post_pack.append(file)
-
-                return sorted(deduped_post_pack, key=lambda x: int(x.get('copies') or 0))[:4]
+                return file_name['pack']
 
             return [file_name]
 
@@ -153,53 +297,154 @@ class KpopBot:
             print(f"Error building the post queue: {e}")
             return None
         
-    def _download_image(self):
-        post_pack = self._get_image()
+    def _download_image(self, filename):
+        # One image's bytes (None if it can't be fetched; a missing object retires its photo).
+        try:
+            print(f"Downloading image {filename['key']}...")
+            image_data = self.cycle.get_object(filename['key'])
+            print(f"Image {filename['key']} downloaded successfully from R2.")
+            return image_data
 
-        if not post_pack:
-            return None
-        
-        media_data = []
+        except self.s3.exceptions.NoSuchKey:
+            print(f"Image {filename['key']} not found in R2. Retiring stale photo {filename.get('id')}.")
+            if filename.get('id'):
+                set_photo_rejected(filename['id'], reviewed_by="auto-missing")
 
+        except Exception as e:
+            print(f"Error downloading images {filename['key']} from Cloudflare R2: {e}")
+
+        return None
+
+    def _needed_bots(self, filename):
+        # The active bots that post this file: GENERAL and the bot of each idol in it.
+        idols_list = filename['idols'] if isinstance(filename['idols'], list) else [filename['idols']]
+        potential_bots = ["GENERAL"] + [idol.upper() for idol in idols_list]
+        return [bot for bot in potential_bots if bot in self.active_bots]
+
+    def _upload_image(self, filename, other_bots, record=True, planned=False):
+        # Download, recompress if over Twitter's limit, and upload one image, owned by this account
+        # and each of `other_bots` with a known user id, then record the media_id for them
+        # (cache_media) unless `record` is off. Returns (media_id, owner bots), or None if any step
+        # failed. In a `planned` post (the pack the preparation job readied) the prepared bytes
+        # (post cache) skip the download and the recompression.
+        prepared = post_cache.load(filename['key']) if planned else None
+
+        if prepared:
+            image_data, ext = prepared
+        else:
+            image_data = self._download_image(filename)
+
+            if image_data is None:
+                return None
 
-        for filename in post_pack:
-            try:
-                print(f"Downloading image {filename['key']}...")
-                response_object = self.s3.get_object(Bucket=BUCKET_NAME, Key=filename['key'])
-                image_data = response_object['Body'].read()
-                print(f"Image {filename['key']} downloaded successfully from R2.")
-                media_data.append((filename, image_data))
+        try:
+            owners = [self.idol_prefix]
+            owner_ids = []
+            for bot in other_bots:
+                user_id = account_user_id(bot)
+                if user_id:
+                    owners.append(bot)
+                    owner_ids.append(user_id)
+
+            if prepared:
+                new_ext = ext if ext != filename['key'].rsplit('.', 1)[-1] else None
+            else:
+                image_data, new_ext = ensure_uploadable_image_pooled(image_data)
+            upload_name = filename['key'] if not new_ext else filename['key'].rsplit('.', 1)[0] + '.' + new_ext
+            with _upload_slots:
+                media = self.api_v1.media_upload(
+                    filename=upload_name,
+                    file=io.BytesIO(image_data),
+                    additional_owners=owner_ids or None
+                )
 
-            except self.s3.exceptions.NoSuchKey:
-                print(f"Image {filename['key']} not found in R2. Retiring stale photo {filename.get('id')}.")
-                if filename.get('id'):
-                    set_photo_rejected(filename['id'], reviewed_by="auto-missing")
+            lifetime = getattr(media, 'expires_after_secs', None) or MEDIA_LIFETIME_SECONDS
+            if record:
+                cache_media(filename['key'], media.media_id, owners, time.time() + lifetime)
+            return media.media_id, owners
 
-            except Exception as e:
-                print(f"Error downloading images {filename['key']} from Cloudflare R2: {e}")
-                continue
+        except Exception as e:
+            print(f"Error uploading image {filename['key']} to Twitter: {e}")
+            return None
 
-        return media_data or None
+    def _prepare_media(self, filename, cached_id, history, planned):
+        # This image's media id for the tweet, or None if it failed (_post_pack then holds the whole
+        # post back). Media another bot already uploaded for this account (DB cache, or this
+        # cycle's upload) is attached as is; otherwise it is uploaded once for this bot and every
+        # other bot still due to post the file.
+        if cached_id:
+            print(f"Reusing uploaded media {cached_id} for {filename['key']}.")
+            return cached_id
+
+        other_bots = [bot for bot in self._needed_bots(filename)
+                      if bot != self.idol_prefix and bot not in history]
+        shared = self.cycle.shared_media(filename['key'],
+                                         lambda: self._upload_image(filename, other_bots, planned=planned))
+        if shared and self.idol_prefix in shared[1]:
+            return shared[0]
+
+        # Uploaded by a bot that couldn't share it with this account: upload our own copy (not
+        # recorded, so the shared one stays cached for its owners).
+        own = self._upload_image(filename, [], record=False, planned=planned)
+        return own[0] if own else None
 
     def _upload_media(self):
-        media_data = self._download_image()
-        
-        if not media_data:
+        post_pack = self._get_image()
+
+        if not post_pack:
             return None
-        
-        media_ids = []
-            
+
+        # The preparation job's plan for this bot: its prepared bytes are used only if the next post
+        # is still exactly that pack; otherwise (stale plan, or none) the images are fetched now.
+        plan = get_post_plan(self.idol_prefix)
+        planned = plan == [filename['key'] for filename in post_pack]
+        if plan is not None and not planned:
+            print(f"Post plan for {self.idol_prefix} is stale ({plan}); preparing now.")
+
+        # One post of this account's daily tweet budget, taken before any upload work; once the
+        # post is over it is counted from history if the tweet went out, given back otherwise.
+        budget = posting_budget(self.idol_prefix)
+        if not budget.try_acquire():
+            print(f"Posting limit reached for {self.idol_prefix}; next post in {budget.wait_seconds() / 60:.0f} min.")
+            return None
+
         try:
-            for filename, image_data in media_data:
-                post_date = get_current_date()
-                image_data, new_ext = ensure_uploadable_image(image_data)
-                upload_name = filename['key'] if not new_ext else filename['key'].rsplit('.', 1)[0] + '.' + new_ext
-                media = self.api_v1.media_upload(
-                    filename=upload_name, 
-                    file=io.BytesIO(image_data)
-                )
-                media_ids.append(media.media_id)
+            self._post_pack(post_pack, planned)
+        finally:
+            budget.release()
+
+    def _post_pack(self, post_pack, planned=False):
+        # Upload the pack's images and tweet them; True once the tweet is out. A combo's images go
+        # through download -> recompress -> upload side by side (boto3 and tweepy calls are blocking
+        # I/O), bounded by MEDIA_WORKERS. map() keeps `copies` order for the media ids whatever
+        # order the uploads finish in.
+        keys = [filename['key'] for filename in post_pack]
+        cached = get_cached_media(keys, self.idol_prefix)
+        histories = get_log_histories(keys)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(MEDIA_WORKERS, len(post_pack))),
+                                thread_name_prefix=f"media-{self.idol_prefix}") as pool:
+            prepared = list(pool.map(
+                lambda filename: self._prepare_media(filename, cached.get(filename['key']),
+                                                     histories.get(filename['key'], set()), planned),
+                post_pack
+            ))
+
+        # Any failed image holds back the whole post: the pack is built from combo siblings
+        # whatever this bot posted of them, so a partial tweet now would post the rest again next
+        # cycle. The uploads that worked are cached (cache_media) for that retry; a photo retired
+        # as missing from R2 drops out of the pack.
+        if any(media_id is None for media_id in prepared):
+            print(f"Not posting {keys} for {self.idol_prefix}: {prepared.count(None)} image(s) failed; retrying next cycle.")
+            return False
+
+        media_data = list(zip(post_pack, prepared))
+
+        media_ids = [media_id for _, media_id in media_data]
+        tweet = None
 
+        try:
+            post_date = get_current_date()
             first_file = media_data[0][0]
 
             tweet = self.client_v2.create_tweet(
@@ -208,41 +453,41 @@ class KpopBot:
             )
 
             if tweet:
-                print(f"Tweet posted successfully for {self.idol_prefix} of filename(s) -> {[file['key'] for file, _ in media_data]}, At {post_date}, ID: {media.media_id}")
+                print(f"Tweet posted successfully for {self.idol_prefix} of filename(s) -> {[file['key'] for file, _ in media_data]}, At {post_date}, media IDs: {media_ids}")
 
+                posts = []
                 for filename, _ in media_data:
-                    idols_string = ", ".join(filename['idols']) if isinstance(filename['idols'], list) else filename['idols']
-
-                    log_posted_image(
-                        file_key=filename['key'],
-                        bot_name=self.idol_prefix,
-                        last_idol=idols_string
-                    )
-
                     idols_list = filename['idols'] if isinstance(filename['idols'], list) else [filename['idols']]
+                    posts.append((filename['key'], ", ".join(idols_list), self._needed_bots(filename)))
 
-                    potential_bots = ["GENERAL"] + [idol.upper() for idol in idols_list]
-                    needed_bots = [bot for bot in potential_bots if bot in self.active_bots]
+                # Log the post and learn which files it was the last needed post of, atomically with
+                # the other bots posting the same files at the same time (see log_posted_pack).
+                missing_by_key = log_posted_pack(self.idol_prefix, posts)
 
-                    history = get_log_history(filename['key'])
+                for file_key, _, _ in posts:
+                    missing = missing_by_key.get(file_key)
 
-                    if all(bot in history for bot in needed_bots):
-                        
-                        self.s3.delete_object(
-                            Bucket=BUCKET_NAME,
-                            Key=filename['key']
-                        )
+                    if missing == []:
 
-                        # Bytes are gone and every relevant bot has posted: retire the DB row too,
-                        # so the approved queue no longer points at a deleted object.
-                        if filename.get('id'):
-                            set_photo_posted(filename['id'])
+                        # Every relevant bot has posted: retire the DB row(s) on this key first, so
+                        # the approved queue never points at a deleted object, then delete the bytes
+                        # unless a still-pending photo shares them (content-addressed storage).
+                        still_needed = set_object_posted(file_key)
 
-                        print(f"Image {filename['key']} deleted successfully from R2 after tweeting.")
+                        if still_needed == 0:
+                            self.s3.delete_object(
+                                Bucket=BUCKET_NAME,
+                                Key=file_key
+                            )
+                            self.cycle.forget(file_key)
+                            post_cache.discard(file_key)
+                            print(f"Image {file_key} deleted successfully from R2 after tweeting.")
 
-                    else:
-                        missing = [bot for bot in needed_bots if bot not in history]
-                        print(f"Image {filename['key']} not deleted yet. Missing bot(s): {missing}.")
+                        else:
+                            print(f"Image {file_key} kept in R2: still used by another photo.")
+
+                    elif missing:
+                        print(f"Image {file_key} not deleted yet. Missing bot(s): {missing}.")
 
             # print("Bot simulation")
             # print(f"Idol bot: {self.idol_prefix}")
@@ -251,7 +496,6 @@ class KpopBot:
             # print(f"Text tweet: \n{first_file['text']}")
             # print(f"Post date: {post_date}")
             # print(f"Media IDs: {media_ids}")
-            # print(f"Image data: {[len(image_data) for _, image_data in media_data]} bytes")
             # print(f"Would log posted image(s) for {[file['key'] for file, _ in media_data]} under bot {self.idol_prefix}.")
             # print(f"Would delete image {[filename['key'] for filename, _ in media_data]} from R2 after tweeting.")
             # print(f"Simulation complete for {self.idol_prefix} bot.")
@@ -260,6 +504,14 @@ class KpopBot:
         except Exception as e:
             print(f"Error posting tweet: {e}")
 
+        if not tweet:
+            # The media may be what Twitter refused (expired, not owned): upload afresh next time.
+            used = [filename['key'] for filename, _ in media_data]
+            forget_media(used)
+            self.cycle.forget_media(used)
+
+        return bool(tweet)
+
 
 # Prior code
 
@@ -0,0 +1,34 @@
+-- 0003_hot_lookup_indexes.sql
+-- Secondary indexes for the pipeline's hot lookups, which were all full table scans and got
+-- slower as rejected/posted rows piled up:
+--   photo_exists_by_source_url      -> photos(source_url)            (dedup, every status)
+--   get_pending_photos              -> photos(status, created_at)    (newest-first queue; id rides
+--                                                                     along as the rowid)
+--   get_photos_pending_score        -> partial, only unscored pending rows
+--   get_approved_photos             -> photos(bucket_stage)
+--   clear_combo / combo numbering   -> partial, only rows that carry a combo
+--   get_last_posted_image           -> history(bot_name, posted_at)
+--   photo_idols reverse join        -> photo_idols(idol_id)          (PK only covers photo_id first)
+-- history(file_key) lookups are already covered by the UNIQUE(file_key, bot_name) index.
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_photos_source_url ON photos(source_url);
+CREATE INDEX IF NOT EXISTS idx_photos_status_created ON photos(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_photos_pending_score ON photos(created_at)
+    WHERE status = 'pending' AND ai_score IS NULL;
+CREATE INDEX IF NOT EXISTS idx_photos_bucket_stage ON photos(bucket_stage);
+CREATE INDEX IF NOT EXISTS idx_photos_combo ON photos(combo) WHERE combo IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_history_bot_posted ON history(bot_name, posted_at);
+CREATE INDEX IF NOT EXISTS idx_photo_idols_idol ON photo_idols(idol_id);
+
+COMMIT;
+
+-- DOWN
+DROP INDEX IF EXISTS idx_photos_source_url;
+DROP INDEX IF EXISTS idx_photos_status_created;
+DROP INDEX IF EXISTS idx_photos_pending_score;
+DROP INDEX IF EXISTS idx_photos_bucket_stage;
+DROP INDEX IF EXISTS idx_photos_combo;
+DROP INDEX IF EXISTS idx_history_bot_posted;
+DROP INDEX IF EXISTS idx_photo_idols_idol;
@@ -0,0 +1,40 @@
+-- 0004_catalog_version.sql
+-- A single-row version counter for the idol/group catalogue. database_operations caches the whole
+-- catalogue in memory and reloads it only when this number moves, so every process (API, bot,
+-- local scripts) picks up a new idol without re-reading the tables on every lookup.
+-- The counter is bumped by triggers, so every writer (create_idol, set_idol_kpopping,
+-- scripts/migrate_json.py, a manual sqlite3 session) invalidates the cache in its own transaction.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_idols_insert_version AFTER INSERT ON idols
+BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_idols_update_version AFTER UPDATE ON idols
+BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_idols_delete_version AFTER DELETE ON idols
+BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_groups_insert_version AFTER INSERT ON groups
+BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_groups_update_version AFTER UPDATE ON groups
+BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_groups_delete_version AFTER DELETE ON groups
+BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END;
+
+COMMIT;
+
+-- DOWN
+DROP TRIGGER IF EXISTS trg_idols_insert_version;
+DROP TRIGGER IF EXISTS trg_idols_update_version;
+DROP TRIGGER IF EXISTS trg_idols_delete_version;
+DROP TRIGGER IF EXISTS trg_groups_insert_version;
+DROP TRIGGER IF EXISTS trg_groups_update_version;
+DROP TRIGGER IF EXISTS trg_groups_delete_version;
+DROP TABLE IF EXISTS catalog_version;
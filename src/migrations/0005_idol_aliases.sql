@@ -0,0 +1,27 @@
+-- 0005_idol_aliases.sql
+-- Persistent, normalized alias index for resolving source-metadata names (Kpopping profile-link
+-- names, /photos/register idols) to idols with one indexed IN (...) lookup, instead of decoding every
+-- idol's idol_names JSON per call. alias_norm is utils.names.normalize_alias(name) (NFKC + casefold
+-- + kana/width folding); the migration runner registers it as a SQL function for the backfill.
+-- Kept in sync by create_idol and scripts/migrate_json.py. An alias shared by two idols keeps both
+-- rows; resolution picks the later idol, matching the old lookup.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS idol_aliases (
+    alias_norm TEXT NOT NULL,
+    idol_id INTEGER NOT NULL REFERENCES idols(id),
+    PRIMARY KEY (alias_norm, idol_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_idol_aliases_idol ON idol_aliases(idol_id);
+
+INSERT OR IGNORE INTO idol_aliases (alias_norm, idol_id)
+SELECT normalize_alias(j.value), i.id
+FROM idols i, json_each(i.idol_names) j
+WHERE i.idol_names IS NOT NULL AND normalize_alias(j.value) != '';
+
+COMMIT;
+
+-- DOWN
+DROP TABLE IF EXISTS idol_aliases;
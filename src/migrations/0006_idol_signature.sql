@@ -0,0 +1,39 @@
+-- 0006_idol_signature.sql
+-- Canonical idol-set signature per photo + a per-signature combo counter, so create_combo finds
+-- "photos of exactly these idols" and the next combo number with indexed lookups instead of
+-- reading every combo photo's idol links inside the write transaction.
+--   photos.idol_signature = the photo's idol ids, ascending, comma-joined ("3,7"); NULL if unlinked.
+--                           Maintained by link_photo_idols.
+--   combo_counters        = last combo number handed out per signature (numbers are shared by
+--                           D/T/Q, like before, and never reused).
+-- Backfill: signatures from photo_idols (group_concat over an ordered subquery keeps that order),
+-- counters from the highest number already used per signature.
+
+BEGIN;
+
+ALTER TABLE photos ADD COLUMN idol_signature TEXT;
+
+UPDATE photos SET idol_signature = (
+    SELECT group_concat(idol_id, ',')
+    FROM (SELECT idol_id FROM photo_idols WHERE photo_id = photos.id ORDER BY idol_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_photos_idol_signature ON photos(idol_signature);
+
+CREATE TABLE IF NOT EXISTS combo_counters (
+    idol_signature TEXT PRIMARY KEY,
+    last_number INTEGER NOT NULL
+) WITHOUT ROWID;
+
+INSERT OR REPLACE INTO combo_counters (idol_signature, last_number)
+SELECT idol_signature, MAX(CAST(substr(combo, 2) AS INTEGER))
+FROM photos
+WHERE combo IS NOT NULL AND idol_signature IS NOT NULL
+GROUP BY idol_signature;
+
+COMMIT;
+
+-- DOWN
+DROP TABLE IF EXISTS combo_counters;
+DROP INDEX IF EXISTS idx_photos_idol_signature;
+ALTER TABLE photos DROP COLUMN idol_signature;
@@ -0,0 +1,35 @@
+-- 0007_photo_tweet_text.sql
+-- The rendered tweet text is stored on the photo row when it is approved (set_photo_approved), so
+-- the posting path reads it instead of rebuilding every approved photo's text on every bot run.
+-- NULL means "render it": rows approved before this migration, and rows whose text went stale
+-- because an idol or group it mentions was edited — the triggers below clear exactly those, and
+-- get_approved_photos re-renders and stores them on its next read.
+
+BEGIN;
+
+ALTER TABLE photos ADD COLUMN tweet_text TEXT;
+
+CREATE TRIGGER IF NOT EXISTS trg_idols_text_stale
+AFTER UPDATE OF idol_names, name_tags, group_id ON idols
+BEGIN
+    UPDATE photos SET tweet_text = NULL
+    WHERE tweet_text IS NOT NULL
+      AND id IN (SELECT photo_id FROM photo_idols WHERE idol_id = NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_groups_text_stale
+AFTER UPDATE OF key, group_names, group_tags ON groups
+BEGIN
+    UPDATE photos SET tweet_text = NULL
+    WHERE tweet_text IS NOT NULL
+      AND id IN (SELECT pi.photo_id FROM photo_idols pi
+                 JOIN idols i ON pi.idol_id = i.id
+                 WHERE i.group_id = NEW.id);
+END;
+
+COMMIT;
+
+-- DOWN
+DROP TRIGGER IF EXISTS trg_idols_text_stale;
+DROP TRIGGER IF EXISTS trg_groups_text_stale;
+ALTER TABLE photos DROP COLUMN tweet_text;
@@ -0,0 +1,53 @@
+-- 0008_photo_archive.sql
+-- Terminal photos (rejected / posted) older than ARCHIVE_AFTER_DAYS are moved out of the hot
+-- tables by archive_terminal_photos (scheduled from api.main.build_scheduler): the full rows go to
+-- photos_archive / photo_idols_archive, and each one's source_url survives in the hot path only as
+-- a 64-bit hash in seen_sources (8 bytes per key, INTEGER PRIMARY KEY = the rowid, no extra index),
+-- which photo_exists_by_source_url / get_existing_source_urls check alongside photos.source_url.
+-- photos_archive mirrors photos column for column (+ archived_at): a migration adding a column to
+-- photos must add it here and to database_operations._ARCHIVE_COLUMNS too.
+-- history is untouched (keyed by r2_key, it stays the posting log).
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS photos_archive (
+    id INTEGER PRIMARY KEY,
+    r2_key TEXT,
+    bucket_stage TEXT,
+    source TEXT,
+    source_url TEXT,
+    ai_score REAL,
+    ai_reasoning TEXT,
+    status TEXT,
+    reviewed_by TEXT,
+    reviewed_at DATETIME,
+    created_at DATETIME,
+    date TEXT,
+    urgent INTEGER,
+    copies INTEGER,
+    combo TEXT,
+    album_id TEXT,
+    idol_signature TEXT,
+    tweet_text TEXT,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS photo_idols_archive (
+    photo_id INTEGER NOT NULL,
+    idol_id INTEGER NOT NULL,
+    confidence REAL,
+    PRIMARY KEY (photo_id, idol_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS seen_sources (
+    url_hash INTEGER PRIMARY KEY
+);
+
+-- Archival selects terminal rows by status; (status, created_at) already leads with it.
+
+COMMIT;
+
+-- DOWN
+DROP TABLE IF EXISTS seen_sources;
+DROP TABLE IF EXISTS photo_idols_archive;
+DROP TABLE IF EXISTS photos_archive;
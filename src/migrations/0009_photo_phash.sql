@@ -0,0 +1,24 @@
+-- 0009_photo_phash.sql
+-- Near-duplicate detection across different source URLs (other CDN hosts, re-uploads, manual
+-- submissions): each ingested photo stores its 64-bit perceptual hash (utils.image.perceptual_hash,
+-- signed like seen_sources.url_hash), and duplicate_of names the closest earlier photo within
+-- PHASH_MAX_DISTANCE bits, set at insert as a hint for the reviewer. Neither is indexed: lookups go
+-- through the in-process Hamming index in database_operations, loaded from these columns.
+-- Rows ingested before this migration (or whose bytes didn't decode) keep phash NULL.
+-- photos_archive mirrors photos (see 0008), so it gains both columns too.
+
+BEGIN;
+
+ALTER TABLE photos ADD COLUMN phash INTEGER;
+ALTER TABLE photos ADD COLUMN duplicate_of INTEGER;
+
+ALTER TABLE photos_archive ADD COLUMN phash INTEGER;
+ALTER TABLE photos_archive ADD COLUMN duplicate_of INTEGER;
+
+COMMIT;
+
+-- DOWN
+ALTER TABLE photos_archive DROP COLUMN duplicate_of;
+ALTER TABLE photos_archive DROP COLUMN phash;
+ALTER TABLE photos DROP COLUMN duplicate_of;
+ALTER TABLE photos DROP COLUMN phash;
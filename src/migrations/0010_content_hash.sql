@@ -0,0 +1,24 @@
+-- 0010_content_hash.sql
+-- Content-addressed storage (CONTENT_ADDRESSED_KEYS, see utils.ingest): each photo records the
+-- SHA-256 of its bytes (hex), and a photo whose bytes are already stored for another live photo
+-- points at that photo's object instead of uploading a copy. Objects can therefore be shared, so
+-- nothing deletes one while another live row (uploading / pending / approved) still references
+-- it — count_object_refs reads that off idx_photos_r2_key.
+-- Rows ingested before this migration keep content_hash NULL (never matched).
+-- photos_archive mirrors photos (see 0008), so it gains the column too.
+
+BEGIN;
+
+ALTER TABLE photos ADD COLUMN content_hash TEXT;
+ALTER TABLE photos_archive ADD COLUMN content_hash TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_photos_content_hash ON photos(content_hash) WHERE content_hash IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_photos_r2_key ON photos(r2_key) WHERE r2_key IS NOT NULL;
+
+COMMIT;
+
+-- DOWN
+DROP INDEX IF EXISTS idx_photos_r2_key;
+DROP INDEX IF EXISTS idx_photos_content_hash;
+ALTER TABLE photos_archive DROP COLUMN content_hash;
+ALTER TABLE photos DROP COLUMN content_hash;
@@ -0,0 +1,25 @@
+-- 0011_media_uploads.sql
+-- Twitter media uploaded by the bots, so a photo that GENERAL and idol bots all post is downloaded,
+-- recompressed and uploaded once: the first bot uploads it with every account still due to post
+-- it as an owner (media/upload's additional_owners), records the media_id here, and the others
+-- attach that id instead of uploading again. Twitter keeps uploaded media for a limited time
+-- (expires_after_secs, 24 h), so expires_at (unix seconds) bounds reuse. `owners` is the
+-- comma-separated list of bot names (idol_prefix) the media belongs to.
+-- One row per file_key; it goes when the object is retired (set_object_posted) or expires.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS media_uploads (
+    file_key TEXT PRIMARY KEY,
+    media_id INTEGER NOT NULL,
+    owners TEXT NOT NULL,
+    expires_at INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_media_uploads_expires ON media_uploads(expires_at);
+
+COMMIT;
+
+-- DOWN
+DROP INDEX IF EXISTS idx_media_uploads_expires;
+DROP TABLE IF EXISTS media_uploads;
@@ -0,0 +1,18 @@
+-- 0012_post_plans.sql
+-- What the preparation job (bot.prepare_posts) readied for each bot's next post: the pack's R2
+-- keys in `copies` order (JSON), their upload-ready bytes sitting in the local post cache
+-- (utils.post_cache). At posting time the bot uses the prepared bytes only if its next post is
+-- still exactly this pack; otherwise the plan is stale and it downloads as before.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS post_plans (
+    bot_name TEXT PRIMARY KEY,
+    file_keys TEXT NOT NULL,
+    prepared_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMIT;
+
+-- DOWN
+DROP TABLE IF EXISTS post_plans;
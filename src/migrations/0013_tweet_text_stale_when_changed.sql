@@ -0,0 +1,57 @@
+-- 0013_tweet_text_stale_when_changed.sql
+-- The stale-text triggers from 0007 fired on any UPDATE naming those columns, even one writing the
+-- same values back (scripts/migrate_json.py re-seeding the catalogue), which cleared every stored
+-- tweet text. Recreated to fire only when a column the text is rendered from actually changes.
+
+BEGIN;
+
+DROP TRIGGER IF EXISTS trg_idols_text_stale;
+DROP TRIGGER IF EXISTS trg_groups_text_stale;
+
+CREATE TRIGGER trg_idols_text_stale
+AFTER UPDATE OF idol_names, name_tags, group_id ON idols
+WHEN OLD.idol_names IS NOT NEW.idol_names
+  OR OLD.name_tags IS NOT NEW.name_tags
+  OR OLD.group_id IS NOT NEW.group_id
+BEGIN
+    UPDATE photos SET tweet_text = NULL
+    WHERE tweet_text IS NOT NULL
+      AND id IN (SELECT photo_id FROM photo_idols WHERE idol_id = NEW.id);
+END;
+
+CREATE TRIGGER trg_groups_text_stale
+AFTER UPDATE OF key, group_names, group_tags ON groups
+WHEN OLD.key IS NOT NEW.key
+  OR OLD.group_names IS NOT NEW.group_names
+  OR OLD.group_tags IS NOT NEW.group_tags
+BEGIN
+    UPDATE photos SET tweet_text = NULL
+    WHERE tweet_text IS NOT NULL
+      AND id IN (SELECT pi.photo_id FROM photo_idols pi
+                 JOIN idols i ON pi.idol_id = i.id
+                 WHERE i.group_id = NEW.id);
+END;
+
+COMMIT;
+
+-- DOWN
+DROP TRIGGER IF EXISTS trg_idols_text_stale;
+DROP TRIGGER IF EXISTS trg_groups_text_stale;
+
+CREATE TRIGGER trg_idols_text_stale
+AFTER UPDATE OF idol_names, name_tags, group_id ON idols
+BEGIN
+    UPDATE photos SET tweet_text = NULL
+    WHERE tweet_text IS NOT NULL
+      AND id IN (SELECT photo_id FROM photo_idols WHERE idol_id = NEW.id);
+END;
+
+CREATE TRIGGER trg_groups_text_stale
+AFTER UPDATE OF key, group_names, group_tags ON groups
+BEGIN
+    UPDATE photos SET tweet_text = NULL
+    WHERE tweet_text IS NOT NULL
+      AND id IN (SELECT pi.photo_id FROM photo_idols pi
+                 JOIN idols i ON pi.idol_id = i.id
+                 WHERE i.group_id = NEW.id);
+END;
@@ -1,62 +1,154 @@
 import re
+import hashlib
 import sqlite3
+import threading
 from pathlib import Path
 from contextlib import closing
 
-
-def apply_migrations(db_file):
+MIGRATION_DIR = Path(__file__).parent
+
+# Fast path: a fully migrated DB carries a fingerprint in schema_state — the latest migration's
+# filename plus a SHA-256 over every migration file (name + content) — so startup confirms it with
+# one primary-key read instead of re-walking schema_migrations and printing a line per file. The
+# files are read once per process to compute the expected fingerprint, and a DB confirmed (or
+# migrated) once is not checked again in the same process: init_db() runs in the API lifespan and
+# in every KpopBot.run(). Each applied migration's own checksum is kept in schema_migrations, so a
+# migration edited after it was applied is reported by name (and keeps the fingerprint from being
+# written, so the warning repeats until it is resolved).
+_lock = threading.Lock()
+_migration_files = None
+_verified = set()
+
+def _file_checksum(name, text):
+    return hashlib.sha256(name.encode("utf-8") + b"\0" + text.encode("utf-8")).hexdigest()
+
+def _load_migration_files():
+    # [(filename, sql text, checksum)] in apply order, read from disk once per process.
+    global _migration_files
+    if _migration_files is None:
+        files = []
+        for migration_file in sorted(MIGRATION_DIR.glob("*.sql")):
+            text = migration_file.read_text(encoding="utf-8")
+            files.append((migration_file.name, text, _file_checksum(migration_file.name, text)))
+        _migration_files = files
+
+    return _migration_files
+
+def _fingerprint(files):
+    aggregate = hashlib.sha256("".join(checksum for _, _, checksum in files).encode("ascii")).hexdigest()
+    return (files[-1][0] if files else "", aggregate)
+
+def _stored_fingerprint(conn):
     try:
-        with closing(sqlite3.connect(db_file)) as conn:
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS schema_migrations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    migration_filename TEXT NOT NULL UNIQUE,
-                    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            conn.commit()
+        return conn.execute("SELECT latest, checksum FROM schema_state WHERE id = 1").fetchone()
 
-            cursor.execute("SELECT migration_filename FROM schema_migrations")
-            applied_migrations = {row[0] for row in cursor.fetchall()}
+    except sqlite3.OperationalError:
+        return None  # no schema_state yet: a DB from before the fast path, or a fresh one
 
-            migration_dir = Path(__file__).parent
-            migration_files = sorted(migration_dir.glob("*.sql"))
 
-            for migration_file in migration_files:
-                migration_name = migration_file.name
-
-                if migration_name in applied_migrations:
-                    print(f"Filename already applied: {migration_name}")
-                    continue
+def apply_migrations(db_file):
+    # Imported here, not at module top: run as a script (__main__ below), src/ is only put on the
+    # path after this module has loaded.
+    from utils.names import normalize_alias
+
+    with _lock:
+        if db_file in _verified:
+            return
+
+        files = _load_migration_files()
+        fingerprint = _fingerprint(files)
+
+        try:
+            with closing(sqlite3.connect(db_file)) as conn:
+                if _stored_fingerprint(conn) == fingerprint:
+                    _verified.add(db_file)
+                    return
+
+                if _migrate(conn, files, normalize_alias):
+                    conn.execute(
+                        """
+                            INSERT INTO schema_state (id, latest, checksum) VALUES (1, ?, ?)
+                            ON CONFLICT(id) DO UPDATE SET latest = excluded.latest,
+                                checksum = excluded.checksum, updated_at = CURRENT_TIMESTAMP
+                        """, fingerprint
+                    )
+                    conn.commit()
+                    _verified.add(db_file)
+
+        except Exception as e:
+            print(f"Error connecting to database: {e}")
+
+
+def _migrate(conn, files, normalize_alias):
+    # The full check: apply pending migrations in order, verify applied ones against their stored
+    # checksum. Returns True when the DB is fully migrated with no checksum mismatch.
+    # Python-side helpers that data migrations call from SQL (e.g. the alias backfill).
+    conn.create_function("normalize_alias", 1, normalize_alias, deterministic=True)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            migration_filename TEXT NOT NULL UNIQUE,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(schema_migrations)")}
+    if "checksum" not in columns:
+        cursor.execute("ALTER TABLE schema_migrations ADD COLUMN checksum TEXT")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            latest TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+    cursor.execute("SELECT migration_filename, checksum FROM schema_migrations")
+    applied_migrations = dict(cursor.fetchall())
+    clean = True
+
+    for migration_name, migration_sql, checksum in files:
+        if migration_name in applied_migrations:
+            stored = applied_migrations[migration_name]
+            if stored is None:
+                # Applied before checksums were recorded: adopt the current file as the reference.
+                cursor.execute(
+                    "UPDATE schema_migrations SET checksum = ? WHERE migration_filename = ?",
+                    (checksum, migration_name)
+                )
+                conn.commit()
+            elif stored != checksum:
+                print(f"Warning: migration {migration_name} changed after it was applied "
+                      f"(checksum mismatch); it is not re-run — add a new migration instead.")
+                clean = False
+            continue
 
-                print(f"Applying migration: {migration_name}")
+        print(f"Applying migration: {migration_name}")
 
-                with open(migration_file, "r", encoding="utf-8") as file:
-                    migration_sql = file.read()
-                    # Split UP/DOWN on a line that is exactly the marker, so the string
-                    # "-- DOWN" appearing inside a comment doesn't truncate the migration.
-                    up_sql = re.split(r'(?m)^-- DOWN\s*$', migration_sql)[0]
+        # Split UP/DOWN on a line that is exactly the marker, so the string
+        # "-- DOWN" appearing inside a comment doesn't truncate the migration.
+        up_sql = re.split(r'(?m)^-- DOWN\s*$', migration_sql)[0]
 
-                try:
-                    conn.executescript(up_sql)
+        try:
+            conn.executescript(up_sql)
 
-                    cursor.execute("""
-                        INSERT INTO schema_migrations (migration_filename)
-                        VALUES (?)
-                    """, (migration_name,)
-                    )
-                    conn.commit()
-                    print(f"Migration applied successfully: {migration_name}")
+            cursor.execute("""
+                INSERT INTO schema_migrations (migration_filename, checksum)
+                VALUES (?, ?)
+            """, (migration_name, checksum)
+            )
+            conn.commit()
+            print(f"Migration applied successfully: {migration_name}")
 
-                except Exception as e:
-                    conn.rollback()
-                    print(f"Error applying migration {migration_name}: {e}")
-                    break
+        except Exception as e:
+            conn.rollback()
+            print(f"Error applying migration {migration_name}: {e}")
+            return False
 
-    except Exception as e:
-        print(f"Error connecting to database: {e}")
+    return clean
 
 
 if __name__ == "__main__":
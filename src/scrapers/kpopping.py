@@ -24,6 +24,9 @@ HEADERS = {
 API_KPICS = "https://kpopping.com/api/kpics"
 ALBUM_BASE = "https://kpopping.com/kpics/"
 
+# How many downloaded images scrape_album hands to ingest_many at once.
+INGEST_BATCH_SIZE = 10
+
 # --- Fetch ---
 
 def fetch_album(url):
@@ -156,8 +159,8 @@ def scrape_album(url, limit=None):
     # Ingest full-res photos of one Kpopping album into the pipeline (status='pending'), tagged
     # with the album's known member(s). Group-only or unknown-idol albums are rejected.
     # `limit` caps how many images are ingested (handy for a quick test); None = the whole album.
-    from utils.database_operations import get_idol_keys_by_names, photo_exists_by_source_url
-    from utils.ingest import ingest_photo
+    from utils.database_operations import get_idol_keys_by_names, get_existing_source_urls
+    from utils.ingest import ingest_many
 
     summary = {"album_id": _album_id_from_url(url), "ingested": 0, "skipped": 0, "rejected_reason": None}
 
@@ -186,8 +189,18 @@ def scrape_album(url, limit=None):
     if limit:
         image_urls = image_urls[:limit]
 
+    # Downloaded images are ingested INGEST_BATCH_SIZE at a time (one transaction per batch rather
+    # than four per image), which also bounds how many image bodies are held in memory.
+    batch = []
+
+    def flush():
+        for outcome in ingest_many(batch):
+            summary["ingested" if outcome["status"] == "pending" else "skipped"] += 1
+        batch.clear()
+
+    existing = get_existing_source_urls(image_urls)
     for image_url in image_urls:
-        if photo_exists_by_source_url(image_url):
+        if image_url in existing:
             summary["skipped"] += 1
             continue
 
@@ -199,19 +212,20 @@ def scrape_album(url, limit=None):
             summary["skipped"] += 1
             continue
 
-        photo_id = ingest_photo(
-            image_bytes=image_bytes,
-            ext=_ext_from_url(image_url),
-            idol_keys=idol_keys,
-            source="kpopping",
-            source_url=image_url,
-            date=parsed["date"],
-            album_id=parsed["album_id"],
-        )
-        if photo_id is None:
-            summary["skipped"] += 1
-        else:
-            summary["ingested"] += 1
+        batch.append({
+            "image_bytes": image_bytes,
+            "ext": _ext_from_url(image_url),
+            "idol_keys": idol_keys,
+            "source": "kpopping",
+            "source_url": image_url,
+            "date": parsed["date"],
+            "album_id": parsed["album_id"],
+        })
+        if len(batch) >= INGEST_BATCH_SIZE:
+            flush()
+
+    if batch:
+        flush()
 
     print(f"Scraped {summary['album_id']}: ingested={summary['ingested']} skipped={summary['skipped']}.")
     return summary
@@ -263,7 +277,7 @@ def list_recent_album_urls(kpopping_id, limit=5):
 
 def scrape_idol(kpopping_id, limit_albums=5, limit_images=None):
     # Discover an idol's most recent albums and scrape each into the pipeline. Dedup
-    # (photo_exists_by_source_url, inside scrape_album) makes re-polling cheap and repeat-free.
+    # (get_existing_source_urls, inside scrape_album) makes re-polling cheap and repeat-free.
     summary = {"kpopping_id": kpopping_id, "albums": 0, "ingested": 0, "skipped": 0}
 
     for album_url in list_recent_album_urls(kpopping_id, limit=limit_albums):
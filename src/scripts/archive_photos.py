@@ -0,0 +1,38 @@
+import os
+import sys
+import pathlib
+from dotenv import load_dotenv
+
+# Archival job: move rejected/posted photos older than ARCHIVE_AFTER_DAYS (default 30) out of the
+# hot tables, then re-analyze and incrementally vacuum. Scheduled in-process by
+# api.main.build_scheduler (ENABLE_ARCHIVE); also runnable by hand:
+#   python src/scripts/archive_photos.py [older_than_days] [--convert-vacuum]
+# --convert-vacuum first switches an existing DB to incremental auto-vacuum, once: a full VACUUM
+# that blocks every write while it rewrites the file, so run it with the API stopped.
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+load_dotenv(BASE_DIR / '.env')
+sys.path.insert(0, str(BASE_DIR))
+
+from utils.database_operations import archive_terminal_photos, convert_to_incremental_vacuum, optimize_database
+
+def _archive_after_days():
+    try:
+        return int(os.getenv("ARCHIVE_AFTER_DAYS", 30))
+    except ValueError:
+        return 30
+
+def run_archival(older_than_days=None):
+    days = _archive_after_days() if older_than_days is None else older_than_days
+    archived = archive_terminal_photos(days)
+    freed = optimize_database()
+    print(f"Archived {archived} terminal photo(s) older than {days} day(s); freed {freed} page(s).")
+    return archived
+
+if __name__ == "__main__":
+    from scripts.init_db import init_db
+
+    init_db()
+    args = [arg for arg in sys.argv[1:] if arg != "--convert-vacuum"]
+    if "--convert-vacuum" in sys.argv[1:] and not convert_to_incremental_vacuum():
+        sys.exit(1)
+    run_archival(int(args[0]) if args else None)
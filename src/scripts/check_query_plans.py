@@ -0,0 +1,134 @@
+import os
+import sys
+import pathlib
+import tempfile
+from dotenv import load_dotenv
+
+# Guard against hot queries silently falling back to full table scans: calls every hot helper of
+# the posting/approval/ingest paths, records the statements each one actually executes (the
+# connection's trace callback, parameters inlined) and runs EXPLAIN QUERY PLAN on them; exits 1 if
+# any step is a plain `SCAN <table>`. Nothing is copied from the helpers, so a query edited into a
+# scan fails here. Runs against a throwaway DB migrated from scratch (so it also proves the
+# migrations apply) and seeded through the write helpers with a few rows of each kind, enough for
+# every helper to reach its follow-up queries. Never touches the configured DB.
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+load_dotenv(BASE_DIR / '.env')
+sys.path.insert(0, str(BASE_DIR))
+os.environ["DB_FILE"] = str(pathlib.Path(tempfile.mkdtemp(prefix="kpics-plans-")) / "plans.db")
+
+from scripts.init_db import init_db
+from utils import database_operations as db
+from utils.hashing import source_url_hash
+
+# Statements with no query plan of their own.
+UNPLANNED = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE", "PRAGMA", "--")
+
+def seed():
+    # Two idols of one group; pending, approved (single + Duo combo) and posted photos; a bot's
+    # history, a cached media and an archived source URL.
+    karina = db.create_idol("karina", ["Karina", "카리나"], "#KARINA", "aespa", ["aespa"], "#aespa")
+    winter = db.create_idol("winter", ["Winter", "윈터"], "#WINTER", "aespa")
+
+    photo_ids = []
+    for n in range(6):
+        photo_id = db.insert_photo("kpopping", f"https://example.com/{n}.jpg", "2025-09-30",
+                                   album_id="album-1", content_hash=f"{n:064x}")
+        db.set_photo_ready(photo_id, f"analysis/{n}.jpg")
+        db.link_photo_idols(photo_id, [karina] if n % 2 else [karina, winter])
+        photo_ids.append(photo_id)
+
+    db.set_photo_score(photo_ids[0], 7.5)
+    db.create_combo([photo_ids[1], photo_ids[3]])
+    for photo_id in photo_ids[1:5]:
+        db.set_photo_approved(photo_id, f"approved/{photo_id}.jpg")
+    db.log_posted_image(f"approved/{photo_ids[4]}.jpg", "GENERAL", "karina, winter")
+    db.log_posted_image(f"approved/{photo_ids[4]}.jpg", "KARINA", "karina")
+    db.set_object_posted(f"approved/{photo_ids[4]}.jpg")
+    db.cache_media(f"approved/{photo_ids[2]}.jpg", 1, ["GENERAL"], 2 ** 40)
+    db.save_post_plan("GENERAL", [f"approved/{photo_ids[2]}.jpg"])
+
+    with db.get_connection() as connect:
+        connect.execute("INSERT INTO seen_sources (url_hash) VALUES (?)",
+                        (source_url_hash("https://example.com/archived.jpg"),))
+
+    return photo_ids
+
+def hot_calls(photo_ids):
+    first, combo_photo, approved = photo_ids[0], photo_ids[1], photo_ids[2]
+    cursor = db.get_connection().cursor()
+    urls = ["https://example.com/0.jpg", "https://example.com/archived.jpg", "https://example.com/new.jpg"]
+
+    return {
+        "photo_exists_by_source_url": lambda: db.photo_exists_by_source_url(urls[0]),
+        "get_existing_source_urls": lambda: db.get_existing_source_urls(urls),
+        "source-URL prefilter catch-up": lambda: db._load_source_rows(cursor, first),
+        "near-duplicate index catch-up": lambda: db._load_phash_rows(cursor, "photos", first),
+        "get_objects_by_content_hash": lambda: db.get_objects_by_content_hash([f"{0:064x}", f"{2:064x}"]),
+        "count_object_refs": lambda: db.count_object_refs(f"approved/{approved}.jpg", [approved]),
+        "get_pending_photos": lambda: db.get_pending_photos(
+            limit=60, after=("2999-01-01 00:00:00", 10 ** 9), album_id="album-1", source="kpopping"),
+        "get_pending_photos (idol filter)": lambda: db.get_pending_photos(limit=60, idol_key="karina"),
+        "get_photos_pending_score": db.get_photos_pending_score,
+        "get_approved_photos": db.get_approved_photos,
+        "get_approved_photos (idol filter)": lambda: db.get_approved_photos("winter"),
+        "next_post_candidates (GENERAL)": lambda: db.next_post_candidates("GENERAL"),
+        "next_post_candidates (idol bot)": lambda: db.next_post_candidates("KARINA"),
+        "get_idol_keys_by_names": lambda: db.get_idol_keys_by_names(["KARINA", "윈터"]),
+        "get_log_history": lambda: db.get_log_history(f"approved/{combo_photo}.jpg"),
+        "get_log_histories": lambda: db.get_log_histories([f"approved/{combo_photo}.jpg",
+                                                           f"approved/{approved}.jpg"]),
+        "get_last_posted_image": lambda: db.get_last_posted_image("GENERAL"),
+        "get_recent_post_times": lambda: db.get_recent_post_times("GENERAL", 24 * 60 * 60),
+        "get_cached_media": lambda: db.get_cached_media([f"approved/{approved}.jpg"], "GENERAL"),
+        "get_post_plan": lambda: db.get_post_plan("GENERAL"),
+        "log_posted_pack": lambda: db.log_posted_pack("GENERAL", [(f"approved/{approved}.jpg", "karina",
+                                                                   ["GENERAL", "KARINA"])]),
+        "cache_media": lambda: db.cache_media(f"approved/{approved}.jpg", 2, ["GENERAL"], 2 ** 40),
+        "forget_media": lambda: db.forget_media([f"approved/{approved}.jpg"]),
+        "set_object_posted": lambda: db.set_object_posted(f"approved/{approved}.jpg"),
+        "clear_combo": lambda: db.clear_combo("D1"),
+        "archive batch": lambda: db._archive_batch(36500, 500),
+    }
+
+def scanning_steps(connect, sql):
+    # Plan steps that walk a whole table or a whole index (`SCAN x [USING ... INDEX]`); every hot
+    # query must be a SEARCH on an index instead. `SCAN CONSTANT ROW` (a FROM-less SELECT) reads
+    # nothing.
+    plan = connect.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return [row[3] for row in plan if row[3].startswith("SCAN") and row[3] != "SCAN CONSTANT ROW"]
+
+def traced(connect, call):
+    # The statements `call` ran on this thread's connection.
+    statements = []
+    connect.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        connect.set_trace_callback(None)
+
+    return [sql for sql in statements if not sql.lstrip().upper().startswith(UNPLANNED)]
+
+def check():
+    # Runs on the writer thread, so write helpers execute inline on the same (traced) connection.
+    # The in-process caches are loaded first: their one-time full loads are scans by design, the
+    # per-call work is what is checked.
+    photo_ids = seed()
+    db.get_catalogue()
+    db.warm_source_filter()
+    db.warm_near_duplicate_index()
+
+    connect = db.get_connection()
+    failures = {}
+    for name, call in hot_calls(photo_ids).items():
+        statements = traced(connect, call)
+        scans = [step for sql in statements for step in scanning_steps(connect, sql)]
+        if scans or not statements:
+            failures[name] = scans or ["(no statement ran)"]
+        print(f"{'ok  ' if name not in failures else 'SCAN'} {name} ({len(statements)} statement(s))"
+              + (f" -> {failures[name]}" if name in failures else ""))
+
+    return failures
+
+if __name__ == "__main__":
+    init_db()
+    sys.exit(1 if db.get_writer_executor().submit(check).result() else 0)
@@ -0,0 +1,33 @@
+import os
+import sys
+import pathlib
+
+import requests
+from dotenv import load_dotenv
+
+# Dump the API's DB instrumentation counters (GET /stats/db; the API must run with DB_PROFILE=1).
+# Uses the same API_BASE_URL / API_TOKEN as local_ingest. A profiled local script (DB_PROFILE=1
+# python ...) prints the same table for its own process at exit.
+#   python src/scripts/db_stats.py [--reset]
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent          # src/
+sys.path.insert(0, str(BASE_DIR))
+load_dotenv(pathlib.Path(__file__).resolve().parent / "local_ingest.env")
+load_dotenv(BASE_DIR / ".env")
+
+from utils.query_stats import format_query_stats
+
+API_BASE_URL = (os.getenv("API_BASE_URL") or "").rstrip("/")
+API_TOKEN = os.getenv("API_TOKEN")
+
+if __name__ == "__main__":
+    if not API_BASE_URL or not API_TOKEN:
+        sys.exit("Missing API_BASE_URL / API_TOKEN — populate src/scripts/local_ingest.env.")
+
+    response = requests.get(
+        f"{API_BASE_URL}/stats/db",
+        params={"reset": "true"} if "--reset" in sys.argv[1:] else None,
+        headers={"Authorization": f"Bearer {API_TOKEN}"},
+        timeout=25,
+    )
+    response.raise_for_status()
+    print(format_query_stats(response.json()))
@@ -24,10 +24,21 @@ from scrapers.kpopping import (
     _ext_from_url,
 )
 from utils.storage import upload_bytes
+from utils.image import perceptual_hash
+from utils.hashing import content_hash
 
 API_BASE_URL = (os.getenv("API_BASE_URL") or "").rstrip("/")
 API_TOKEN = os.getenv("API_TOKEN")
 
+# Photos per /photos/register/batch request (a typical album fits in one).
+REGISTER_BATCH_SIZE = 50
+
+# Content-addressed storage, same switch as the server's (utils.ingest, DB-coupled, so re-read here):
+# objects are named by SHA-256, and bytes the server already stores are registered, not uploaded.
+# Downloads are checked CONTENT_CHECK_BATCH at a time (one request each; bounds bytes held).
+CONTENT_ADDRESSED_KEYS = os.getenv("CONTENT_ADDRESSED_KEYS", "false").lower() in ("1", "true", "yes")
+CONTENT_CHECK_BATCH = 10
+
 # 5-line dup of ingest.CONTENT_TYPES (which lives in the DB-coupled ingest.py we deliberately avoid).
 CONTENT_TYPES = {
     "jpg": "image/jpeg",
@@ -54,28 +65,33 @@ def _discovery_ids():
         print(f"Error fetching discovery idols: {e}.")
         return []
 
-def _already_exists(source_url):
-    # Cheap pre-check so a duplicate is never re-downloaded/re-uploaded.
+def _existing(source_urls=(), content_hashes=()):
+    # Cheap pre-check so a duplicate is never re-downloaded/re-uploaded: (source URLs already
+    # ingested, content hashes whose bytes are already in R2). One request per album (URLs) or per
+    # downloaded chunk (hashes).
     try:
-        response = requests.get(f"{API_BASE_URL}/photos/exists", params={"source_url": source_url},
-                                headers=_headers(), timeout=25)
+        response = requests.post(f"{API_BASE_URL}/photos/exists/batch",
+                                 json={"source_urls": list(source_urls), "content_hashes": list(content_hashes)},
+                                 headers=_headers(), timeout=25)
         response.raise_for_status()
-        return bool(response.json().get("exists"))
+        body = response.json()
+        return set(body.get("existing", [])), set(body.get("existing_content", []))
 
     except Exception as e:
-        print(f"Error checking exists for {source_url}: {e}.")
-        return False   # on error, fall through and let /register re-dedup
+        print(f"Error checking exists for {len(source_urls)} URL(s), {len(content_hashes)} hash(es): {e}.")
+        return set(), set()   # on error, fall through: upload, and let /register re-dedup
 
-def _register(payload):
-    # Post metadata for a photo whose bytes are already in R2. Returns the JSON body (or None).
+def _register_batch(payloads):
+    # Post metadata for several uploaded photos in one request (one DB transaction server-side).
+    # Returns the per-item results, in order (None on a request failure).
     try:
-        response = requests.post(f"{API_BASE_URL}/photos/register", json=payload,
-                                 headers=_headers(), timeout=25)
+        response = requests.post(f"{API_BASE_URL}/photos/register/batch", json={"photos": payloads},
+                                 headers=_headers(), timeout=60)
         response.raise_for_status()
-        return response.json()
+        return response.json().get("results", [])
 
     except Exception as e:
-        print(f"Error registering {payload.get('r2_key')}: {e}.")
+        print(f"Error registering batch of {len(payloads)}: {e}.")
         return None
 
 
@@ -108,8 +124,43 @@ def ingest_album(url, limit=None):
     if limit:
         image_urls = image_urls[:limit]
 
+    # Uploaded photos are registered REGISTER_BATCH_SIZE at a time through /photos/register/batch.
+    pending = []
+    downloaded = []
+    stored_content = set()
+
+    def flush():
+        results = _register_batch(pending)
+        if results is None:
+            summary["skipped"] += len(pending)
+        for result in results or []:
+            # duplicate (server-side race), reject, or error: the server already deleted the orphan.
+            summary["ingested" if result.get("id") else "skipped"] += 1
+        pending.clear()
+
+    def upload_downloaded():
+        # Upload the downloaded chunk (skipping bytes R2 already holds in content-addressed mode)
+        # and queue each photo for registration.
+        if CONTENT_ADDRESSED_KEYS:
+            stored_content.update(_existing(content_hashes=[item["content_hash"] for item, _ in downloaded])[1])
+
+        for item, image_bytes in downloaded:
+            if item["content_hash"] not in stored_content:
+                ext = item["r2_key"].rsplit(".", 1)[-1]
+                if not upload_bytes(item["r2_key"], image_bytes, CONTENT_TYPES.get(ext)):
+                    summary["skipped"] += 1
+                    continue
+                if CONTENT_ADDRESSED_KEYS:
+                    stored_content.add(item["content_hash"])
+
+            pending.append(item)
+            if len(pending) >= REGISTER_BATCH_SIZE:
+                flush()
+        downloaded.clear()
+
+    existing = _existing(source_urls=image_urls)[0] if image_urls else set()
     for image_url in image_urls:
-        if _already_exists(image_url):
+        if image_url in existing:
             summary["skipped"] += 1
             continue
 
@@ -122,25 +173,26 @@ def ingest_album(url, limit=None):
             continue
 
         ext = _ext_from_url(image_url)
-        r2_key = f"analysis/{uuid.uuid4().hex}.{ext}"
+        digest = content_hash(image_bytes)
+        name = digest if CONTENT_ADDRESSED_KEYS else uuid.uuid4().hex
 
-        if not upload_bytes(r2_key, image_bytes, CONTENT_TYPES.get(ext)):
-            summary["skipped"] += 1
-            continue
-
-        result = _register({
-            "r2_key": r2_key,
+        downloaded.append(({
+            "r2_key": f"analysis/{name}.{ext}",
             "idols": parsed["idol_names"],
             "source": "kpopping",
             "source_url": image_url,
             "date": parsed["date"],
             "album_id": parsed["album_id"],
-        })
-        if result and result.get("id"):
-            summary["ingested"] += 1
-        else:
-            # duplicate (server-side race), reject, or error: /register already deleted the orphan.
-            summary["skipped"] += 1
+            "phash": perceptual_hash(image_bytes),   # the server has no bytes to hash
+            "content_hash": digest,
+        }, image_bytes))
+        if len(downloaded) >= (CONTENT_CHECK_BATCH if CONTENT_ADDRESSED_KEYS else 1):
+            upload_downloaded()
+
+    if downloaded:
+        upload_downloaded()
+    if pending:
+        flush()
 
     print(f"Ingested {summary['album_id']}: ingested={summary['ingested']} skipped={summary['skipped']}.")
     return summary
@@ -1,8 +1,6 @@
 import sys
 import json
-import sqlite3
 import pathlib
-from contextlib import closing
 from dotenv import load_dotenv
 
 # Load src/.env and add src/ to the path regardless of the working directory,
@@ -11,7 +9,8 @@ BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / '.env')
 sys.path.insert(0, str(BASE_DIR))
 
-from scripts.init_db import init_db, DB_FILE
+from scripts.init_db import init_db
+from utils.database_operations import get_connection, replace_idol_aliases
 
 DATA_PATH = BASE_DIR / 'data' / 'database.json'
 
@@ -25,53 +24,64 @@ def migrate():
     groups = data.get('groups', {})
     idols = data.get('idols', {})
 
-    with closing(sqlite3.connect(DB_FILE)) as connect:
-        with connect:
-            cursor = connect.cursor()
-
-            # Groups first, so idols can link to their group_id.
-            for key, info in groups.items():
-                cursor.execute(
-                    """
-                        INSERT INTO groups (key, group_names, group_tags)
-                        VALUES (?, ?, ?)
-                        ON CONFLICT(key) DO UPDATE SET
-                            group_names = excluded.group_names,
-                            group_tags = excluded.group_tags
-                    """, (
-                        key,
-                        json.dumps(info.get('group_names', []), ensure_ascii=False),
-                        info.get('group_tags', "")
-                    )
+    connect = get_connection()
+    with connect:
+        cursor = connect.cursor()
+
+        # Groups first, so idols can link to their group_id. Rows already matching the seed are left
+        # untouched: an UPDATE bumps catalog_version (every process reloads the catalogue) and an
+        # edited idol/group clears the stored tweet texts that mention it.
+        for key, info in groups.items():
+            cursor.execute(
+                """
+                    INSERT INTO groups (key, group_names, group_tags)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        group_names = excluded.group_names,
+                        group_tags = excluded.group_tags
+                    WHERE groups.group_names IS NOT excluded.group_names
+                       OR groups.group_tags IS NOT excluded.group_tags
+                """, (
+                    key,
+                    json.dumps(info.get('group_names', []), ensure_ascii=False),
+                    info.get('group_tags', "")
                 )
-            print(f"Migrated {len(groups)} group(s).")
-
-            for key, info in idols.items():
-                group_key = info.get('group')
-                group_id = None
-                if group_key:
-                    cursor.execute("SELECT id FROM groups WHERE key = ?", (group_key,))
-                    found = cursor.fetchone()
-                    group_id = found[0] if found else None
-                    if group_id is None:
-                        print(f"Warning: idol '{key}' references unknown group '{group_key}'.")
-
-                cursor.execute(
-                    """
-                        INSERT INTO idols (key, idol_names, name_tags, group_id)
-                        VALUES (?, ?, ?, ?)
-                        ON CONFLICT(key) DO UPDATE SET
-                            idol_names = excluded.idol_names,
-                            name_tags = excluded.name_tags,
-                            group_id = excluded.group_id
-                    """, (
-                        key,
-                        json.dumps(info.get('idol_names', []), ensure_ascii=False),
-                        info.get('name_tags', f"#{key}"),
-                        group_id
-                    )
+            )
+        print(f"Migrated {len(groups)} group(s).")
+
+        for key, info in idols.items():
+            group_key = info.get('group')
+            group_id = None
+            if group_key:
+                cursor.execute("SELECT id FROM groups WHERE key = ?", (group_key,))
+                found = cursor.fetchone()
+                group_id = found[0] if found else None
+                if group_id is None:
+                    print(f"Warning: idol '{key}' references unknown group '{group_key}'.")
+
+            cursor.execute(
+                """
+                    INSERT INTO idols (key, idol_names, name_tags, group_id)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        idol_names = excluded.idol_names,
+                        name_tags = excluded.name_tags,
+                        group_id = excluded.group_id
+                    WHERE idols.idol_names IS NOT excluded.idol_names
+                       OR idols.name_tags IS NOT excluded.name_tags
+                       OR idols.group_id IS NOT excluded.group_id
+                """, (
+                    key,
+                    json.dumps(info.get('idol_names', []), ensure_ascii=False),
+                    info.get('name_tags', f"#{key}"),
+                    group_id
                 )
-            print(f"Migrated {len(idols)} idol(s).")
+            )
+
+            # Keep the normalized name index in step with the (possibly changed) idol_names.
+            idol_id = cursor.execute("SELECT id FROM idols WHERE key = ?", (key,)).fetchone()[0]
+            replace_idol_aliases(cursor, idol_id, info.get('idol_names', []))
+        print(f"Migrated {len(idols)} idol(s).")
 
     # After seeding, resolve Kpopping identities so any idol with a `kpopping_url` in the seed is
     # ready for the auto-scraper (idempotent — safe to re-run after adding URLs).
@@ -0,0 +1,70 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import database_operations as dbo
+
+# Awaitable face of database_operations for the FastAPI routes (async def handlers never block the
+# event loop nor take a threadpool slot per request). Reads run on a small dedicated executor —
+# each worker keeps its own thread-local connection, and WAL lets them read beside the writer.
+# Writes are handed straight to database_operations' single writer thread (see single_writer), so
+# they queue instead of fighting over SQLite's write lock. Blocking non-DB calls (R2, HTTP downloads,
+# the ingest helpers) get their own pool via run_blocking, sized for I/O waits rather than CPUs
+# (asyncio's default executor is min(32, cpus + 4): only 5 threads on a 1-vCPU host).
+READ_WORKERS = int(os.getenv("DB_READ_WORKERS", 8))
+IO_WORKERS = int(os.getenv("API_IO_WORKERS", 32))
+
+_read_executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="db-reader")
+_io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="api-io")
+
+async def run_read(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_read_executor, functools.partial(fn, *args, **kwargs))
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, functools.partial(fn, *args, **kwargs))
+
+async def run_write(fn, *args, **kwargs):
+    return await asyncio.wrap_future(dbo.get_writer_executor().submit(fn, *args, **kwargs))
+
+def _reader(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_read(fn, *args, **kwargs)
+
+    return wrapper
+
+def _writer(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_write(fn, *args, **kwargs)
+
+    return wrapper
+
+# Reads
+get_pending_photos = _reader(dbo.get_pending_photos)
+get_photo = _reader(dbo.get_photo)
+get_photos_pending_score = _reader(dbo.get_photos_pending_score)
+photo_exists_by_source_url = _reader(dbo.photo_exists_by_source_url)
+get_existing_source_urls = _reader(dbo.get_existing_source_urls)
+find_near_duplicate = _reader(dbo.find_near_duplicate)
+get_objects_by_content_hash = _reader(dbo.get_objects_by_content_hash)
+count_object_refs = _reader(dbo.count_object_refs)
+get_idol_keys_by_names = _reader(dbo.get_idol_keys_by_names)
+get_approved_photos = _reader(dbo.get_approved_photos)
+get_all_idols = _reader(dbo.get_all_idols)
+get_all_groups = _reader(dbo.get_all_groups)
+idol_exists = _reader(dbo.idol_exists)
+get_idols_for_discovery = _reader(dbo.get_idols_for_discovery)
+
+# Writes
+set_photo_approved = _writer(dbo.set_photo_approved)
+set_photo_rejected = _writer(dbo.set_photo_rejected)
+set_photo_urgent = _writer(dbo.set_photo_urgent)
+create_combo = _writer(dbo.create_combo)
+clear_combo = _writer(dbo.clear_combo)
+set_photo_score = _writer(dbo.set_photo_score)
+create_idol = _writer(dbo.create_idol)
+set_idol_kpopping = _writer(dbo.set_idol_kpopping)
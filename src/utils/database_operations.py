@@ -1,13 +1,19 @@
 import sqlite3
 import os
-import re
 import json
+import time
 import pathlib
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from contextlib import closing
 from dotenv import load_dotenv
 
+from utils.names import normalize_alias
+from utils.hashing import HammingIndex, source_url_hash
+from utils.query_stats import PROFILE, ProfiledConnection, instrumented
+
 load_dotenv()
 
 TIMEZONE_BRT = ZoneInfo("America/Sao_Paulo")
@@ -28,445 +34,1519 @@ DB_FILE = str(DB_PATH)
 folder_path = pathlib.Path(DB_FILE).parent
 folder_path.mkdir(parents=True, exist_ok=True)
 
+# --- Connection management ---
+
+# One long-lived connection per thread (FastAPI's threadpool workers, the APScheduler job thread,
+# a script's main thread), opened once and reused by every helper below instead of a fresh
+# connect per call. sqlite3 connections are not shareable across threads by default, so a
+# thread-local is the simplest safe "pool". Writers still use `with connect:` for their
+# transaction; readers run in autocommit between statements, so nothing is left open.
+STATEMENT_CACHE_SIZE = 256
+CACHE_SIZE_KIB = 16_384            # page cache per connection (negative PRAGMA value = KiB)
+MMAP_SIZE_BYTES = 64 * 1024 * 1024
+BUSY_TIMEOUT_SECONDS = 30
+
+_local = threading.local()
+
+def _open_connection():
+    # WAL lets readers (webapp, bot) proceed while a writer holds the lock; synchronous=NORMAL is
+    # the durable-enough setting for WAL (no fsync per commit, only at checkpoints).
+    connect = sqlite3.connect(
+        DB_FILE,
+        timeout=BUSY_TIMEOUT_SECONDS,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=ProfiledConnection if PROFILE else sqlite3.Connection,
+    )
+    connect.execute("PRAGMA journal_mode=WAL")
+    connect.execute("PRAGMA synchronous=NORMAL")
+    connect.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+    connect.execute(f"PRAGMA mmap_size={MMAP_SIZE_BYTES}")
+    connect.execute("PRAGMA temp_store=MEMORY")
+    return connect
+
+def get_connection():
+    # This thread's shared connection, opened on first use. A forked child (pid changed) never
+    # reuses its parent's handle.
+    connect = getattr(_local, "connection", None)
+    if connect is None or _local.pid != os.getpid():
+        connect = _open_connection()
+        _local.connection = connect
+        _local.pid = os.getpid()
+
+    return connect
+
+def close_connection():
+    # Drop this thread's connection (end of a script, or a test that swaps DB_FILE).
+    connect = getattr(_local, "connection", None)
+    if connect is not None:
+        _local.connection = None
+        connect.close()
+
+# --- Single writer ---
+
+# Every write helper below runs on ONE dedicated thread (its own connection), fed through the
+# executor's queue: the webapp's bulk approve, the API's ingest routes and the scheduler jobs no
+# longer race each other for SQLite's write lock (the source of the `database is locked` errors
+# a deferred transaction gets when it can't upgrade). A write called from any other thread is
+# submitted and waited on; one already on the writer thread (a write helper calling another)
+# runs inline. Reads never go through here — WAL lets them run beside the writer.
+_writer_lock = threading.Lock()
+_writer = None
+
+def _mark_writer_thread():
+    _local.is_writer = True
+
+def get_writer_executor():
+    # The process's writer (re-created in a forked child, whose copy has no live thread).
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer[0] != os.getpid():
+            _writer = (os.getpid(), ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="db-writer", initializer=_mark_writer_thread
+            ))
+
+        return _writer[1]
+
+def single_writer(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, "is_writer", False):
+            return fn(*args, **kwargs)
+
+        return get_writer_executor().submit(fn, *args, **kwargs).result()
+
+    return wrapper
+
+# --- Posting history ---
+
+@single_writer
+@instrumented
 def log_posted_image(file_key, bot_name, last_idol):
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                cursor.execute(
-                    """
-                        INSERT OR IGNORE INTO history (file_key, bot_name, last_idol)
-                        VALUES (?, ?, ?)
-                    """, (file_key, bot_name, last_idol)
-                )
+            cursor.execute(
+                """
+                    INSERT OR IGNORE INTO history (file_key, bot_name, last_idol)
+                    VALUES (?, ?, ?)
+                """, (file_key, bot_name, last_idol)
+            )
                 
     except Exception as e:
         print(f"Error logging posted image {file_key} for bot {bot_name}: {e}.")
         
-def get_log_history(file_key):
+@single_writer
+@instrumented
+def log_posted_pack(bot_name, posts):
+    # Log one bot's tweet of a pack and tell which of its files that tweet finished. `posts` is
+    # [(file_key, last_idol, needed_bots)]; returns {file_key: [bots still missing]}, where an empty
+    # list means every needed bot has now posted the file AND this call's row was the one that
+    # completed it. Inserting and re-reading history in one write transaction on the single writer
+    # means bots posting the same file at the same time (run_bots' workers) see a consistent
+    # history: exactly one of them gets the empty list and retires/deletes the object. A file this
+    # bot had already logged comes back as None (nothing for this call to do). The pack's rows
+    # share one posted_at, to the microsecond, so the tweet budget (get_recent_post_times) counts
+    # the tweet once and two tweets apart.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
+        connect = get_connection()
+        with connect:
             cursor = connect.cursor()
 
-            cursor.execute(
-                """
-                    SELECT bot_name FROM history
-                    WHERE file_key = ?
-                """, (file_key,)
-            )
+            now = time.time()
+            posted_at = f"{time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now))}.{int(now % 1 * 1e6):06d}"
+            inserted = {}
+            for file_key, last_idol, _ in posts:
+                cursor.execute(
+                    """
+                        INSERT OR IGNORE INTO history (file_key, bot_name, last_idol, posted_at)
+                        VALUES (?, ?, ?, ?)
+                    """, (file_key, bot_name, last_idol, posted_at)
+                )
+                inserted[file_key] = cursor.rowcount == 1
+
+            keys = list(inserted)
+            placeholders = ", ".join("?" for _ in keys)
+            cursor.execute(f"SELECT file_key, bot_name FROM history WHERE file_key IN ({placeholders})", keys)
+            histories = {key: set() for key in keys}
+            for file_key, posted_by in cursor.fetchall():
+                histories[file_key].add(posted_by)
+
+            result = {}
+            for file_key, _, needed_bots in posts:
+                missing = [bot for bot in needed_bots if bot not in histories[file_key]]
+                result[file_key] = missing if missing or inserted[file_key] else None
+
+            return result
+
+    except Exception as e:
+        print(f"Error logging post of {len(posts)} file(s) for bot {bot_name}: {e}.")
+        return {}
 
-            results = cursor.fetchall()
-            return [row[0] for row in results]
+@instrumented
+def get_log_history(file_key):
+    try:
+        connect = get_connection()
+        cursor = connect.cursor()
+
+        cursor.execute(
+            """
+                SELECT bot_name FROM history
+                WHERE file_key = ?
+            """, (file_key,)
+        )
+
+        results = cursor.fetchall()
+        return [row[0] for row in results]
     
     except Exception as e:
         print(f"Error retrieving log history for {file_key}: {e}.")
         return []
 
-def get_idols_with_groups(idol_keys):
-    # Returns metadata for the given idol keys (order preserved, unknown keys dropped),
-    # so it doubles as idol-key validation. idol_names/group_names are decoded from JSON.
+@instrumented
+def get_log_histories(file_keys):
+    # Bulk get_log_history: {file_key: {bot_name, ...}} for every given key (empty set when never
+    # posted), in one IN (...) query on history's (file_key, bot_name) index. A bot's posted subset
+    # of the keys is then {key for key, bots in result.items() if bot_name in bots}.
+    keys = list(dict.fromkeys(key for key in file_keys if key))
+    histories = {key: set() for key in keys}
+    if not keys:
+        return histories
+
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            cursor = connect.cursor()
+        connect = get_connection()
+        cursor = connect.cursor()
 
-            results = []
-            for key in idol_keys:
-                cursor.execute(
-                    """
-                        SELECT i.key, i.idol_names, i.name_tags,
-                               g.key, g.group_names, g.group_tags
-                        FROM idols i
-                        LEFT JOIN groups g ON i.group_id = g.id
-                        WHERE i.key = ?
-                    """, (key,)
-                )
+        placeholders = ", ".join("?" for _ in keys)
+        cursor.execute(f"SELECT file_key, bot_name FROM history WHERE file_key IN ({placeholders})", keys)
+        for file_key, bot_name in cursor.fetchall():
+            histories[file_key].add(bot_name)
 
-                row = cursor.fetchone()
-                if not row:
-                    continue
+        return histories
 
-                results.append({
-                    "key": row[0],
-                    "idol_names": json.loads(row[1]) if row[1] else [],
-                    "name_tags": row[2],
-                    "group_key": row[3],
-                    "group_names": json.loads(row[4]) if row[4] else [],
-                    "group_tags": row[5] or ""
-                })
+    except Exception as e:
+        print(f"Error retrieving log history for {len(keys)} file(s): {e}.")
+        return histories
+
+def _idol_from_row(row):
+    # (i.key, i.idol_names, i.name_tags, g.key, g.group_names, g.group_tags) -> the idol metadata
+    # dict build_tweet_text consumes, with idol_names/group_names decoded from JSON.
+    return {
+        "key": row[0],
+        "idol_names": json.loads(row[1]) if row[1] else [],
+        "name_tags": row[2],
+        "group_key": row[3],
+        "group_names": json.loads(row[4]) if row[4] else [],
+        "group_tags": row[5] or ""
+    }
+
+# --- Uploaded media (bot) ---
+
+# A cached media_id is only handed out with at least this much of its lifetime left, so it can't
+# expire between the lookup and the tweet.
+MEDIA_REUSE_MARGIN_SECONDS = 15 * 60
+
+@instrumented
+def get_cached_media(file_keys, bot_name):
+    # {file_key: media_id} for the keys with an uploaded media this bot owns and can still attach
+    # (see 0011_media_uploads.sql). One IN (...) query on the primary key.
+    keys = list(dict.fromkeys(key for key in file_keys if key))
+    if not keys:
+        return {}
 
-            return results
+    try:
+        connect = get_connection()
+        cursor = connect.cursor()
+
+        placeholders = ", ".join("?" for _ in keys)
+        cursor.execute(
+            f"""
+                SELECT file_key, media_id, owners FROM media_uploads
+                WHERE file_key IN ({placeholders}) AND expires_at > ?
+            """, keys + [int(time.time()) + MEDIA_REUSE_MARGIN_SECONDS]
+        )
+
+        return {file_key: media_id for file_key, media_id, owners in cursor.fetchall()
+                if bot_name in owners.split(",")}
 
     except Exception as e:
-        print(f"Error retrieving idols {idol_keys}: {e}.")
-        return []
+        print(f"Error retrieving uploaded media for {len(keys)} file(s): {e}.")
+        return {}
 
-def get_last_posted_image(bot_name):
+@single_writer
+@instrumented
+def cache_media(file_key, media_id, owners, expires_at):
+    # Record (or replace) the media uploaded for file_key, owned by the `owners` bot names, usable
+    # until `expires_at` (unix seconds). Expired rows are dropped on the way.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
+        connect = get_connection()
+        with connect:
             cursor = connect.cursor()
 
+            cursor.execute("DELETE FROM media_uploads WHERE expires_at <= ?", (int(time.time()),))
             cursor.execute(
                 """
-                    SELECT file_key, last_idol FROM history
-                    WHERE bot_name = ?
-                    ORDER BY posted_at DESC
-                    LIMIT 1
-                """, (bot_name,)
-                )
+                    INSERT OR REPLACE INTO media_uploads (file_key, media_id, owners, expires_at)
+                    VALUES (?, ?, ?, ?)
+                """, (file_key, media_id, ",".join(owners), int(expires_at))
+            )
+
+            return True
+
+    except Exception as e:
+        print(f"Error caching uploaded media for {file_key}: {e}.")
+        return False
+
+@single_writer
+@instrumented
+def forget_media(file_keys):
+    # Drop cached media Twitter no longer accepts (a tweet attaching it failed).
+    keys = list(dict.fromkeys(key for key in file_keys if key))
+    if not keys:
+        return
+
+    try:
+        connect = get_connection()
+        with connect:
+            placeholders = ", ".join("?" for _ in keys)
+            connect.execute(f"DELETE FROM media_uploads WHERE file_key IN ({placeholders})", keys)
+
+    except Exception as e:
+        print(f"Error dropping uploaded media for {len(keys)} file(s): {e}.")
+
+# --- Post plans (bot) ---
+
+@single_writer
+@instrumented
+def save_post_plan(bot_name, file_keys):
+    # Record the pack prepared for this bot's next post (see 0012_post_plans.sql); replaces the
+    # previous plan.
+    try:
+        connect = get_connection()
+        with connect:
+            connect.execute(
+                """
+                    INSERT OR REPLACE INTO post_plans (bot_name, file_keys, prepared_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                """, (bot_name, json.dumps(list(file_keys)))
+            )
+
+            return True
+
+    except Exception as e:
+        print(f"Error saving post plan for bot {bot_name}: {e}.")
+        return False
+
+@instrumented
+def get_post_plan(bot_name):
+    # The R2 keys prepared for this bot's next post, or None.
+    try:
+        connect = get_connection()
+        cursor = connect.cursor()
+
+        cursor.execute("SELECT file_keys FROM post_plans WHERE bot_name = ?", (bot_name,))
+        result = cursor.fetchone()
+        return json.loads(result[0]) if result else None
+
+    except Exception as e:
+        print(f"Error retrieving post plan for bot {bot_name}: {e}.")
+        return None
+
+# --- Idol/group catalogue (in-process cache) ---
+
+# The catalogue only changes through idol/group writes, which bump catalog_version (triggers from
+# migration 0004). Each process keeps the whole catalogue pre-decoded in memory and reloads it only
+# when that counter moves, so one indexed single-row read replaces the table scans + JSON decoding
+# every lookup used to do. The dicts handed out are shared: callers must treat them as read-only.
+
+class IdolCatalogue:
+    def __init__(self, version, idol_rows, group_rows):
+        self.version = version
+
+        # idol_rows: (id, key, idol_names, name_tags, group_key, group_names, group_tags) by id.
+        self.idols_by_key = {}
+        self.idols_by_id = {}
+        self.ids_by_key = {}
+        for row in idol_rows:
+            idol = _idol_from_row(row[1:])
+            self.idols_by_key[idol["key"]] = idol
+            self.idols_by_id[row[0]] = idol
+            self.ids_by_key[idol["key"]] = row[0]
+
+        # Same order as the old ORDER BY g.key, i.key (idols without a group first, like SQLite).
+        self.idols = sorted(self.idols_by_key.values(),
+                            key=lambda idol: (idol["group_key"] is not None, idol["group_key"] or "", idol["key"]))
+
+        self.groups = [{
+            "key": row[0],
+            "group_names": json.loads(row[1]) if row[1] else [],
+            "group_tags": row[2] or ""
+        } for row in group_rows]
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+def _catalogue_version(cursor):
+    row = cursor.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+@instrumented
+def get_catalogue():
+    # The current catalogue, reloaded only if another writer (this process or any other) bumped
+    # catalog_version since it was loaded.
+    global _catalogue
+
+    connect = get_connection()
+    cursor = connect.cursor()
+    version = _catalogue_version(cursor)
+    if _catalogue is not None and _catalogue.version == version:
+        return _catalogue
+
+    with _catalogue_lock:
+        if _catalogue is not None and _catalogue.version == version:
+            return _catalogue
+
+        # Read the version again with the rows, inside one read transaction, so a write landing
+        # mid-load can't be cached under the newer version number (a caller's open transaction
+        # already gives that snapshot).
+        own_transaction = not connect.in_transaction
+        if own_transaction:
+            cursor.execute("BEGIN")
+        try:
+            version = _catalogue_version(cursor)
+            idol_rows = cursor.execute(
+                """
+                    SELECT i.id, i.key, i.idol_names, i.name_tags,
+                           g.key, g.group_names, g.group_tags
+                    FROM idols i
+                    LEFT JOIN groups g ON i.group_id = g.id
+                    ORDER BY i.id
+                """
+            ).fetchall()
+            group_rows = cursor.execute(
+                "SELECT key, group_names, group_tags FROM groups ORDER BY key"
+            ).fetchall()
+        finally:
+            if own_transaction:
+                cursor.execute("COMMIT")
+
+        _catalogue = IdolCatalogue(version, idol_rows, group_rows)
+        return _catalogue
+
+@instrumented
+def get_idols_with_groups(idol_keys):
+    # Returns metadata for the given idol keys (order preserved, unknown keys dropped),
+    # so it doubles as idol-key validation. Served from the in-memory catalogue.
+    try:
+        idols_by_key = get_catalogue().idols_by_key
+        return [idols_by_key[key] for key in idol_keys if key in idols_by_key]
+
+    except Exception as e:
+        print(f"Error retrieving idols {idol_keys}: {e}.")
+        return []
+
+@instrumented
+def get_last_posted_image(bot_name):
+    try:
+        connect = get_connection()
+        cursor = connect.cursor()
+
+        cursor.execute(
+            """
+                SELECT file_key, last_idol FROM history
+                WHERE bot_name = ?
+                ORDER BY posted_at DESC
+                LIMIT 1
+            """, (bot_name,)
+            )
             
-            result = cursor.fetchone()
-            if result:
-                return {"file_key": result[0], "last_idol": result[1]}
+        result = cursor.fetchone()
+        if result:
+            return {"file_key": result[0], "last_idol": result[1]}
             
-            return None
+        return None
     
     except Exception as e:
         print(f"Error retrieving last posted image for bot {bot_name}: {e}.")
         return None
 
+@instrumented
+def get_recent_post_times(bot_name, seconds):
+    # Unix times of the bot's tweets in the last `seconds`, oldest first: one per tweet, as a pack's
+    # history rows share their posted_at (log_posted_pack). A range on idx_history_bot_posted.
+    # None if history can't be read.
+    try:
+        connect = get_connection()
+        cursor = connect.cursor()
+
+        cursor.execute(
+            """
+                SELECT DISTINCT posted_at, CAST(strftime('%s', posted_at) AS INTEGER) FROM history
+                WHERE bot_name = ? AND posted_at >= datetime('now', ?)
+                ORDER BY posted_at
+            """, (bot_name, f"-{int(seconds)} seconds")
+        )
+
+        return [posted for _, posted in cursor.fetchall()]
+
+    except Exception as e:
+        print(f"Error retrieving recent posts for bot {bot_name}: {e}.")
+        return None
+
+# --- Source-URL prefilter (in-process) ---
+
+# Hashes (utils.hashing.source_url_hash) of every source URL ever ingested: live photos plus the
+# archived ones in seen_sources. It only grows — a deleted row leaves a stale hash, which just sends
+# that URL on to the SQL check — so a URL whose hash is absent is certainly new and the dedup
+# lookups answer it without an index probe. Loaded on first use (or by warm_source_filter at API
+# startup); this process's inserts are added as they commit, and rows written by any other
+# connection are picked up by photos.id (AUTOINCREMENT, so monotonic) whenever PRAGMA data_version
+# says the database changed.
+_source_hashes = None
+_source_high_water = 0
+_source_lock = threading.Lock()
+
+def _load_source_rows(cursor, after_id):
+    rows = cursor.execute(
+        "SELECT id, source_url FROM photos WHERE id > ? AND source_url IS NOT NULL ORDER BY id", (after_id,)
+    ).fetchall()
+    return {source_url_hash(row[1]) for row in rows}, (rows[-1][0] if rows else after_id)
+
+def _source_filter(cursor):
+    # The prefilter, caught up with every commit this thread's connection can see.
+    global _source_hashes, _source_high_water
+
+    data_version = cursor.execute("PRAGMA data_version").fetchone()[0]
+    if _source_hashes is not None and getattr(_local, "source_data_version", None) == data_version:
+        return _source_hashes
+
+    with _source_lock:
+        if _source_hashes is None:
+            # Both tables from one read snapshot, so a row archived mid-load is in one or the other.
+            own_transaction = not cursor.connection.in_transaction
+            if own_transaction:
+                cursor.execute("BEGIN")
+            try:
+                hashes = {row[0] for row in cursor.execute("SELECT url_hash FROM seen_sources")}
+                added, _source_high_water = _load_source_rows(cursor, 0)
+            finally:
+                if own_transaction:
+                    cursor.execute("COMMIT")
+            _source_hashes = hashes | added
+        else:
+            added, _source_high_water = _load_source_rows(cursor, _source_high_water)
+            _source_hashes.update(added)
+
+    _local.source_data_version = data_version
+    return _source_hashes
+
+def _note_source_urls(source_urls):
+    # After an insert commits: its URLs become "maybe seen" straight away, before any catch-up.
+    if _source_hashes is None:
+        return
+    with _source_lock:
+        _source_hashes.update(source_url_hash(url) for url in source_urls if url)
+
+def warm_source_filter():
+    # Build the prefilter up front (API startup) so the first ingest request doesn't pay for it.
+    try:
+        return len(_source_filter(get_connection().cursor()))
+    except Exception as e:
+        print(f"Error loading source URL prefilter: {e}.")
+        return None
+
+# --- Near-duplicate index (in-process) ---
+
+# Perceptual hashes (photos.phash, see utils.image.perceptual_hash) of every live and archived
+# photo in a utils.hashing.HammingIndex, so "is this a re-upload of something we have?" is a few
+# dict probes instead of a scan. Kept current like the source-URL prefilter: loaded on first use,
+# this process's inserts/deletes applied as they commit, other connections' rows picked up by
+# photos.id once PRAGMA data_version moves. Two photos within PHASH_MAX_DISTANCE bits (of 64)
+# count as the same picture.
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", 6))
+
+_phash_index = None
+_phash_high_water = 0
+_phash_lock = threading.Lock()
+
+def _load_phash_rows(cursor, table, after_id):
+    rows = cursor.execute(
+        f"SELECT id, phash FROM {table} WHERE id > ? AND phash IS NOT NULL ORDER BY id", (after_id,)
+    ).fetchall()
+    return rows, (rows[-1][0] if rows else after_id)
+
+def _near_duplicate_index(cursor):
+    # The index, caught up with every commit this thread's connection can see.
+    global _phash_index, _phash_high_water
+
+    data_version = cursor.execute("PRAGMA data_version").fetchone()[0]
+    if _phash_index is not None and getattr(_local, "phash_data_version", None) == data_version:
+        return _phash_index
+
+    with _phash_lock:
+        if _phash_index is None:
+            # Both tables from one read snapshot, so a row archived mid-load is in one or the other.
+            own_transaction = not cursor.connection.in_transaction
+            if own_transaction:
+                cursor.execute("BEGIN")
+            try:
+                archived, _ = _load_phash_rows(cursor, "photos_archive", 0)
+                live, _phash_high_water = _load_phash_rows(cursor, "photos", 0)
+            finally:
+                if own_transaction:
+                    cursor.execute("COMMIT")
+            index = HammingIndex()
+            for photo_id, phash in archived + live:
+                index.add(photo_id, phash)
+            _phash_index = index
+        else:
+            live, _phash_high_water = _load_phash_rows(cursor, "photos", _phash_high_water)
+            for photo_id, phash in live:
+                _phash_index.add(photo_id, phash)
+
+    _local.phash_data_version = data_version
+    return _phash_index
+
+def _note_phashes(pairs):
+    # After an insert commits: (photo_id, phash) pairs join the index straight away.
+    if _phash_index is None:
+        return
+    with _phash_lock:
+        for photo_id, phash in pairs:
+            if phash is not None:
+                _phash_index.add(photo_id, phash)
+
+def _forget_phashes(photo_ids):
+    # After a delete commits (failed-ingest cleanup): those rows can no longer be matched.
+    if _phash_index is None:
+        return
+    with _phash_lock:
+        for photo_id in photo_ids:
+            _phash_index.discard(photo_id)
+
+class _DuplicateMatcher:
+    # duplicate_of for rows a write transaction inserts one after another: the closest known photo,
+    # or earlier row of the same batch, within PHASH_MAX_DISTANCE (the batch's rows only join the
+    # shared index once the transaction has committed).
+    def __init__(self, cursor, phashes):
+        has_hashes = any(phash is not None for phash in phashes)
+        self.index = _near_duplicate_index(cursor) if has_hashes else None
+        self.batch = HammingIndex()
+
+    def match(self, phash):
+        if phash is None or self.index is None:
+            return None
+        hits = [hit for hit in (self.index.nearest(phash, PHASH_MAX_DISTANCE),
+                                self.batch.nearest(phash, PHASH_MAX_DISTANCE)) if hit]
+        return min(hits)[1] if hits else None
+
+    def add(self, photo_id, phash):
+        if phash is not None:
+            self.batch.add(photo_id, phash)
+
+@instrumented
+def find_near_duplicate(phash, max_distance=None):
+    # Id of the closest known photo (live or archived) within max_distance bits of `phash`
+    # (default PHASH_MAX_DISTANCE), or None.
+    if phash is None:
+        return None
+
+    try:
+        hit = _near_duplicate_index(get_connection().cursor()).nearest(
+            phash, PHASH_MAX_DISTANCE if max_distance is None else max_distance
+        )
+        return hit[1] if hit else None
+
+    except Exception as e:
+        print(f"Error looking up near-duplicates: {e}.")
+        return None
+
+def warm_near_duplicate_index():
+    # Build the index up front (API startup) so the first ingest doesn't pay for it.
+    try:
+        return len(_near_duplicate_index(get_connection().cursor()))
+    except Exception as e:
+        print(f"Error loading near-duplicate index: {e}.")
+        return None
+
 # --- Photo pipeline writes (ingestion) ---
 
+@instrumented
 def get_idol_ids_by_keys(idol_keys):
     # Resolve idol keys to their row ids (only keys that exist come back).
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            cursor = connect.cursor()
-
-            result = {}
-            for key in idol_keys:
-                cursor.execute("SELECT id FROM idols WHERE key = ?", (key,))
-                row = cursor.fetchone()
-                if row:
-                    result[key] = row[0]
-
-            return result
+        ids_by_key = get_catalogue().ids_by_key
+        return {key: ids_by_key[key] for key in idol_keys if key in ids_by_key}
 
     except Exception as e:
         print(f"Error resolving idol ids {idol_keys}: {e}.")
         return {}
 
-def insert_photo(source, source_url=None, date=None, urgent=None, copies=0, combo=None, album_id=None):
+@single_writer
+@instrumented
+def insert_photo(source, source_url=None, date=None, urgent=None, copies=0, combo=None, album_id=None,
+                 phash=None, content_hash=None):
     # Insert as 'uploading' first (before the R2 upload) so a crash mid-upload leaves a
     # traceable row to clean up rather than an orphaned bucket object with no record.
+    # duplicate_of is filled from the near-duplicate index when a phash is given.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                cursor.execute(
-                    """
-                        INSERT INTO photos
-                            (source, source_url, status, date, urgent, copies, combo, album_id)
-                        VALUES (?, ?, 'uploading', ?, ?, ?, ?, ?)
-                    """, (source, source_url, date, urgent, copies, combo, album_id)
-                )
+            duplicate_of = _DuplicateMatcher(cursor, [phash]).match(phash)
+            cursor.execute(
+                """
+                    INSERT INTO photos
+                        (source, source_url, status, date, urgent, copies, combo, album_id,
+                         phash, content_hash, duplicate_of)
+                    VALUES (?, ?, 'uploading', ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (source, source_url, date, urgent, copies, combo, album_id, phash, content_hash,
+                      duplicate_of)
+            )
+            photo_id = cursor.lastrowid
 
-                return cursor.lastrowid
+        _note_source_urls([source_url])
+        _note_phashes([(photo_id, phash)])
+        return photo_id
 
     except Exception as e:
         print(f"Error inserting photo: {e}.")
         return None
 
+@single_writer
+@instrumented
 def set_photo_ready(photo_id, r2_key):
     # Called after a successful upload: record the key and move the row into the pipeline.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                cursor.execute(
-                    """
-                        UPDATE photos
-                        SET r2_key = ?, bucket_stage = 'analysis', status = 'pending'
-                        WHERE id = ?
-                    """, (r2_key, photo_id)
-                )
+            cursor.execute(
+                """
+                    UPDATE photos
+                    SET r2_key = ?, bucket_stage = 'analysis', status = 'pending'
+                    WHERE id = ?
+                """, (r2_key, photo_id)
+            )
 
-                return True
+            return True
 
     except Exception as e:
         print(f"Error marking photo {photo_id} ready: {e}.")
         return False
 
+def idol_signature(idol_ids):
+    # Canonical identity of an idol set (the combo grouping key): ascending ids, comma-joined.
+    return ",".join(str(idol_id) for idol_id in sorted(set(idol_ids))) or None
+
+def _refresh_idol_signature(cursor, photo_id):
+    # Recompute photos.idol_signature from the photo's current links (same transaction).
+    idol_ids = [row[0] for row in cursor.execute(
+        "SELECT idol_id FROM photo_idols WHERE photo_id = ?", (photo_id,)
+    ).fetchall()]
+    cursor.execute("UPDATE photos SET idol_signature = ? WHERE id = ?", (idol_signature(idol_ids), photo_id))
+
+@single_writer
+@instrumented
 def link_photo_idols(photo_id, idol_ids, confidence=1.0):
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                for idol_id in idol_ids:
-                    cursor.execute(
-                        """
-                            INSERT OR IGNORE INTO photo_idols (photo_id, idol_id, confidence)
-                            VALUES (?, ?, ?)
-                        """, (photo_id, idol_id, confidence)
-                    )
+            cursor.executemany(
+                """
+                    INSERT OR IGNORE INTO photo_idols (photo_id, idol_id, confidence)
+                    VALUES (?, ?, ?)
+                """, [(photo_id, idol_id, confidence) for idol_id in idol_ids]
+            )
+            _refresh_idol_signature(cursor, photo_id)
 
-                return True
+            return True
 
     except Exception as e:
         print(f"Error linking idols to photo {photo_id}: {e}.")
         return False
 
+@single_writer
+@instrumented
 def delete_photo(photo_id):
     # Cleanup path for a failed ingest (removes the row + any idol links).
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                cursor.execute("DELETE FROM photo_idols WHERE photo_id = ?", (photo_id,))
-                cursor.execute("DELETE FROM photos WHERE id = ?", (photo_id,))
+            cursor.execute("DELETE FROM photo_idols WHERE photo_id = ?", (photo_id,))
+            cursor.execute("DELETE FROM photos WHERE id = ?", (photo_id,))
 
-                return True
+        _forget_phashes([photo_id])
+        return True
 
     except Exception as e:
         print(f"Error deleting photo {photo_id}: {e}.")
         return False
 
-def get_idol_keys_by_names(names):
-    # Text-match names from source metadata (e.g. a Kpopping profile-link name) against each
-    # idol's registered idol_names (multi-language), case-insensitive. Returns the resolved keys
-    # (order preserved, unknown names dropped), so it doubles as idol validation for scraping.
+# --- Batch ingestion (one transaction per batch) ---
+
+_PHOTO_INSERT_COLUMNS = ("source", "source_url", "date", "urgent", "copies", "combo", "album_id", "phash",
+                         "content_hash")
+
+@single_writer
+@instrumented
+def insert_photos(photos):
+    # Batch twin of insert_photo: every row inserted as 'uploading' in ONE transaction. `photos` is
+    # a list of dicts carrying the insert_photo fields. Returns the new ids in input order, or None
+    # if the batch could not be written (nothing is inserted then).
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
+        connect = get_connection()
+        with connect:
             cursor = connect.cursor()
 
-            cursor.execute("SELECT key, idol_names FROM idols")
+            photo_ids = []
+            matcher = _DuplicateMatcher(cursor, [photo.get("phash") for photo in photos])
+            for photo in photos:
+                cursor.execute(
+                    """
+                        INSERT INTO photos
+                            (source, source_url, status, date, urgent, copies, combo, album_id,
+                             phash, content_hash, duplicate_of)
+                        VALUES (?, ?, 'uploading', ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, tuple(photo.get(column) for column in _PHOTO_INSERT_COLUMNS)
+                         + (matcher.match(photo.get("phash")),)
+                )
+                photo_ids.append(cursor.lastrowid)
+                matcher.add(cursor.lastrowid, photo.get("phash"))
+
+        _note_source_urls(photo.get("source_url") for photo in photos)
+        _note_phashes((photo_id, photo.get("phash")) for photo_id, photo in zip(photo_ids, photos))
+        return photo_ids
+
+    except Exception as e:
+        print(f"Error inserting {len(photos)} photo(s): {e}.")
+        return None
+
+def _link_photos_batch(cursor, links, confidence):
+    # links: [(photo_id, idol_ids), ...] -> photo_idols rows + idol_signature, via executemany.
+    cursor.executemany(
+        """
+            INSERT OR IGNORE INTO photo_idols (photo_id, idol_id, confidence)
+            VALUES (?, ?, ?)
+        """, [(photo_id, idol_id, confidence) for photo_id, idol_ids in links for idol_id in idol_ids]
+    )
+    cursor.executemany(
+        "UPDATE photos SET idol_signature = ? WHERE id = ?",
+        [(idol_signature(idol_ids), photo_id) for photo_id, idol_ids in links]
+    )
 
-            lookup = {}
-            for key, names_json in cursor.fetchall():
-                for name in (json.loads(names_json) if names_json else []):
-                    lookup[name.lower()] = key
+@single_writer
+@instrumented
+def finalize_photos(ready, confidence=1.0):
+    # Batch twin of set_photo_ready + link_photo_idols for rows whose upload succeeded.
+    # ready: [(photo_id, r2_key, idol_ids), ...], all written in ONE transaction.
+    try:
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-            resolved = []
-            for name in names:
-                key = lookup.get(name.strip().lower())
-                if key and key not in resolved:
-                    resolved.append(key)
+            cursor.executemany(
+                """
+                    UPDATE photos
+                    SET r2_key = ?, bucket_stage = 'analysis', status = 'pending'
+                    WHERE id = ?
+                """, [(r2_key, photo_id) for photo_id, r2_key, _ in ready]
+            )
+            _link_photos_batch(cursor, [(photo_id, idol_ids) for photo_id, _, idol_ids in ready], confidence)
 
-            return resolved
+            return True
+
+    except Exception as e:
+        print(f"Error finalizing {len(ready)} photo(s): {e}.")
+        return False
+
+@single_writer
+@instrumented
+def register_photos(photos, confidence=1.0):
+    # Batch metadata-only ingest for bytes already in R2: each dict carries the insert_photo fields
+    # plus `r2_key` and `idol_ids`. Rows go straight to 'pending' (no 'uploading' phase: the upload
+    # already happened) and are linked to their idols — rows and links in ONE transaction. Returns
+    # the new ids in input order, or None if nothing could be written.
+    try:
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
+
+            photo_ids = []
+            matcher = _DuplicateMatcher(cursor, [photo.get("phash") for photo in photos])
+            for photo in photos:
+                cursor.execute(
+                    """
+                        INSERT INTO photos
+                            (source, source_url, status, date, urgent, copies, combo, album_id,
+                             phash, content_hash, duplicate_of, r2_key, bucket_stage)
+                        VALUES (?, ?, 'pending', ?, ?, ?, ?, ?, ?, ?, ?, ?, 'analysis')
+                    """, tuple(photo.get(column) for column in _PHOTO_INSERT_COLUMNS)
+                         + (matcher.match(photo.get("phash")), photo["r2_key"])
+                )
+                photo_ids.append(cursor.lastrowid)
+                matcher.add(cursor.lastrowid, photo.get("phash"))
+
+            _link_photos_batch(cursor, [(photo_id, photo["idol_ids"])
+                                        for photo_id, photo in zip(photo_ids, photos)], confidence)
+
+        _note_source_urls(photo.get("source_url") for photo in photos)
+        _note_phashes((photo_id, photo.get("phash")) for photo_id, photo in zip(photo_ids, photos))
+        return photo_ids
+
+    except Exception as e:
+        print(f"Error registering {len(photos)} photo(s): {e}.")
+        return None
+
+@single_writer
+@instrumented
+def delete_photos(photo_ids):
+    # Batch twin of delete_photo (failed-ingest cleanup), one transaction.
+    if not photo_ids:
+        return True
+
+    try:
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
+
+            cursor.executemany("DELETE FROM photo_idols WHERE photo_id = ?", [(pid,) for pid in photo_ids])
+            cursor.executemany("DELETE FROM photos WHERE id = ?", [(pid,) for pid in photo_ids])
+
+        _forget_phashes(photo_ids)
+        return True
+
+    except Exception as e:
+        print(f"Error deleting photos {photo_ids}: {e}.")
+        return False
+
+@instrumented
+def replace_idol_aliases(cursor, idol_id, idol_names):
+    # Rewrite one idol's rows in the idol_aliases index from its idol_names. Runs on the caller's
+    # cursor so it commits (or rolls back) together with the idol write itself.
+    cursor.execute("DELETE FROM idol_aliases WHERE idol_id = ?", (idol_id,))
+    aliases = {normalize_alias(name) for name in idol_names or []}
+    aliases.discard("")
+    cursor.executemany(
+        "INSERT OR IGNORE INTO idol_aliases (alias_norm, idol_id) VALUES (?, ?)",
+        [(alias, idol_id) for alias in aliases]
+    )
+
+@instrumented
+def get_idol_keys_by_names(names):
+    # Text-match names from source metadata (e.g. a Kpopping profile-link name) against each
+    # idol's registered idol_names (multi-language), via the normalized idol_aliases index, so
+    # case, full-/half-width and kana variants all match. Returns the resolved keys (order
+    # preserved, unknown names dropped), so it doubles as idol validation for scraping.
+    try:
+        normalized = [normalize_alias(name) for name in names]
+        wanted = sorted({alias for alias in normalized if alias})
+        if not wanted:
+            return []
+
+        connect = get_connection()
+        cursor = connect.cursor()
+
+        placeholders = ", ".join("?" for _ in wanted)
+        cursor.execute(
+            f"""
+                SELECT a.alias_norm, i.key
+                FROM idol_aliases a
+                JOIN idols i ON a.idol_id = i.id
+                WHERE a.alias_norm IN ({placeholders})
+                ORDER BY a.idol_id
+            """, wanted
+        )
+        # Rows come by idol id, so a name shared by two idols resolves to the later one.
+        key_by_alias = dict(cursor.fetchall())
+
+        resolved = []
+        for alias in normalized:
+            key = key_by_alias.get(alias)
+            if key and key not in resolved:
+                resolved.append(key)
+
+        return resolved
 
     except Exception as e:
         print(f"Error resolving idol names {names}: {e}.")
         return []
 
+@instrumented
 def photo_exists_by_source_url(source_url):
-    # Dedup check for ingestion: has this exact source image already been ingested?
+    # Dedup check for ingestion: has this exact source image already been ingested? Live rows are
+    # matched on photos.source_url, archived ones on their hash in seen_sources — only when the
+    # prefilter says the URL may have been seen.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            cursor = connect.cursor()
+        connect = get_connection()
+        cursor = connect.cursor()
 
-            cursor.execute("SELECT 1 FROM photos WHERE source_url = ? LIMIT 1", (source_url,))
-            return cursor.fetchone() is not None
+        if source_url_hash(source_url) not in _source_filter(cursor):
+            return False
+
+        cursor.execute(
+            """
+                SELECT EXISTS (SELECT 1 FROM photos WHERE source_url = ?)
+                    OR EXISTS (SELECT 1 FROM seen_sources WHERE url_hash = ?)
+            """, (source_url, source_url_hash(source_url))
+        )
+        return bool(cursor.fetchone()[0])
 
     except Exception as e:
         print(f"Error checking source_url {source_url}: {e}.")
         return False
 
+@instrumented
+def get_existing_source_urls(source_urls):
+    # Batch dedup check: the subset of `source_urls` already ingested (live or archived). URLs the
+    # prefilter has never seen are dropped up front; the rest take one IN (...) query per table.
+    urls = list({url for url in source_urls if url})
+    if not urls:
+        return set()
+
+    try:
+        connect = get_connection()
+        cursor = connect.cursor()
+
+        seen = _source_filter(cursor)
+        urls = [url for url in urls if source_url_hash(url) in seen]
+        if not urls:
+            return set()
+
+        placeholders = ", ".join("?" for _ in urls)
+        cursor.execute(f"SELECT DISTINCT source_url FROM photos WHERE source_url IN ({placeholders})", urls)
+        existing = {row[0] for row in cursor.fetchall()}
+
+        url_by_hash = {source_url_hash(url): url for url in urls if url not in existing}
+        if url_by_hash:
+            placeholders = ", ".join("?" for _ in url_by_hash)
+            cursor.execute(
+                f"SELECT url_hash FROM seen_sources WHERE url_hash IN ({placeholders})", list(url_by_hash)
+            )
+            existing.update(url_by_hash[row[0]] for row in cursor.fetchall())
+
+        return existing
+
+    except Exception as e:
+        print(f"Error checking {len(urls)} source_url(s): {e}.")
+        return set()
+
+# --- Shared objects (content-addressed storage) ---
+
+# Statuses whose r2_key must exist in R2 (posted rows keep theirs only as the history key).
+_LIVE_OBJECT_STATUSES = "('uploading', 'pending', 'approved')"
+
+@instrumented
+def get_objects_by_content_hash(content_hashes):
+    # {content_hash: r2_key} for the given SHA-256 hexes that a pending or approved photo already
+    # stores in R2 — bytes a new photo can point at instead of uploading them again.
+    hashes = list({content_hash for content_hash in content_hashes if content_hash})
+    if not hashes:
+        return {}
+
+    try:
+        connect = get_connection()
+        cursor = connect.cursor()
+
+        placeholders = ", ".join("?" for _ in hashes)
+        cursor.execute(
+            f"""
+                SELECT content_hash, r2_key FROM photos
+                WHERE content_hash IN ({placeholders})
+                  AND status IN ('pending', 'approved') AND r2_key IS NOT NULL
+                ORDER BY id
+            """, hashes
+        )
+        objects = {}
+        for content_hash, r2_key in cursor.fetchall():
+            objects.setdefault(content_hash, r2_key)
+
+        return objects
+
+    except Exception as e:
+        print(f"Error looking up {len(hashes)} content hash(es): {e}.")
+        return {}
+
+@instrumented
+def count_object_refs(r2_key, exclude_ids=()):
+    # How many live photos (other than exclude_ids) still point at r2_key. An object is deleted
+    # only once this reaches 0; on error it answers 1, so a failed check never deletes shared bytes.
+    try:
+        connect = get_connection()
+        cursor = connect.cursor()
+
+        exclude_ids = list(exclude_ids)
+        sql = f"""
+            SELECT COUNT(*) FROM photos
+            WHERE r2_key = ? AND status IN {_LIVE_OBJECT_STATUSES}
+        """
+        if exclude_ids:
+            sql += f" AND id NOT IN ({', '.join('?' for _ in exclude_ids)})"
+
+        cursor.execute(sql, [r2_key] + exclude_ids)
+        return cursor.fetchone()[0]
+
+    except Exception as e:
+        print(f"Error counting references to {r2_key}: {e}.")
+        return 1
+
 # --- Photo pipeline reads (posting) ---
 
-def _build_photo_text(idol_keys, date):
+def _build_photo_text(idols_data, date):
     # Reuses processor.build_tweet_text with DB-sourced idol metadata. Imported lazily because
     # processor imports this module at load time, so a top-level import would be circular.
     from utils.processor import build_tweet_text
 
-    idols_data = get_idols_with_groups(idol_keys)
     return build_tweet_text(idols_data, date)
 
-def get_approved_photos():
+def _render_photo_text(cursor, photo_id, date):
+    # The tweet text for one photo from its idol links and the cached catalogue.
+    idols_by_id = get_catalogue().idols_by_id
+    idol_ids = [row[0] for row in cursor.execute(
+        "SELECT idol_id FROM photo_idols WHERE photo_id = ? ORDER BY idol_id", (photo_id,)
+    ).fetchall()]
+
+    return _build_photo_text([idols_by_id[i] for i in idol_ids if i in idols_by_id], date or "")
+
+@single_writer
+@instrumented
+def _store_photo_texts(rendered):
+    # Write back lazily re-rendered texts ([(text, photo_id), ...]). Best effort: a failure only
+    # means they are rendered again next time.
+    try:
+        connect = get_connection()
+        with connect:
+            connect.executemany(
+                "UPDATE photos SET tweet_text = ? WHERE id = ? AND tweet_text IS NULL", rendered
+            )
+
+    except Exception as e:
+        print(f"Error storing {len(rendered)} tweet text(s): {e}.")
+
+_APPROVED_COLUMNS = """
+    id, r2_key, date, urgent, copies, combo,
+    album_id, ai_score, reviewed_at, tweet_text
+"""
+
+def _approved_photo_dicts(rows, idols_by_photo):
+    # Shape _APPROVED_COLUMNS rows like process_data's output (see get_approved_photos), taking each
+    # photo's idols from idols_by_photo ({photo_id: [catalogue idol dicts]}). Rows without a stored
+    # tweet text get it rendered here and written back.
+    photos = []
+    rendered = []
+    for row in rows:
+        (photo_id, r2_key, date, urgent, copies,
+         combo, album_id, ai_score, reviewed_at, text) = row
+
+        idols_data = idols_by_photo.get(photo_id, [])
+        if text is None:
+            text = _build_photo_text(idols_data, date or "")
+            rendered.append((text, photo_id))
+
+        photos.append({
+            "id": photo_id,
+            "key": r2_key,
+            "idols": [idol["key"] for idol in idols_data],
+            "date": date or "",
+            "urgent": urgent if urgent else None,
+            "copies": copies or 0,
+            "combo": combo,
+            "album_id": album_id,
+            "ai_score": ai_score,
+            "reviewed_at": reviewed_at,
+            "text": text
+        })
+
+    if rendered:
+        _store_photo_texts(rendered)
+
+    return photos
+
+def _idols_for_photos(cursor, photo_ids):
+    # {photo_id: [catalogue idol dicts, by idol id]} for a batch of photos, in one IN (...) query.
+    if not photo_ids:
+        return {}
+
+    idols_by_id = get_catalogue().idols_by_id
+    placeholders = ", ".join("?" for _ in photo_ids)
+    cursor.execute(
+        f"""
+            SELECT photo_id, idol_id FROM photo_idols
+            WHERE photo_id IN ({placeholders})
+            ORDER BY photo_id, idol_id
+        """, list(photo_ids)
+    )
+
+    idols_by_photo = {}
+    for photo_id, idol_id in cursor.fetchall():
+        if idol_id in idols_by_id:
+            idols_by_photo.setdefault(photo_id, []).append(idols_by_id[idol_id])
+
+    return idols_by_photo
+
+@instrumented
+def get_approved_photos(idol_key=None):
     # The bot's approved queue: every photo in the 'approved' bucket stage, shaped exactly like
     # process_data's output (key/idols/date/urgent/copies/combo/text) so _get_image consumes it
     # unchanged — `key` is now the r2_key (the object actually downloaded/logged), the metadata
     # coming from the DB instead of the file name. Also carries the pipeline fields.
     # priority sort needs (ai_score, reviewed_at) and album_id (the source grouping key).
+    # Two queries for the whole queue (photos, then every idol link in one join). The tweet text is
+    # the one stored at approval; only rows without one (approved before it was stored, or made
+    # stale by an idol/group edit) are rendered here, from the cached catalogue, and written back.
+    # `idol_key` narrows it to one idol's photos (an idol bot's queue) through the photo_idols idol
+    # index, so the work follows that idol's queue depth rather than the whole queue's.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            cursor = connect.cursor()
+        connect = get_connection()
+        cursor = connect.cursor()
+
+        condition = "bucket_stage = 'approved'"
+        params = []
+        if idol_key:
+            condition += """
+                AND id IN (SELECT pi.photo_id FROM photo_idols pi
+                           JOIN idols i ON pi.idol_id = i.id
+                           WHERE i.key = ?)
+            """
+            params.append(idol_key)
+
+        cursor.execute(
+            f"""
+                SELECT {_APPROVED_COLUMNS}
+                FROM photos
+                WHERE {condition}
+            """, params
+        )
+        rows = cursor.fetchall()
+
+        cursor.execute(
+            f"""
+                SELECT pi.photo_id, pi.idol_id
+                FROM photo_idols pi
+                WHERE pi.photo_id IN (SELECT id FROM photos WHERE {condition})
+                ORDER BY pi.photo_id, pi.idol_id
+            """, params
+        )
+
+        # Idol/group metadata comes pre-decoded from the in-memory catalogue.
+        idols_by_id = get_catalogue().idols_by_id
+        idols_by_photo = {}
+        for photo_id, idol_id in cursor.fetchall():
+            if idol_id in idols_by_id:
+                idols_by_photo.setdefault(photo_id, []).append(idols_by_id[idol_id])
+
+        return _approved_photo_dicts(rows, idols_by_photo)
 
-            cursor.execute(
-                """
-                    SELECT id, r2_key, date, urgent, copies, combo,
-                           album_id, ai_score, reviewed_at
-                    FROM photos
-                    WHERE bucket_stage = 'approved'
-                """
-            )
-            rows = cursor.fetchall()
+    except Exception as e:
+        print(f"Error retrieving approved photos: {e}.")
+        return []
 
-            photos = []
-            for row in rows:
-                (photo_id, r2_key, date, urgent, copies,
-                 combo, album_id, ai_score, reviewed_at) = row
+# --- Posting queue (bot) ---
+
+# SQL twin of utils.sorter.priority_sort (which stays the reference; see
+# benchmarks/check_priority_order.py): (urgent or expiring, ai_score, days_waiting, -copies), all
+# descending, ties in id order like the stable Python sort over the id-ordered queue.
+# days_waiting mirrors sorter._days_waiting: whole days (floored) since reviewed_at, a naive
+# timestamp read as BRT (UTC-3, no DST since 2019), 0 when missing or unparsable.
+_POST_QUEUE_SQL = f"""
+    WITH queue AS (
+        SELECT {_APPROVED_COLUMNS}, idol_signature,
+               COALESCE(julianday('now') - CASE
+                   WHEN reviewed_at LIKE '%+__:__' OR reviewed_at LIKE '%-__:__' OR reviewed_at LIKE '%Z'
+                       THEN julianday(reviewed_at)
+                   ELSE julianday(reviewed_at, '+3 hours')
+               END, 0) AS waited
+        FROM photos p
+        WHERE bucket_stage = 'approved'
+          AND NOT EXISTS (SELECT 1 FROM history h WHERE h.file_key = p.r2_key AND h.bot_name = :bot)
+          AND (:idol_id IS NULL OR id IN (SELECT photo_id FROM photo_idols WHERE idol_id = :idol_id))
+          AND (:skip_signature IS NULL OR idol_signature IS NOT :skip_signature)
+    ), ranked AS (
+        SELECT *, CAST(waited AS INTEGER) - (waited < CAST(waited AS INTEGER)) AS days_waiting
+        FROM queue
+    )
+    SELECT {_APPROVED_COLUMNS}, idol_signature
+    FROM ranked
+    ORDER BY ((urgent IS NOT NULL AND urgent != 0) OR days_waiting >= 7) DESC,
+             COALESCE(ai_score, 0) DESC,
+             days_waiting DESC,
+             COALESCE(copies, 0) ASC,
+             id ASC
+"""
+
+@instrumented
+def next_post_candidates(bot_name, limit=3):
+    # The bot's next post(s), chosen in SQL instead of sorting the whole approved queue in Python:
+    # approved photos of this bot's idol (every idol for GENERAL), minus anything this bot already
+    # posted (anti-join on history) and, for GENERAL, minus photos of the same idol set as its last
+    # post; ordered like priority_sort. Returns the top `limit` (None = all) as get_approved_photos
+    # dicts; a combo photo also carries `pack` — its combo siblings (same combo + idol set, any
+    # history), ordered by copies and capped at 4, i.e. what one multi-image tweet posts.
+    try:
+        connect = get_connection()
+        cursor = connect.cursor()
+        catalogue = get_catalogue()
+
+        idol_id = None
+        skip_signature = None
+        if bot_name == "GENERAL":
+            last_post = get_last_posted_image(bot_name)
+            if last_post and last_post["last_idol"]:
+                last_keys = [key.strip() for key in last_post["last_idol"].split(",")]
+                if all(key in catalogue.ids_by_key for key in last_keys):
+                    skip_signature = idol_signature(catalogue.ids_by_key[key] for key in last_keys)
+        else:
+            idol_id = catalogue.ids_by_key.get(bot_name.lower())
+            if idol_id is None:
+                return []
+
+        sql = _POST_QUEUE_SQL + (" LIMIT :limit" if limit else "")
+        rows = cursor.execute(sql, {
+            "bot": bot_name, "idol_id": idol_id, "skip_signature": skip_signature, "limit": limit,
+        }).fetchall()
+        if not rows:
+            return []
+
+        signatures = {row[0]: row[-1] for row in rows}
+        rows = [row[:-1] for row in rows]
+
+        # Combo siblings of every returned candidate, in one query on the partial combo index.
+        combos = sorted({row[5] for row in rows if row[5]})
+        sibling_rows = []
+        if combos:
+            placeholders = ", ".join("?" for _ in combos)
+            for row in cursor.execute(
+                f"""
+                    SELECT {_APPROVED_COLUMNS}, idol_signature
+                    FROM photos
+                    WHERE combo IN ({placeholders}) AND bucket_stage = 'approved'
+                    ORDER BY copies, id
+                """, combos
+            ).fetchall():
+                signatures[row[0]] = row[-1]
+                sibling_rows.append(row[:-1])
 
-                cursor.execute(
-                    """
-                        SELECT i.key
-                        FROM photo_idols pi
-                        JOIN idols i ON pi.idol_id = i.id
-                        WHERE pi.photo_id = ?
-                        ORDER BY i.id
-                    """, (photo_id,)
-                )
-                idol_keys = [r[0] for r in cursor.fetchall()]
+        idols_by_photo = _idols_for_photos(cursor, list({row[0] for row in rows + sibling_rows}))
+        candidates = _approved_photo_dicts(rows, idols_by_photo)
+        siblings = _approved_photo_dicts(sibling_rows, idols_by_photo)
 
-                photos.append({
-                    "id": photo_id,
-                    "key": r2_key,
-                    "idols": idol_keys,
-                    "date": date or "",
-                    "urgent": urgent if urgent else None,
-                    "copies": copies or 0,
-                    "combo": combo,
-                    "album_id": album_id,
-                    "ai_score": ai_score,
-                    "reviewed_at": reviewed_at,
-                    "text": _build_photo_text(idol_keys, date or "")
-                })
+        for candidate in candidates:
+            if candidate["combo"]:
+                candidate["pack"] = [photo for photo in siblings
+                                     if photo["combo"] == candidate["combo"]
+                                     and signatures[photo["id"]] == signatures[candidate["id"]]][:4]
 
-            return photos
+        return candidates
 
     except Exception as e:
-        print(f"Error retrieving approved photos: {e}.")
+        print(f"Error retrieving post candidates for bot {bot_name}: {e}.")
         return []
 
 # --- Approval pipeline (webapp) ---
 
-def get_pending_photos():
+def _idol_keys_for_photos(cursor, photo_ids):
+    # {photo_id: [idol keys ordered by idol id]} for a batch of photos, in one IN (...) query.
+    if not photo_ids:
+        return {}
+
+    placeholders = ", ".join("?" for _ in photo_ids)
+    cursor.execute(
+        f"""
+            SELECT pi.photo_id, i.key
+            FROM photo_idols pi
+            JOIN idols i ON pi.idol_id = i.id
+            WHERE pi.photo_id IN ({placeholders})
+            ORDER BY pi.photo_id, i.id
+        """, list(photo_ids)
+    )
+
+    keys_by_photo = {}
+    for photo_id, key in cursor.fetchall():
+        keys_by_photo.setdefault(photo_id, []).append(key)
+
+    return keys_by_photo
+
+@instrumented
+def get_pending_photos(limit=None, after=None, idol_key=None, album_id=None, source=None):
     # The approval queue: photos awaiting review (status='pending', still in the analysis stage),
     # newest first, each with its resolved idol keys and the fields the webapp shows.
+    # Keyset-paginated on (created_at, id): `after` is the (created_at, id) of the last row of the
+    # previous page and `limit` caps the page (None = the whole queue). Optional filters narrow it
+    # to one idol / album / source. Idol keys are fetched once per page, not per row.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            cursor = connect.cursor()
+        connect = get_connection()
+        cursor = connect.cursor()
 
-            cursor.execute(
+        conditions = ["status = 'pending'"]
+        params = []
+
+        if after:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(after)
+        if idol_key:
+            conditions.append(
                 """
-                    SELECT id, source, source_url, date, ai_score, album_id, created_at,
-                           urgent, combo, copies
-                    FROM photos
-                    WHERE status = 'pending'
-                    ORDER BY created_at DESC, id DESC
+                    id IN (SELECT pi.photo_id FROM photo_idols pi
+                           JOIN idols i ON pi.idol_id = i.id
+                           WHERE i.key = ?)
                 """
             )
-            rows = cursor.fetchall()
-
-            photos = []
-            for row in rows:
-                (photo_id, source, source_url, date, ai_score, album_id, created_at,
-                 urgent, combo, copies) = row
-
-                cursor.execute(
-                    """
-                        SELECT i.key
-                        FROM photo_idols pi
-                        JOIN idols i ON pi.idol_id = i.id
-                        WHERE pi.photo_id = ?
-                        ORDER BY i.id
-                    """, (photo_id,)
-                )
-                idol_keys = [r[0] for r in cursor.fetchall()]
-
-                photos.append({
-                    "id": photo_id,
-                    "idols": idol_keys,
-                    "source": source,
-                    "source_url": source_url,
-                    "date": date,
-                    "ai_score": ai_score,
-                    "album_id": album_id,
-                    "created_at": created_at,
-                    "urgent": urgent if urgent else None,
-                    "combo": combo,
-                    "copies": copies or 0
-                })
-
-            return photos
+            params.append(idol_key)
+        if album_id:
+            conditions.append("album_id = ?")
+            params.append(album_id)
+        if source:
+            conditions.append("source = ?")
+            params.append(source)
+
+        sql = f"""
+            SELECT id, source, source_url, date, ai_score, album_id, created_at,
+                   urgent, combo, copies, duplicate_of
+            FROM photos
+            WHERE {" AND ".join(conditions)}
+            ORDER BY created_at DESC, id DESC
+        """
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+        keys_by_photo = _idol_keys_for_photos(cursor, [row[0] for row in rows])
+
+        photos = []
+        for row in rows:
+            (photo_id, source, source_url, date, ai_score, album_id, created_at,
+             urgent, combo, copies, duplicate_of) = row
+
+            photos.append({
+                "id": photo_id,
+                "idols": keys_by_photo.get(photo_id, []),
+                "source": source,
+                "source_url": source_url,
+                "date": date,
+                "ai_score": ai_score,
+                "album_id": album_id,
+                "created_at": created_at,
+                "urgent": urgent if urgent else None,
+                "combo": combo,
+                "copies": copies or 0,
+                "duplicate_of": duplicate_of
+            })
+
+        return photos
 
     except Exception as e:
         print(f"Error retrieving pending photos: {e}.")
         return []
 
+@instrumented
 def get_photo(photo_id):
     # Minimal lookup for the approve/reject/stream endpoints: current R2 key + pipeline state.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            cursor = connect.cursor()
-
-            cursor.execute(
-                "SELECT id, r2_key, bucket_stage, status FROM photos WHERE id = ?", (photo_id,)
-            )
-            row = cursor.fetchone()
-            if not row:
-                return None
+        connect = get_connection()
+        cursor = connect.cursor()
+
+        cursor.execute(
+            "SELECT id, r2_key, bucket_stage, status FROM photos WHERE id = ?", (photo_id,)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return None
 
-            return {"id": row[0], "r2_key": row[1], "bucket_stage": row[2], "status": row[3]}
+        return {"id": row[0], "r2_key": row[1], "bucket_stage": row[2], "status": row[3]}
 
     except Exception as e:
         print(f"Error retrieving photo {photo_id}: {e}.")
         return None
 
+@single_writer
+@instrumented
 def set_photo_approved(photo_id, r2_key, reviewed_by="webapp"):
     # Finalize an approval: point the row at the promoted 'approved/...' key and stamp review data.
     # reviewed_at is BRT ISO so the sorter's _days_waiting parses it consistently with the app tz.
+    # The tweet text is rendered now and stored, so the posting path never has to build it.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                cursor.execute(
-                    """
-                        UPDATE photos
-                        SET r2_key = ?, bucket_stage = 'approved', status = 'approved',
-                            reviewed_by = ?, reviewed_at = ?
-                        WHERE id = ?
-                    """, (r2_key, reviewed_by, datetime.now(TIMEZONE_BRT).isoformat(), photo_id)
-                )
+            date = cursor.execute("SELECT date FROM photos WHERE id = ?", (photo_id,)).fetchone()
+            tweet_text = _render_photo_text(cursor, photo_id, date[0] if date else "")
+
+            cursor.execute(
+                """
+                    UPDATE photos
+                    SET r2_key = ?, bucket_stage = 'approved', status = 'approved',
+                        reviewed_by = ?, reviewed_at = ?, tweet_text = ?
+                    WHERE id = ?
+                """, (r2_key, reviewed_by, datetime.now(TIMEZONE_BRT).isoformat(), tweet_text, photo_id)
+            )
 
-                return True
+            return True
 
     except Exception as e:
         print(f"Error approving photo {photo_id}: {e}.")
         return False
 
-def set_photo_posted(photo_id):
-    # Called after the bot posts a photo and deletes its bytes: take it out of the approved queue
-    # so get_approved_photos never returns a row whose R2 object is already gone.
+@single_writer
+@instrumented
+def set_object_posted(r2_key):
+    # Every relevant bot has posted the object at r2_key: retire each approved photo pointing at it
+    # (one, unless content-addressed storage shares the bytes — the history is per key, so those
+    # siblings count as posted too). Returns how many live photos (still pending) keep the object
+    # needed, so the caller deletes the bytes only at 0; None on failure (keep them). Its uploaded
+    # Twitter media has no bot left to attach it, so that goes too.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                cursor.execute(
-                    "UPDATE photos SET status = 'posted', bucket_stage = 'posted' WHERE id = ?",
-                    (photo_id,)
-                )
+            cursor.execute(
+                "UPDATE photos SET status = 'posted', bucket_stage = 'posted' WHERE r2_key = ? AND status = 'approved'",
+                (r2_key,)
+            )
+            cursor.execute("DELETE FROM media_uploads WHERE file_key = ?", (r2_key,))
+            cursor.execute(
+                f"SELECT COUNT(*) FROM photos WHERE r2_key = ? AND status IN {_LIVE_OBJECT_STATUSES}",
+                (r2_key,)
+            )
 
-                return True
+            return cursor.fetchone()[0]
 
     except Exception as e:
-        print(f"Error marking photo {photo_id} posted: {e}.")
-        return False
+        print(f"Error marking {r2_key} posted: {e}.")
+        return None
 
+@single_writer
+@instrumented
 def set_photo_rejected(photo_id, reviewed_by="webapp"):
     # Reject: the bytes are deleted by the caller; the row is kept (r2_key cleared) so the same
     # source image is not re-ingested later (dedup via source_url). Both status and bucket_stage
     # read 'rejected' so the state is visible in either column.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                cursor.execute(
-                    """
-                        UPDATE photos
-                        SET status = 'rejected', bucket_stage = 'rejected', r2_key = NULL,
-                            reviewed_by = ?, reviewed_at = ?
-                        WHERE id = ?
-                    """, (reviewed_by, datetime.now(TIMEZONE_BRT).isoformat(), photo_id)
-                )
+            cursor.execute(
+                """
+                    UPDATE photos
+                    SET status = 'rejected', bucket_stage = 'rejected', r2_key = NULL,
+                        reviewed_by = ?, reviewed_at = ?
+                    WHERE id = ?
+                """, (reviewed_by, datetime.now(TIMEZONE_BRT).isoformat(), photo_id)
+            )
 
-                return True
+            return True
 
     except Exception as e:
         print(f"Error rejecting photo {photo_id}: {e}.")
@@ -474,41 +1554,41 @@ def set_photo_rejected(photo_id, reviewed_by="webapp"):
 
 # --- Approval metadata: urgent + auto-combo (webapp) ---
 
+@single_writer
+@instrumented
 def set_photo_urgent(photo_id, urgent):
     # Toggle a pending photo's urgent flag (stored 1 / NULL to match the sorter's `is not None`).
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                cursor.execute(
-                    "UPDATE photos SET urgent = ? WHERE id = ? AND status = 'pending'",
-                    (1 if urgent else None, photo_id)
-                )
+            cursor.execute(
+                "UPDATE photos SET urgent = ? WHERE id = ? AND status = 'pending'",
+                (1 if urgent else None, photo_id)
+            )
 
-                return cursor.rowcount > 0
+            return cursor.rowcount > 0
 
     except Exception as e:
         print(f"Error setting urgent on photo {photo_id}: {e}.")
         return False
 
-def _idol_set(cursor, photo_id):
-    # The photo's idol keys as an ordered tuple (the grouping identity for a combo).
+def _next_combo_number(cursor, signature):
+    # Bump and return this idol-set's combo counter (numbers never collide with, or reuse, one
+    # already handed out for the same idol(s)).
     cursor.execute(
         """
-            SELECT i.key FROM photo_idols pi
-            JOIN idols i ON pi.idol_id = i.id
-            WHERE pi.photo_id = ? ORDER BY i.id
-        """, (photo_id,)
+            INSERT INTO combo_counters (idol_signature, last_number) VALUES (?, 1)
+            ON CONFLICT(idol_signature) DO UPDATE SET last_number = last_number + 1
+        """, (signature,)
     )
-    return tuple(row[0] for row in cursor.fetchall())
-
-def _combos_for_idol_set(cursor, idol_set):
-    # Every distinct combo label already used by photos of exactly this idol-set (any status), so a
-    # new combo number never collides with an existing one for the same idol(s).
-    rows = cursor.execute("SELECT id, combo FROM photos WHERE combo IS NOT NULL").fetchall()
-    return {combo for pid, combo in rows if _idol_set(cursor, pid) == idol_set}
+    return cursor.execute(
+        "SELECT last_number FROM combo_counters WHERE idol_signature = ?", (signature,)
+    ).fetchone()[0]
 
+@single_writer
+@instrumented
 def create_combo(photo_ids):
     # Group 2-4 pending photos of the same idol(s) into one multi-image tweet. Assigns a combo label
     # (D/T/Q by size + the next per-idol-set number) and `copies` = list order. Returns
@@ -517,47 +1597,50 @@ def create_combo(photo_ids):
         return None
 
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                idol_sets = []
-                for photo_id in photo_ids:
-                    row = cursor.execute("SELECT status FROM photos WHERE id = ?", (photo_id,)).fetchone()
-                    if not row or row[0] != "pending":
-                        return None
-                    idol_sets.append(_idol_set(cursor, photo_id))
+            placeholders = ", ".join("?" for _ in photo_ids)
+            rows = cursor.execute(
+                f"SELECT id, status, idol_signature FROM photos WHERE id IN ({placeholders})",
+                list(photo_ids)
+            ).fetchall()
 
-                idol_set = idol_sets[0]
-                if not idol_set or any(s != idol_set for s in idol_sets):
-                    return None
+            if len(rows) != len(photo_ids) or any(status != "pending" for _, status, _ in rows):
+                return None
+
+            signatures = {signature for _, _, signature in rows}
+            if len(signatures) != 1 or None in signatures:
+                return None
 
-                type_letter = {2: "D", 3: "T", 4: "Q"}[len(photo_ids)]
-                used = _combos_for_idol_set(cursor, idol_set)
-                numbers = [int(re.search(r"\d+", c).group()) for c in used if re.search(r"\d+", c)]
-                number = (max(numbers) + 1) if numbers else 1
-                combo = f"{type_letter}{number}"
+            type_letter = {2: "D", 3: "T", 4: "Q"}[len(photo_ids)]
+            number = _next_combo_number(cursor, signatures.pop())
+            combo = f"{type_letter}{number}"
 
-                for order, photo_id in enumerate(photo_ids, start=1):
-                    cursor.execute("UPDATE photos SET combo = ?, copies = ? WHERE id = ?",
-                                   (combo, order, photo_id))
+            cursor.executemany(
+                "UPDATE photos SET combo = ?, copies = ? WHERE id = ?",
+                [(combo, order, photo_id) for order, photo_id in enumerate(photo_ids, start=1)]
+            )
 
-                label = f"{ {'D': 'Duo', 'T': 'Trio', 'Q': 'Quad'}[type_letter] } #{number}"
-                return {"combo": combo, "label": label}
+            label = f"{ {'D': 'Duo', 'T': 'Trio', 'Q': 'Quad'}[type_letter] } #{number}"
+            return {"combo": combo, "label": label}
 
     except Exception as e:
         print(f"Error creating combo for {photo_ids}: {e}.")
         return None
 
+@single_writer
+@instrumented
 def clear_combo(combo):
     # Ungroup: drop the combo label + copies from every photo carrying it.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                cursor.execute("UPDATE photos SET combo = NULL, copies = 0 WHERE combo = ?", (combo,))
-                return True
+            cursor.execute("UPDATE photos SET combo = NULL, copies = 0 WHERE combo = ?", (combo,))
+            return True
 
     except Exception as e:
         print(f"Error clearing combo {combo}: {e}.")
@@ -565,41 +1648,44 @@ def clear_combo(combo):
 
 # --- AI aesthetic score (local worker) ---
 
+@instrumented
 def get_photos_pending_score():
     # The local AI worker's queue: pending photos that don't have an aesthetic score yet
     # (oldest first, so a backlog is worked through in order).
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            cursor = connect.cursor()
+        connect = get_connection()
+        cursor = connect.cursor()
 
-            cursor.execute(
-                """
-                    SELECT id, source, date FROM photos
-                    WHERE status = 'pending' AND ai_score IS NULL
-                    ORDER BY created_at ASC, id ASC
-                """
-            )
+        cursor.execute(
+            """
+                SELECT id, source, date FROM photos
+                WHERE status = 'pending' AND ai_score IS NULL
+                ORDER BY created_at ASC, id ASC
+            """
+        )
 
-            return [{"id": row[0], "source": row[1], "date": row[2]} for row in cursor.fetchall()]
+        return [{"id": row[0], "source": row[1], "date": row[2]} for row in cursor.fetchall()]
 
     except Exception as e:
         print(f"Error retrieving photos pending score: {e}.")
         return []
 
+@single_writer
+@instrumented
 def set_photo_score(photo_id, ai_score, ai_reasoning=None):
     # Store the worker's aesthetic score (1-10) + optional reasoning. Advisory only — the sorter
     # uses it as a tiebreaker and it shows on the approval card; nothing auto-filters on it.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                cursor.execute(
-                    "UPDATE photos SET ai_score = ?, ai_reasoning = ? WHERE id = ?",
-                    (ai_score, ai_reasoning, photo_id)
-                )
+            cursor.execute(
+                "UPDATE photos SET ai_score = ?, ai_reasoning = ? WHERE id = ?",
+                (ai_score, ai_reasoning, photo_id)
+            )
 
-                return cursor.rowcount > 0
+            return cursor.rowcount > 0
 
     except Exception as e:
         print(f"Error setting score on photo {photo_id}: {e}.")
@@ -607,132 +1693,241 @@ def set_photo_score(photo_id, ai_score, ai_reasoning=None):
 
 # --- Idol registration (webapp) ---
 
+@instrumented
 def get_all_idols():
     # Every registered idol with its group — for the webapp's idol picker and the idol list.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            cursor = connect.cursor()
-
-            cursor.execute(
-                """
-                    SELECT i.key, i.idol_names, i.name_tags,
-                           g.key, g.group_names, g.group_tags
-                    FROM idols i
-                    LEFT JOIN groups g ON i.group_id = g.id
-                    ORDER BY g.key, i.key
-                """
-            )
-
-            return [{
-                "key": row[0],
-                "idol_names": json.loads(row[1]) if row[1] else [],
-                "name_tags": row[2],
-                "group_key": row[3],
-                "group_names": json.loads(row[4]) if row[4] else [],
-                "group_tags": row[5] or ""
-            } for row in cursor.fetchall()]
+        return list(get_catalogue().idols)
 
     except Exception as e:
         print(f"Error retrieving idols: {e}.")
         return []
 
+@instrumented
 def get_all_groups():
     # Every registered group — for the register-idol form's group dropdown.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            cursor = connect.cursor()
-
-            cursor.execute("SELECT key, group_names, group_tags FROM groups ORDER BY key")
-
-            return [{
-                "key": row[0],
-                "group_names": json.loads(row[1]) if row[1] else [],
-                "group_tags": row[2] or ""
-            } for row in cursor.fetchall()]
+        return list(get_catalogue().groups)
 
     except Exception as e:
         print(f"Error retrieving groups: {e}.")
         return []
 
+@instrumented
 def idol_exists(key):
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            cursor = connect.cursor()
-
-            cursor.execute("SELECT 1 FROM idols WHERE key = ? LIMIT 1", (key,))
-            return cursor.fetchone() is not None
+        return key in get_catalogue().idols_by_key
 
     except Exception as e:
         print(f"Error checking idol {key}: {e}.")
         return False
 
+@single_writer
+@instrumented
 def create_idol(key, idol_names, name_tags, group_key, group_names=None, group_tags=None):
     # Register a new idol, creating its group on the fly if that group key doesn't exist yet
     # (group_names defaults to the group key). Returns the new idol id, or None on failure.
     # Assumes the idol key is free — callers check idol_exists first for a clean 409.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
-
-                group_id = None
-                if group_key:
-                    row = cursor.execute("SELECT id FROM groups WHERE key = ?", (group_key,)).fetchone()
-                    if row:
-                        group_id = row[0]
-                    else:
-                        cursor.execute(
-                            "INSERT INTO groups (key, group_names, group_tags) VALUES (?, ?, ?)",
-                            (group_key, json.dumps(group_names or [group_key], ensure_ascii=False),
-                             group_tags or "")
-                        )
-                        group_id = cursor.lastrowid
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                cursor.execute(
-                    "INSERT INTO idols (key, idol_names, name_tags, group_id) VALUES (?, ?, ?, ?)",
-                    (key, json.dumps(idol_names, ensure_ascii=False), name_tags, group_id)
-                )
+            group_id = None
+            if group_key:
+                row = cursor.execute("SELECT id FROM groups WHERE key = ?", (group_key,)).fetchone()
+                if row:
+                    group_id = row[0]
+                else:
+                    cursor.execute(
+                        "INSERT INTO groups (key, group_names, group_tags) VALUES (?, ?, ?)",
+                        (group_key, json.dumps(group_names or [group_key], ensure_ascii=False),
+                         group_tags or "")
+                    )
+                    group_id = cursor.lastrowid
+
+            cursor.execute(
+                "INSERT INTO idols (key, idol_names, name_tags, group_id) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(idol_names, ensure_ascii=False), name_tags, group_id)
+            )
+            idol_id = cursor.lastrowid
+
+            replace_idol_aliases(cursor, idol_id, idol_names)
 
-                return cursor.lastrowid
+            return idol_id
 
     except Exception as e:
         print(f"Error creating idol {key}: {e}.")
         return None
 
+@single_writer
+@instrumented
 def set_idol_kpopping(idol_key, kpopping_url, kpopping_id):
     # Store an idol's Kpopping identity (profile URL + resolved UUID) so the poller can find them.
+    # An unchanged identity (migrate_json re-linking the seed) writes nothing, so it doesn't bump
+    # catalog_version.
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            with connect:
-                cursor = connect.cursor()
+        connect = get_connection()
+        with connect:
+            cursor = connect.cursor()
 
-                cursor.execute(
-                    "UPDATE idols SET kpopping_url = ?, kpopping_id = ? WHERE key = ?",
-                    (kpopping_url, kpopping_id, idol_key)
-                )
+            cursor.execute(
+                """
+                    UPDATE idols SET kpopping_url = ?, kpopping_id = ?
+                    WHERE key = ? AND (kpopping_url IS NOT ? OR kpopping_id IS NOT ?)
+                """, (kpopping_url, kpopping_id, idol_key, kpopping_url, kpopping_id)
+            )
 
-                return True
+            return True
 
     except Exception as e:
         print(f"Error setting Kpopping id for idol {idol_key}: {e}.")
         return False
 
+@instrumented
 def get_idols_for_discovery():
     # Idols the auto-scraper can poll: those with a resolved Kpopping UUID. Returns [(key, id), ...].
     try:
-        with closing(sqlite3.connect(DB_FILE)) as connect:
-            cursor = connect.cursor()
+        connect = get_connection()
+        cursor = connect.cursor()
 
-            cursor.execute(
-                """
-                    SELECT key, kpopping_id FROM idols
-                    WHERE kpopping_id IS NOT NULL AND kpopping_id != ''
-                    ORDER BY key
-                """
-            )
+        cursor.execute(
+            """
+                SELECT key, kpopping_id FROM idols
+                WHERE kpopping_id IS NOT NULL AND kpopping_id != ''
+                ORDER BY key
+            """
+        )
 
-            return [{"key": row[0], "kpopping_id": row[1]} for row in cursor.fetchall()]
+        return [{"key": row[0], "kpopping_id": row[1]} for row in cursor.fetchall()]
 
     except Exception as e:
         print(f"Error retrieving idols for discovery: {e}.")
         return []
+
+# --- Archival (maintenance job) ---
+
+# Every photos column, in order; photos_archive has the same ones (+ archived_at). See 0008.
+_ARCHIVE_COLUMNS = """
+    id, r2_key, bucket_stage, source, source_url, ai_score, ai_reasoning, status, reviewed_by,
+    reviewed_at, created_at, date, urgent, copies, combo, album_id, idol_signature, tweet_text,
+    phash, duplicate_of, content_hash
+"""
+ARCHIVE_BATCH_SIZE = 500
+
+@single_writer
+@instrumented
+def _archive_batch(older_than_days, batch_size, after_id=0):
+    # One transaction: pick up to batch_size terminal rows past after_id last touched more than
+    # older_than_days ago (reviewed_at — set on reject and on approval, which precedes posting — else
+    # created_at), remember their source_url hashes, copy rows + idol links to the archive, delete
+    # them from the hot tables. Returns (photos archived, last id looked at) so the next batch
+    # resumes there instead of re-checking the terminal rows too recent to archive. `+status` keeps
+    # the plan on the primary key (a rowid range already in id order) rather than the status index
+    # plus a sort of every terminal row.
+    connect = get_connection()
+    with connect:
+        cursor = connect.cursor()
+
+        rows = cursor.execute(
+            """
+                SELECT id, source_url FROM photos
+                WHERE id > ? AND +status IN ('rejected', 'posted')
+                  AND julianday(COALESCE(reviewed_at, created_at)) < julianday('now', ?)
+                ORDER BY id
+                LIMIT ?
+            """, (after_id, f"-{int(older_than_days)} days", batch_size)
+        ).fetchall()
+        if not rows:
+            return 0, None
+
+        ids = [photo_id for photo_id, _ in rows]
+        placeholders = ", ".join("?" for _ in ids)
+
+        cursor.executemany(
+            "INSERT OR IGNORE INTO seen_sources (url_hash) VALUES (?)",
+            [(source_url_hash(url),) for _, url in rows if url]
+        )
+        cursor.execute(
+            f"""
+                INSERT OR REPLACE INTO photos_archive ({_ARCHIVE_COLUMNS})
+                SELECT {_ARCHIVE_COLUMNS} FROM photos WHERE id IN ({placeholders})
+            """, ids
+        )
+        cursor.execute(
+            f"""
+                INSERT OR REPLACE INTO photo_idols_archive (photo_id, idol_id, confidence)
+                SELECT photo_id, idol_id, confidence FROM photo_idols WHERE photo_id IN ({placeholders})
+            """, ids
+        )
+        cursor.execute(f"DELETE FROM photo_idols WHERE photo_id IN ({placeholders})", ids)
+        cursor.execute(f"DELETE FROM photos WHERE id IN ({placeholders})", ids)
+
+        return len(ids), ids[-1]
+
+def archive_terminal_photos(older_than_days, batch_size=ARCHIVE_BATCH_SIZE):
+    # Move every rejected/posted photo older than older_than_days out of the hot tables, one short
+    # transaction per batch so the single writer is never held for long; the batches walk the table
+    # once, in id order. Dedup keeps working: the archived source URLs stay in seen_sources. Returns
+    # the number of photos archived.
+    total = 0
+    last_id = 0
+    try:
+        while True:
+            moved, last_id = _archive_batch(older_than_days, batch_size, last_id)
+            total += moved
+            if moved < batch_size:
+                return total
+
+    except Exception as e:
+        print(f"Error archiving terminal photos (archived {total} before failing): {e}.")
+        return total
+
+@single_writer
+@instrumented
+def optimize_database():
+    # After archiving: refresh planner statistics (bounded ANALYZE + PRAGMA optimize) and hand the
+    # freed pages back to the filesystem. Incremental vacuum needs auto_vacuum=INCREMENTAL; an
+    # existing DB is switched once by hand (convert_to_incremental_vacuum, archive_photos.py
+    # --convert-vacuum), never here: that full VACUUM would hold the single writer for the whole
+    # rewrite. Returns the number of pages freed (0 without incremental vacuum), or None on failure.
+    try:
+        connect = get_connection()
+        cursor = connect.cursor()
+
+        cursor.execute("PRAGMA analysis_limit = 1000")
+        cursor.execute("ANALYZE")
+        cursor.execute("PRAGMA optimize")
+
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            print("Incremental vacuum unavailable (auto_vacuum is not INCREMENTAL); run "
+                  "scripts/archive_photos.py --convert-vacuum once to enable it.")
+            return 0
+
+        freed = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        cursor.execute("PRAGMA incremental_vacuum").fetchall()
+        return freed
+
+    except Exception as e:
+        print(f"Error optimizing the database: {e}.")
+        return None
+
+@single_writer
+def convert_to_incremental_vacuum():
+    # One-off: switch the DB to auto_vacuum=INCREMENTAL, which an existing DB only picks up through
+    # a full VACUUM (rewrites the whole file, blocking every write meanwhile). True once it is.
+    try:
+        connect = get_connection()
+        cursor = connect.cursor()
+
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return True
+
+        print("Switching the database to incremental auto-vacuum (full VACUUM)...")
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+        return cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    except Exception as e:
+        print(f"Error switching the database to incremental auto-vacuum: {e}.")
+        return False
@@ -0,0 +1,94 @@
+import hashlib
+import functools
+import itertools
+
+# Stable hashes the DB stores as keys, and the in-memory index near-duplicate checks search.
+# DB-free, like utils.names.
+
+def source_url_hash(source_url):
+    # seen_sources key: the first 8 bytes of BLAKE2b(source_url) as a signed 64-bit int, so it fits
+    # SQLite's INTEGER PRIMARY KEY (the rowid). At 64 bits a false "already seen" needs ~4 billion
+    # archived URLs to become likely.
+    digest = hashlib.blake2b(source_url.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+def content_hash(data):
+    # photos.content_hash: SHA-256 of an object's bytes, hex. Names the object in content-addressed
+    # mode, so byte-identical images from different URLs share one R2 object.
+    return hashlib.sha256(data).hexdigest()
+
+# --- Near-duplicate lookup over 64-bit perceptual hashes ---
+
+_MASK64 = (1 << 64) - 1
+
+def hamming_distance(a, b):
+    # Differing bits between two 64-bit hashes (signed or not).
+    return ((a ^ b) & _MASK64).bit_count()
+
+@functools.cache
+def _flip_masks(bits, radius):
+    # Every `bits`-wide mask with at most `radius` bits set (the chunk values to probe).
+    masks = [0]
+    for count in range(1, radius + 1):
+        for positions in itertools.combinations(range(bits), count):
+            masks.append(sum(1 << position for position in positions))
+    return tuple(masks)
+
+class HammingIndex:
+    # Multi-index hashing: each 64-bit hash is filed under its 4 16-bit chunks, one dict per chunk.
+    # Two hashes within distance r differ by at most r // 4 bits in some chunk (pigeonhole), so a
+    # query probes only the chunk values that close — 17 per chunk for r < 8 — and measures the few
+    # hashes filed there, instead of comparing against every stored hash.
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(self):
+        self.tables = [{} for _ in range(self.CHUNKS)]
+        self.values = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def _chunks(self, value):
+        mask = (1 << self.CHUNK_BITS) - 1
+        return [(value >> (self.CHUNK_BITS * n)) & mask for n in range(self.CHUNKS)]
+
+    def add(self, item_id, value):
+        # Idempotent per item_id (a reload may see rows that were already added).
+        value &= _MASK64
+        if item_id in self.values:
+            return
+        self.values[item_id] = value
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            table.setdefault(chunk, []).append((item_id, value))
+
+    def discard(self, item_id):
+        value = self.values.pop(item_id, None)
+        if value is None:
+            return
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            bucket = [entry for entry in table[chunk] if entry[0] != item_id]
+            if bucket:
+                table[chunk] = bucket
+            else:
+                del table[chunk]
+
+    def nearest(self, value, max_distance):
+        # (distance, item_id) of the closest stored hash within max_distance (lowest id on a tie),
+        # or None.
+        value &= _MASK64
+        masks = _flip_masks(self.CHUNK_BITS, max_distance // self.CHUNKS)
+        best = None
+        checked = set()
+
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            for mask in masks:
+                for item_id, other in table.get(chunk ^ mask, ()):
+                    if item_id in checked:
+                        continue
+                    checked.add(item_id)
+                    distance = (value ^ other).bit_count()
+                    if distance <= max_distance and (best is None or (distance, item_id) < best):
+                        best = (distance, item_id)
+
+        return best
@@ -1,8 +1,56 @@
 import io
-from PIL import Image
+import os
+import math
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
 
 MAX_TWEET_IMAGE_BYTES = 15_000_000
 
+# Recompression search bounds: JPEG quality is searched in QUALITY_STEP steps between
+# QUALITY_MIN and QUALITY_MAX; past that the image is scaled down (never below MIN_SIDE on its
+# longer side) and encoded at SHRINK_QUALITY.
+QUALITY_MAX = 90
+QUALITY_MIN = 40
+QUALITY_STEP = 5
+SHRINK_QUALITY = 85
+MIN_SIDE = 1000
+# Sizes are estimated on a proxy: the image point-sampled (NEAREST) down to PROXY_SIDE on its
+# longer side, its encoded size times the pixel ratio. Point sampling keeps the grain/detail per
+# pixel that drives JPEG size (an averaging downscale smooths it away and underestimates ~4x).
+# SIZE_MARGIN keeps headroom for the estimate's error.
+PROXY_SIDE = 1024
+SIZE_MARGIN = 0.92
+
+# Oversized images are recompressed in worker processes (ensure_uploadable_image_pooled), so the
+# CPU-bound PIL work never competes for the GIL with the API's event loop and request threads.
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 1))
+
+def _encode(img, quality):
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+def _open_upright(image_data, draft_size=None):
+    # Decoded image, rotated/flipped per its EXIF orientation (the JPEG written back carries no
+    # EXIF, so the pixels themselves must be upright) and in a JPEG-encodable mode. `draft_size`
+    # (stored orientation): a JPEG is decoded at the smallest 1/2..1/8 scale still at least that big.
+    img = Image.open(io.BytesIO(image_data))
+    if draft_size:
+        img.draft("RGB", draft_size)
+
+    ImageOps.exif_transpose(img, in_place=True)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    img.load()
+    return img
+
+def _fit(size, side):
+    # `size` scaled down to fit `side` on its longer side (never up).
+    scale = min(1.0, side / max(size))
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
 def ensure_uploadable_image(image_data: bytes, max_bytes: int = MAX_TWEET_IMAGE_BYTES) -> bytes:
     """
     Ensure the image is uploadable to Twitter by checking its size and compressing it if necessary.
@@ -10,29 +58,113 @@ def ensure_uploadable_image(image_data: bytes, max_bytes: int = MAX_TWEET_IMAGE_
     if len(image_data) <= max_bytes:
         return image_data, None
 
-    # Open the image using PIL
-    with Image.open(io.BytesIO(image_data)) as img:
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGB")
-        img.load()
-
-        # Compress the image by reducing quality
-        quality = 90
-        while quality >= 40:
-            buffer = io.BytesIO()
-            img.save(buffer, format="JPEG", quality=quality, optimize=True)
-            data = buffer.getvalue()
+    with Image.open(io.BytesIO(image_data)) as source:
+        is_jpeg = source.format == "JPEG"
+        stored_size = source.size
+
+    img = _open_upright(image_data)
+    width, height = img.size
+    swapped = img.size != stored_size
+
+    proxy = img.resize(_fit(img.size, PROXY_SIDE), Image.NEAREST) if max(img.size) > PROXY_SIDE else img
+    pixel_ratio = (width * height) / (proxy.width * proxy.height)
+
+    def estimate(quality):
+        return len(_encode(proxy, quality)) * pixel_ratio
+
+    # Highest quality on the QUALITY_STEP grid estimated to fit: QUALITY_MAX first (most oversized
+    # sources are just uncompressed or q100), else a binary search on the proxy — instead of
+    # full-size encodes at 90, 80, 70... Then encode full size, stepping down the grid only if the
+    # estimate was optimistic; normally that first encode is the answer.
+    qualities = list(range(QUALITY_MIN, QUALITY_MAX + 1, QUALITY_STEP))
+    target = max_bytes * SIZE_MARGIN
+    chosen = None
+    if estimate(qualities[-1]) <= target:
+        chosen = len(qualities) - 1
+    else:
+        low, high = 0, len(qualities) - 2
+        while low <= high:
+            middle = (low + high) // 2
+            if estimate(qualities[middle]) <= target:
+                chosen, low = middle, middle + 1
+            else:
+                high = middle - 1
+
+    if chosen is not None:
+        for quality in reversed(qualities[:chosen + 1]):
+            data = _encode(img, quality)
             if len(data) <= max_bytes:
                 return data, "jpg"
-            quality -= 10
 
-    while max(img.size) > 1000:
-        img = img.resize((int(img.width * 0.85), int(img.height * 0.85)), Image.LANCZOS)
-        buffer = io.BytesIO()
-        img.save(buffer, format="JPEG", quality=85, optimize=True)
-        data = buffer.getvalue()
+    # Even the lowest quality is too big: scale down, to dimensions computed once from the
+    # estimated SHRINK_QUALITY size (JPEG size grows about linearly with pixel count) rather than
+    # 15% per try. A miss corrects the scale from the size it actually got.
+    scale = min(1.0, math.sqrt(target / estimate(SHRINK_QUALITY)))
+    floor = min(1.0, MIN_SIDE / max(width, height))
+    for _ in range(4):
+        scale = max(scale, floor)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+
+        # A JPEG is re-decoded at the nearest DCT scale (1/2..1/8) at or above the target, so
+        # LANCZOS resamples from that instead of the full-size pixels.
+        source = img
+        if is_jpeg and scale <= 0.5:
+            source = _open_upright(image_data, draft_size=size[::-1] if swapped else size)
+        data = _encode(source.resize(size, Image.LANCZOS), SHRINK_QUALITY)
+        if len(data) <= max_bytes or scale == floor:
+            break
+        scale *= math.sqrt(target / len(data))
+
+    return data, "jpg"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _image_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the API process has live threads (scheduler, DB writer, executors).
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def ensure_uploadable_image_pooled(image_data: bytes, max_bytes: int = MAX_TWEET_IMAGE_BYTES):
+    # ensure_uploadable_image with the recompression in a worker process. Images already under the
+    # limit (the common case) return straight away, without shipping bytes to a worker. If the pool
+    # can't run it, the work is done here instead.
+    if len(image_data) <= max_bytes:
+        return image_data, None
+
+    try:
+        return _image_pool().submit(ensure_uploadable_image, image_data, max_bytes).result()
+
+    except Exception as e:
+        print(f"Error recompressing image in the worker pool: {e}. Recompressing in process.")
+        return ensure_uploadable_image(image_data, max_bytes)
+
+# Side of the perceptual hash grid: (DHASH_SIZE + 1) x DHASH_SIZE pixels -> DHASH_SIZE² bits.
+DHASH_SIZE = 8
+
+def perceptual_hash(image_data: bytes):
+    # 64-bit difference hash (dHash) for near-duplicate detection: grayscale, shrink to 9x8, one bit
+    # per horizontally adjacent pixel pair (is the left one brighter?). Re-encoding, resizing and a
+    # host's recompression move it by a few bits at most, so the same photo under another URL lands
+    # close by. Returned as a signed 64-bit int (fits SQLite's INTEGER); None if it doesn't decode.
+    try:
+        with Image.open(io.BytesIO(image_data)) as img:
+            # JPEG: let the decoder downscale (1/2 .. 1/8) instead of decoding full size.
+            img.draft("L", (DHASH_SIZE * 8, DHASH_SIZE * 8))
+            pixels = img.convert("L").resize((DHASH_SIZE + 1, DHASH_SIZE), Image.BOX).tobytes()
+
+    except Exception as e:
+        print(f"Error hashing image: {e}.")
+        return None
 
-        if len(data) <= max_bytes:
-            return data, "jpg"
+    value = 0
+    for row in range(DHASH_SIZE):
+        offset = row * (DHASH_SIZE + 1)
+        for col in range(DHASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
 
-    return data, "jpg"
\ No newline at end of file
+    return value - (1 << 64) if value >= 1 << 63 else value
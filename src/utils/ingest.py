@@ -1,13 +1,25 @@
+import os
 import uuid
 
 from utils.database_operations import (
+    PHASH_MAX_DISTANCE,
+    find_near_duplicate,
+    get_objects_by_content_hash,
+    count_object_refs,
     get_idol_ids_by_keys,
     insert_photo,
     set_photo_ready,
     link_photo_idols,
     delete_photo,
+    insert_photos,
+    finalize_photos,
+    register_photos,
+    delete_photos,
+    set_photo_approved,
 )
-from utils.storage import upload_bytes, delete_object
+from utils.storage import upload_bytes, copy_object, delete_object
+from utils.image import perceptual_hash
+from utils.hashing import content_hash, hamming_distance
 
 CONTENT_TYPES = {
     "jpg": "image/jpeg",
@@ -17,6 +29,67 @@ CONTENT_TYPES = {
     "gif": "image/gif",
 }
 
+# Near-duplicates (same picture under another source_url, within PHASH_MAX_DISTANCE bits) are
+# always flagged on the row (photos.duplicate_of, shown in the review queue). With this on they are
+# rejected at ingest instead, before upload/registration.
+PHASH_AUTO_REJECT = os.getenv("PHASH_AUTO_REJECT", "false").lower() in ("1", "true", "yes")
+
+# Content-addressed storage: new objects are named analysis/<sha256>.<ext>, and a photo whose bytes
+# a pending/approved photo already stores points at that object instead of uploading them again.
+# Shared objects are only deleted through release_object. content_hash is recorded either way.
+CONTENT_ADDRESSED_KEYS = os.getenv("CONTENT_ADDRESSED_KEYS", "false").lower() in ("1", "true", "yes")
+
+def _object_key(ext, digest):
+    # Identical bytes -> identical key in content-addressed mode (so two concurrent uploads of one
+    # image just write the same object twice), a random one otherwise.
+    if CONTENT_ADDRESSED_KEYS and digest:
+        return f"analysis/{digest}.{ext}"
+    return f"analysis/{uuid.uuid4().hex}.{ext}"
+
+def _stored_objects(digests):
+    # {content_hash: r2_key} of bytes already in R2 that new photos can reuse (none outside
+    # content-addressed mode).
+    return get_objects_by_content_hash(digests) if CONTENT_ADDRESSED_KEYS else {}
+
+def release_object(r2_key, exclude_ids=()):
+    # Delete r2_key from R2 unless another live photo (not in exclude_ids) still points at it.
+    # Random keys are never shared, so outside content-addressed mode this is delete_object after
+    # one indexed count. Known gap: an identical image ingested between the count and the delete
+    # would lose its bytes; the bot retires such a photo when it finds the object missing.
+    if not r2_key or count_object_refs(r2_key, exclude_ids):
+        return False
+    return delete_object(r2_key)
+
+def promote_photo(photo_id, src_key):
+    # Approval's storage and DB steps in one blocking call (the API runs it as a single I/O-pool
+    # hop instead of one hop per step): copy the bytes to the approved/ key unless that object is
+    # already stored (content-addressed storage), repoint the row, then release the old copy.
+    # Returns None on success, else (status_code, detail); a failed DB update rolls the copy back
+    # so storage matches the DB.
+    dst_key = "approved/" + src_key.split("/", 1)[-1]
+    copied = src_key != dst_key and not count_object_refs(dst_key)
+
+    if copied and not copy_object(src_key, dst_key):
+        return 502, "Could not promote image in storage."
+
+    if not set_photo_approved(photo_id, dst_key):
+        if copied:
+            release_object(dst_key)
+        return 500, "Could not update photo record."
+
+    if src_key != dst_key:
+        release_object(src_key)  # orphan-safe: the DB already points at dst_key
+    return None
+
+def _near_duplicate(phash, batch_phashes=()):
+    # Auto-reject check: the id of a known photo this one duplicates (or -1 for an earlier item of
+    # the same batch), None if it's new or auto-reject is off.
+    if not PHASH_AUTO_REJECT or phash is None:
+        return None
+    if any(hamming_distance(phash, other) <= PHASH_MAX_DISTANCE for other in batch_phashes):
+        return -1
+    return find_near_duplicate(phash)
+
 def ingest_photo(image_bytes, ext, idol_keys, source,
                  source_url=None, date=None, urgent=None,
                  copies=0, combo=None, album_id=None):
@@ -28,22 +101,31 @@ def ingest_photo(image_bytes, ext, idol_keys, source,
         print(f"Ingest rejected: no known idols in {idol_keys}.")
         return None
 
+    phash = perceptual_hash(image_bytes)
+    duplicate_of = _near_duplicate(phash)
+    if duplicate_of:
+        print(f"Ingest rejected: near-duplicate of photo {duplicate_of}.")
+        return None
+
+    digest = content_hash(image_bytes)
+    shared_key = _stored_objects([digest]).get(digest)
+
     # Order matters for atomicity: row first (as 'uploading'), then upload, then finalize.
     photo_id = insert_photo(
         source=source, source_url=source_url, date=date,
-        urgent=urgent, copies=copies, combo=combo, album_id=album_id,
+        urgent=urgent, copies=copies, combo=combo, album_id=album_id, phash=phash, content_hash=digest,
     )
     if photo_id is None:
         return None
 
-    r2_key = f"analysis/{uuid.uuid4().hex}.{ext}"
+    r2_key = shared_key or _object_key(ext, digest)
 
-    if not upload_bytes(r2_key, image_bytes, CONTENT_TYPES.get(ext)):
+    if not shared_key and not upload_bytes(r2_key, image_bytes, CONTENT_TYPES.get(ext)):
         delete_photo(photo_id)  # clean up the orphaned row
         return None
 
     if not set_photo_ready(photo_id, r2_key):
-        delete_object(r2_key)
+        release_object(r2_key)
         delete_photo(photo_id)
         return None
 
@@ -52,32 +134,194 @@ def ingest_photo(image_bytes, ext, idol_keys, source,
     return photo_id
 
 
+def _reuse_stored_object(r2_key, digest):
+    # Register path in content-addressed mode: the key a photo should point at — the object already
+    # holding these bytes if there is one (the uploader's own copy, if it made one, is released),
+    # else its own r2_key.
+    shared_key = _stored_objects([digest]).get(digest) if digest else None
+    if not shared_key or shared_key == r2_key:
+        return r2_key
+    release_object(r2_key)
+    return shared_key
+
 def register_photo(r2_key, idol_keys, source,
                    source_url=None, date=None, urgent=None,
-                   copies=0, combo=None, album_id=None):
+                   copies=0, combo=None, album_id=None, phash=None, content_hash=None):
     # Byte-free twin of ingest_photo: the bytes are ALREADY in R2 (the local script uploaded them
     # straight there), so this only writes the DB row and links idols. Because the upload precedes
-    # registration, every reject path here must delete_object(r2_key) so R2 never accumulates
-    # orphans.
+    # registration, every reject path here must release_object(r2_key) so R2 never accumulates
+    # orphans. The perceptual and content hashes come from the uploader, which had the bytes
+    # (None = unknown); in content-addressed mode the uploader skips the upload when the server
+    # already stores those bytes, and the photo points at that object.
     id_map = get_idol_ids_by_keys(idol_keys)
     if not id_map:
         print(f"Register rejected: no known idols in {idol_keys}.")
-        delete_object(r2_key)
+        release_object(r2_key)
+        return None
+
+    duplicate_of = _near_duplicate(phash)
+    if duplicate_of:
+        print(f"Register rejected: near-duplicate of photo {duplicate_of}.")
+        release_object(r2_key)
         return None
 
+    r2_key = _reuse_stored_object(r2_key, content_hash)
+
     photo_id = insert_photo(
         source=source, source_url=source_url, date=date,
-        urgent=urgent, copies=copies, combo=combo, album_id=album_id,
+        urgent=urgent, copies=copies, combo=combo, album_id=album_id, phash=phash,
+        content_hash=content_hash,
     )
     if photo_id is None:
-        delete_object(r2_key)
+        release_object(r2_key)
         return None
 
     if not set_photo_ready(photo_id, r2_key):
         delete_photo(photo_id)
-        delete_object(r2_key)
+        release_object(r2_key)
         return None
 
     link_photo_idols(photo_id, list(id_map.values()))
     print(f"Registered photo {photo_id} ({r2_key}) idols={list(id_map.keys())}.")
     return photo_id
+
+
+# --- Batch entry points (an album at a time) ---
+# Each item is a dict of the single-photo keyword arguments (ingest_photo / register_photo). Idols
+# are validated once for the whole batch and all rows + idol links are written in one transaction
+# (ingest_many needs two: rows before the uploads, finalize after). Returns one outcome per item,
+# in order: {"status": "pending", "id": ...} or {"status": "rejected" | "error", "reason": ...}.
+
+_ROW_FIELDS = ("source", "source_url", "date", "urgent", "copies", "combo", "album_id", "phash",
+               "content_hash")
+
+def _row(item):
+    # The photos-row fields of one batch item (same defaults as the single-photo functions).
+    row = {field: item.get(field) for field in _ROW_FIELDS}
+    row["copies"] = row["copies"] or 0
+    return row
+
+def _reject_near_duplicates(items, results, accepted):
+    # PHASH_AUTO_REJECT over a batch: drops accepted items that duplicate a known photo or an
+    # earlier accepted item. Returns the indexes still accepted.
+    kept, batch_phashes = [], []
+    for index in accepted:
+        phash = items[index].get("phash")
+        if _near_duplicate(phash, batch_phashes):
+            results[index] = {"status": "rejected", "reason": "near-duplicate"}
+            continue
+        kept.append(index)
+        if phash is not None:
+            batch_phashes.append(phash)
+    return kept
+
+def _resolve_idols(items):
+    # One lookup for every idol key in the batch -> per-item {key: id} (empty = no known idol).
+    id_map = get_idol_ids_by_keys(list({key for item in items for key in item["idol_keys"]}))
+    return [{key: id_map[key] for key in item["idol_keys"] if key in id_map} for item in items]
+
+def ingest_many(items):
+    results = [None] * len(items)
+    idols = _resolve_idols(items)
+
+    accepted = []
+    for index, (item, item_idols) in enumerate(zip(items, idols)):
+        if item_idols:
+            accepted.append(index)
+        else:
+            results[index] = {"status": "rejected", "reason": "no known idols"}
+
+    for index in accepted:
+        items[index]["phash"] = perceptual_hash(items[index]["image_bytes"])
+        items[index]["content_hash"] = content_hash(items[index]["image_bytes"])
+    accepted = _reject_near_duplicates(items, results, accepted)
+    if not accepted:
+        return results
+
+    # Bytes already in R2 (or uploaded earlier in this batch) are pointed at, not uploaded again.
+    stored = _stored_objects([items[index]["content_hash"] for index in accepted])
+
+    # Same ordering as ingest_photo, batched: rows first (as 'uploading'), then uploads, then
+    # finalize every uploaded row at once; rows whose upload failed are deleted together.
+    photo_ids = insert_photos([_row(items[index]) for index in accepted])
+    if photo_ids is None:
+        for index in accepted:
+            results[index] = {"status": "error", "reason": "insert failed"}
+        return results
+
+    ready, failed = [], []
+    for index, photo_id in zip(accepted, photo_ids):
+        item = items[index]
+        shared_key = stored.get(item["content_hash"])
+        if shared_key:
+            ready.append((index, photo_id, shared_key))
+            continue
+
+        r2_key = _object_key(item["ext"], item["content_hash"])
+
+        if upload_bytes(r2_key, item["image_bytes"], CONTENT_TYPES.get(item["ext"])):
+            ready.append((index, photo_id, r2_key))
+            if CONTENT_ADDRESSED_KEYS:
+                stored[item["content_hash"]] = r2_key
+        else:
+            failed.append(photo_id)
+            results[index] = {"status": "error", "reason": "upload failed"}
+
+    if ready and not finalize_photos([(photo_id, r2_key, list(idols[index].values()))
+                                      for index, photo_id, r2_key in ready]):
+        for index, photo_id, r2_key in ready:
+            release_object(r2_key)
+            failed.append(photo_id)
+            results[index] = {"status": "error", "reason": "finalize failed"}
+        ready = []
+
+    delete_photos(failed)  # clean up the orphaned rows
+
+    for index, photo_id, r2_key in ready:
+        results[index] = {"status": "pending", "id": photo_id}
+    print(f"Ingested {len(ready)}/{len(items)} photo(s) in one batch.")
+    return results
+
+def register_many(items):
+    # Byte-free twin of ingest_many (bytes already in R2 under each item's r2_key, or under an
+    # object found by content_hash). As in register_photo, every item that ends up not registered
+    # has its object released.
+    results = [None] * len(items)
+    idols = _resolve_idols(items)
+
+    accepted = []
+    for index, (item, item_idols) in enumerate(zip(items, idols)):
+        if item_idols:
+            accepted.append(index)
+        else:
+            release_object(item["r2_key"])
+            results[index] = {"status": "rejected", "reason": "no known idols"}
+
+    kept = _reject_near_duplicates(items, results, accepted)
+    for index in set(accepted) - set(kept):
+        release_object(items[index]["r2_key"])
+    accepted = kept
+    if not accepted:
+        return results
+
+    stored = _stored_objects([items[index].get("content_hash") for index in accepted])
+    for index in accepted:
+        shared_key = stored.get(items[index].get("content_hash"))
+        if shared_key and shared_key != items[index]["r2_key"]:
+            release_object(items[index]["r2_key"])
+            items[index]["r2_key"] = shared_key
+
+    photo_ids = register_photos([
+        {**_row(items[index]), "r2_key": items[index]["r2_key"], "idol_ids": list(idols[index].values())}
+        for index in accepted
+    ])
+
+    for position, index in enumerate(accepted):
+        if photo_ids is None:
+            release_object(items[index]["r2_key"])
+            results[index] = {"status": "error", "reason": "register failed"}
+        else:
+            results[index] = {"status": "pending", "id": photo_ids[position]}
+
+    print(f"Registered {len(photo_ids or [])}/{len(items)} photo(s) in one batch.")
+    return results
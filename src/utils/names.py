@@ -0,0 +1,16 @@
+import unicodedata
+
+# Idol-name normalization shared by the alias index (idol_aliases.alias_norm) and every lookup
+# against it. Kept free of DB imports so the migration runner can register it as a SQL function.
+
+# Hiragana -> katakana (same syllable, +0x60), so "かりな"/"カリナ"-style spelling variants meet.
+_HIRAGANA_TO_KATAKANA = {code: code + 0x60 for code in range(0x3041, 0x3097)}
+
+def normalize_alias(name):
+    # NFKC folds full-/half-width forms (Ｋａｒｉｎａ, ｶﾘﾅ) and compatibility Hangul/jamo; casefold is
+    # the Unicode-aware lower(); the second NFKC re-composes anything casefold decomposed.
+    # Whitespace runs collapse to one space. Returns "" for a blank name.
+    text = unicodedata.normalize("NFKC", name or "")
+    text = unicodedata.normalize("NFKC", text.casefold())
+    text = text.translate(_HIRAGANA_TO_KATAKANA)
+    return " ".join(text.split())
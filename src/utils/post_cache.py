@@ -0,0 +1,97 @@
+import os
+import time
+import hashlib
+import pathlib
+import threading
+from dotenv import load_dotenv
+
+from utils.database_operations import DB_FILE
+
+load_dotenv()
+
+# Local disk cache of media prepared ahead of a post (bot.prepare_posts): the R2 object already
+# downloaded and normalized by ensure_uploadable_image, so the posting job only uploads and tweets.
+# One file per R2 key (named by the key's SHA-256, keeping the upload extension); bounded by
+# POST_CACHE_MB, least recently used out first. Losing it costs nothing but the preparation: a
+# missing file falls back to the download path.
+POST_CACHE_DIR = pathlib.Path(os.getenv("POST_CACHE_DIR") or pathlib.Path(DB_FILE).parent / "post_cache")
+POST_CACHE_BYTES = int(os.getenv("POST_CACHE_MB", 256)) * 1024 * 1024
+
+_lock = threading.Lock()
+
+def _stem(key):
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def _files(key):
+    return list(POST_CACHE_DIR.glob(_stem(key) + ".*")) if POST_CACHE_DIR.exists() else []
+
+def _evict():
+    # Caller holds _lock. Oldest-used files out until the directory fits POST_CACHE_BYTES.
+    entries = []
+    for path in POST_CACHE_DIR.iterdir():
+        try:
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+        except OSError:
+            continue
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= POST_CACHE_BYTES:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+def store(key, data, ext):
+    # Keep `data` (upload-ready bytes, extension `ext`) for key. False if it can't be written or
+    # is larger than the whole cache.
+    if len(data) > POST_CACHE_BYTES:
+        return False
+
+    try:
+        with _lock:
+            POST_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            for path in _files(key):
+                path.unlink(missing_ok=True)
+
+            path = POST_CACHE_DIR / f"{_stem(key)}.{ext}"
+            temp = path.with_suffix(f".{ext}.tmp")
+            temp.write_bytes(data)
+            os.replace(temp, path)
+            _evict()
+
+        return True
+
+    except Exception as e:
+        print(f"Error caching prepared media for {key}: {e}.")
+        return False
+
+def contains(key):
+    with _lock:
+        return any(path.suffix != ".tmp" for path in _files(key))
+
+def load(key):
+    # (data, ext) prepared for key, or None.
+    try:
+        with _lock:
+            for path in _files(key):
+                if path.suffix == ".tmp":
+                    continue
+                os.utime(path, (time.time(), time.time()))
+                return path.read_bytes(), path.suffix[1:]
+
+        return None
+
+    except Exception as e:
+        print(f"Error reading prepared media for {key}: {e}.")
+        return None
+
+def discard(key):
+    # The object is gone from R2 (every bot posted it): its prepared copy goes too.
+    try:
+        with _lock:
+            for path in _files(key):
+                path.unlink(missing_ok=True)
+
+    except Exception as e:
+        print(f"Error dropping prepared media for {key}: {e}.")
@@ -0,0 +1,220 @@
+import os
+import time
+import atexit
+import sqlite3
+import threading
+import functools
+from collections import deque
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TIMEZONE_BRT = ZoneInfo("America/Sao_Paulo")
+
+# Opt-in instrumentation for database_operations, kept DB-free so scripts/db_stats.py can format a
+# remote dump without a DB_FILE. DB_PROFILE=1 turns it on for the whole process: each helper marked
+# @instrumented records its call count, wall time (total + p95 over its last calls; inclusive of
+# the helpers it calls), the SQL statements it ran and the rows they returned, and any statement
+# slower than DB_SLOW_QUERY_MS is printed with its EXPLAIN QUERY PLAN. Read the counters with
+# get_query_stats() — GET /stats/db on the API, scripts/db_stats.py from a shell — or from the
+# table a profiled script prints at exit. Off (the default), @instrumented returns the helper
+# untouched and connections are plain sqlite3.
+PROFILE = os.getenv("DB_PROFILE", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", 100))
+TIMING_SAMPLES = 1024              # per helper, for the p95
+SLOW_QUERIES_KEPT = 50
+
+_local = threading.local()         # this thread's stack of running helpers
+_stats_lock = threading.Lock()
+_helper_stats = {}
+_slow_queries = deque(maxlen=SLOW_QUERIES_KEPT)
+
+def _helper_entry(name):
+    # Caller holds _stats_lock.
+    entry = _helper_stats.get(name)
+    if entry is None:
+        entry = _helper_stats[name] = {
+            "calls": 0, "statements": 0, "rows": 0, "total_ms": 0.0,
+            "samples": deque(maxlen=TIMING_SAMPLES),
+        }
+
+    return entry
+
+def _count(field, amount):
+    # Statements/rows go to the innermost running helper on this thread.
+    stack = getattr(_local, "helpers", None)
+    with _stats_lock:
+        _helper_entry(stack[-1] if stack else "<direct>")[field] += amount
+
+def _log_slow_query(connect, sql, params, elapsed_ms):
+    stack = getattr(_local, "helpers", None)
+    helper = stack[-1] if stack else "<direct>"
+    # A plain cursor, so the EXPLAIN itself isn't counted. executemany (params None) has no single
+    # parameter set to plan with.
+    try:
+        plan = ([row[3] for row in sqlite3.Cursor(connect).execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+                if params is not None else ["(executemany: not planned)"])
+
+    except Exception as e:
+        plan = [f"(no plan: {e})"]
+
+    with _stats_lock:
+        _slow_queries.append({
+            "helper": helper, "ms": round(elapsed_ms, 2), "sql": " ".join(sql.split()), "plan": plan,
+            "at": datetime.now(TIMEZONE_BRT).isoformat(timespec="seconds"),
+        })
+    print(f"Slow query ({elapsed_ms:.1f} ms) in {helper}: {' '.join(sql.split())}\n  plan: {plan}")
+
+class ProfiledCursor(sqlite3.Cursor):
+    # Counts each execute as one statement and every fetched row; times execute + fetches together
+    # so a SELECT that is cheap to start but slow to drain still shows up as slow.
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(super().executemany, sql, seq_of_parameters, None)
+
+    def _run(self, run, sql, parameters, explain_params):
+        self._sql, self._explain_params, self._elapsed, self._logged = sql, explain_params, 0.0, False
+        _count("statements", 1)
+        start = time.perf_counter()
+        try:
+            return run(sql, parameters)
+        finally:
+            self._add_time(start)
+
+    def _add_time(self, start):
+        self._elapsed += (time.perf_counter() - start) * 1000
+        if not self._logged and self._elapsed >= SLOW_QUERY_MS:
+            self._logged = True
+            _log_slow_query(self.connection, self._sql, self._explain_params, self._elapsed)
+
+    def _fetched(self, start, rows):
+        self._add_time(start)
+        if rows:
+            _count("rows", rows)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+
+        except StopIteration:
+            self._fetched(start, 0)
+            raise
+
+        self._fetched(start, 1)
+        return row
+
+class ProfiledConnection(sqlite3.Connection):
+    # Connection.execute/executemany don't go through cursor() at the C level, so route them here.
+    def cursor(self, factory=None):
+        return super().cursor(factory or ProfiledCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def instrumented(fn):
+    if not PROFILE:
+        return fn
+
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        stack = getattr(_local, "helpers", None)
+        if stack is None:
+            stack = _local.helpers = []
+
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stack.pop()
+            with _stats_lock:
+                entry = _helper_entry(name)
+                entry["calls"] += 1
+                entry["total_ms"] += elapsed_ms
+                entry["samples"].append(elapsed_ms)
+
+    return wrapper
+
+def get_query_stats():
+    # Snapshot of the counters: helpers by total time, slowest first, plus the recent slow queries.
+    with _stats_lock:
+        helpers = []
+        for name, entry in _helper_stats.items():
+            samples = sorted(entry["samples"])
+            calls = entry["calls"]
+            helpers.append({
+                "helper": name,
+                "calls": calls,
+                "statements": entry["statements"],
+                "rows": entry["rows"],
+                "total_ms": round(entry["total_ms"], 2),
+                "avg_ms": round(entry["total_ms"] / calls, 3) if calls else None,
+                "p95_ms": round(samples[max(0, -(-len(samples) * 95 // 100) - 1)], 3) if samples else None,
+                "statements_per_call": round(entry["statements"] / calls, 2) if calls else None,
+            })
+        slow_queries = list(_slow_queries)
+
+    helpers.sort(key=lambda helper: helper["total_ms"], reverse=True)
+    return {"enabled": PROFILE, "slow_query_ms": SLOW_QUERY_MS, "helpers": helpers, "slow_queries": slow_queries}
+
+def reset_query_stats():
+    with _stats_lock:
+        _helper_stats.clear()
+        _slow_queries.clear()
+
+def format_query_stats(stats):
+    # get_query_stats() output (local or fetched from the API) as a plain-text table.
+    if not stats["enabled"]:
+        return "DB instrumentation is off (set DB_PROFILE=1)."
+
+    lines = [f"{'helper':<28} {'calls':>7} {'stmts':>7} {'stmt/call':>9} {'rows':>8} "
+             f"{'total ms':>10} {'avg ms':>8} {'p95 ms':>8}"]
+    for helper in stats["helpers"]:
+        avg = f"{helper['avg_ms']:8.2f}" if helper["avg_ms"] is not None else f"{'-':>8}"
+        p95 = f"{helper['p95_ms']:8.2f}" if helper["p95_ms"] is not None else f"{'-':>8}"
+        per_call = f"{helper['statements_per_call']:9.2f}" if helper["statements_per_call"] is not None else f"{'-':>9}"
+        lines.append(f"{helper['helper']:<28} {helper['calls']:7} {helper['statements']:7} {per_call} "
+                     f"{helper['rows']:8} {helper['total_ms']:10.1f} {avg} {p95}")
+
+    if stats["slow_queries"]:
+        lines.append(f"\nSlow queries (>= {stats['slow_query_ms']:g} ms, most recent last):")
+        for query in stats["slow_queries"]:
+            lines.append(f"  {query['ms']:8.1f} ms  {query['helper']}: {query['sql'][:160]}")
+            lines.extend(f"             {step}" for step in query["plan"])
+
+    return "\n".join(lines)
+
+def print_query_stats():
+    print(format_query_stats(get_query_stats()))
+
+if PROFILE:
+    atexit.register(print_query_stats)
@@ -0,0 +1,64 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from utils.database_operations import get_recent_post_times
+
+load_dotenv()
+
+# Per-account posting budget for the bots. Twitter caps tweet creation per user over a rolling
+# 24 hours (17 on the free tier). The budget is counted from `history`, the account's tweets of
+# the last 24 hours, so a restart doesn't hand out a fresh day's worth and every process posting
+# for the account (the in-process scheduler, a manual bot.py run) draws from the same one. A burst
+# of manual/scheduled cycles can't push an account over its limit; a skipped post simply waits for
+# the next cycle.
+TWEETS_PER_DAY = int(os.getenv("TWEETS_PER_DAY", 17))
+WINDOW_SECONDS = 24 * 60 * 60
+
+class PostingBudget:
+    def __init__(self, account, limit, window_seconds):
+        self.account = account
+        self.limit = limit
+        self.window_seconds = window_seconds
+        # Posts taken in this process and not logged in history yet (bots of parallel cycles).
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        # Take one post if the account has one left; never blocks. Unreadable history: no post.
+        with self._lock:
+            posted = get_recent_post_times(self.account, self.window_seconds)
+            if posted is None or len(posted) + self.in_flight >= self.limit:
+                return False
+
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        # The post taken by try_acquire is over: logged in history if the tweet went out (and
+        # counted from there), given back otherwise.
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def wait_seconds(self):
+        # How long until the next post: until enough of the window's tweets have aged out of it.
+        with self._lock:
+            posted = get_recent_post_times(self.account, self.window_seconds) or []
+            over = len(posted) + self.in_flight - self.limit
+            if over < 0:
+                return 0
+            if over >= len(posted):
+                return self.window_seconds
+            return max(0, posted[over] + self.window_seconds - time.time())
+
+_budgets = {}
+_budgets_lock = threading.Lock()
+
+def posting_budget(account):
+    # The account's (bot idol_prefix) budget, created on first use.
+    with _budgets_lock:
+        budget = _budgets.get(account)
+        if budget is None:
+            budget = _budgets[account] = PostingBudget(account, TWEETS_PER_DAY, WINDOW_SECONDS)
+
+        return budget